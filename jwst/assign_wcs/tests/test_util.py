@@ -0,0 +1,117 @@
+from __future__ import (absolute_import, unicode_literals, division,
+                        print_function)
+import numpy as np
+from numpy.testing import utils
+import pytest
+from astropy.modeling.models import Identity, Mapping, Scale, Shift
+from gwcs import wcs
+
+from ... import datamodels
+from ...transforms.models import Logical
+from .. import util
+
+
+def create_slit_model(dispersion):
+    """
+    A 5 x 8 pixel slit whose wavelength increases along x.
+    """
+    transform = Mapping((0, 1, 0)) | (Shift(10.) & Shift(20.) &
+                                      (Scale(dispersion) | Shift(1.)))
+    slit_wcs = wcs.WCS(forward_transform=transform, output_frame='world')
+    slit_wcs.domain = [{'lower': 0, 'upper': 8}, {'lower': 0, 'upper': 5}]
+    model = datamodels.ImageModel(np.zeros((5, 8), dtype=np.float32))
+    model.meta.wcs = slit_wcs
+    return model
+
+
+@pytest.fixture(autouse=True)
+def clear_wavelength_cache():
+    util._wavelength_cache.clear()
+    yield
+    util._wavelength_cache.clear()
+
+
+def test_get_wavelengths():
+    model = create_slit_model(0.01)
+    assert util.get_wavelengths(model, compute=False) is None
+
+    expected = np.tile(1. + 0.01 * np.arange(8), (5, 1))
+    utils.assert_allclose(util.get_wavelengths(model), expected)
+    # By default the wavelengths are only kept in memory
+    assert getattr(model, 'wavelength_wcs', None) is None
+    utils.assert_allclose(util.get_wavelengths(model, compute=False),
+                          expected)
+    utils.assert_allclose(
+        util.get_wavelengths(create_slit_model(0.01), compute=False), expected)
+
+    # The caller gets a copy
+    wavelength = util.get_wavelengths(model, compute=False)
+    wavelength[0, 0] = -1.
+    utils.assert_allclose(util.get_wavelengths(model, compute=False),
+                          expected)
+
+
+def test_get_wavelengths_store():
+    model = create_slit_model(0.01)
+    util.get_wavelengths(model, store=True)
+    assert model.wavelength_wcs is not None
+
+    # The stored wavelengths are used while the WCS is unchanged; the
+    # caller gets a copy.
+    util._wavelength_cache.clear()
+    model.wavelength[0, 0] = -1.
+    wavelength = util.get_wavelengths(model, compute=False)
+    assert wavelength[0, 0] == -1.
+    wavelength[0, 0] = -2.
+    assert model.wavelength[0, 0] == -1.
+
+
+def test_get_wavelengths_wcs_changed():
+    model = create_slit_model(0.01)
+    util.get_wavelengths(model, store=True)
+
+    model.meta.wcs = create_slit_model(0.02).meta.wcs
+    assert util.get_wavelengths(model, compute=False) is None
+    expected = np.tile(1. + 0.02 * np.arange(8), (5, 1))
+    utils.assert_allclose(util.get_wavelengths(model), expected)
+    utils.assert_allclose(util.get_wavelengths(model, compute=False),
+                          expected)
+
+
+def test_wavelength_cache_eviction():
+    cache = util._WavelengthCache(max_memory=2. * 800 / 1024 / 1024)
+    for n in range(3):
+        cache.put(n, np.full((10, 10), float(n)))
+    assert cache.get(0) is None
+    assert cache.get(1)[0, 0] == 1.
+    # Too large to be kept at all
+    cache.put(3, np.zeros((30, 10)))
+    assert cache.get(3) is None
+    assert not cache.get(2).flags.writeable
+
+
+def test_wcs_fingerprint():
+    slit_wcs = create_slit_model(0.01).meta.wcs
+    key = util.wcs_fingerprint(slit_wcs)
+    assert util.wcs_fingerprint(create_slit_model(0.01).meta.wcs) == key
+    assert util.wcs_fingerprint(create_slit_model(0.01 + 1e-12).meta.wcs) != key
+
+    # Any change to the parameters of the transform changes the fingerprint
+    slit_wcs.forward_transform.offset_1 = 10.5
+    assert util.wcs_fingerprint(slit_wcs) != key
+
+
+def test_wcs_fingerprint_any_model():
+    """WCS are identified whatever models their transforms are made of"""
+    def cut_slit(cutoff):
+        model = create_slit_model(0.01)
+        transform = model.meta.wcs.forward_transform
+        model.meta.wcs.forward_transform = transform | (
+            Identity(2) & Logical('GT', cutoff, np.nan))
+        return model.meta.wcs
+
+    key = util.wcs_fingerprint(cut_slit(1.05))
+    assert key is not None
+    assert util.wcs_fingerprint(cut_slit(1.05)) == key
+    # The cutoff is not a parameter of the model, but changes its values
+    assert util.wcs_fingerprint(cut_slit(1.06)) != key
@@ -3,12 +3,16 @@ Utility function for WCS
 
 """
 
+from collections import OrderedDict
+import hashlib
 import logging
 import functools
+import threading
 import numpy as np
 
 from astropy.utils.misc import isiterable
 from astropy.io import fits
+from astropy import wcs as fitswcs
 from astropy.modeling import projections
 from astropy.modeling import models as astmodels
 
@@ -18,6 +22,9 @@ from gwcs.wcstools import wcs_from_fiducial
 log = logging.getLogger(__name__)
 log.setLevel(logging.DEBUG)
 
+# Number of points at which a gwcs.WCS is evaluated to identify it
+_N_FINGERPRINT_POINTS = 64
+
 
 def reproject(wcs1, wcs2, origin=0):
     """
@@ -221,3 +228,190 @@ def not_implemented_mode(input_model, ref):
     log.critical(message)
     #raise AttributeError(message)
     return None
+
+
+def wcs_fingerprint(wcs):
+    """
+    Return a string identifying a WCS by what it computes.
+
+    A gwcs.WCS is identified by its domain and by the values of its forward
+    transform, and of its backward transform if it has one, at a fixed set
+    of points scattered over the domain (or over a full detector, if it has
+    no domain).  These values change with any parameter of the transforms,
+    whatever models they are made of, so two WCS that agree at all of these
+    points are taken to be the same; and there are few points, so this
+    costs little next to evaluating the WCS at every pixel.  An
+    astropy.wcs.WCS is identified by its header.
+
+    Parameters
+    ----------
+    wcs : `~gwcs.wcs.WCS` or `~astropy.wcs.WCS`
+        The WCS.
+
+    Returns
+    -------
+    fingerprint : str or None
+        A hexadecimal digest, or None if the forward transform cannot be
+        evaluated, in which case the WCS cannot be identified.
+    """
+    key = hashlib.sha1()
+    if isinstance(wcs, fitswcs.WCS):
+        key.update(wcs.to_header_string(relax=True).encode('ascii'))
+        return key.hexdigest()
+
+    bounds = _domain_bounds(wcs)
+    key.update(repr(bounds).encode('ascii'))
+    n_inputs = wcs.forward_transform.n_inputs
+    if bounds is None:
+        bounds = [(0., 2048.)] * n_inputs
+    points = np.random.RandomState(0).uniform(size=(n_inputs,
+                                                    _N_FINGERPRINT_POINTS))
+    values = [lower + (upper - lower) * p
+              for (lower, upper), p in zip(bounds, points)]
+    try:
+        values = _fingerprint_values(wcs.forward_transform, values)
+    except Exception as err:
+        log.debug("Cannot evaluate WCS to identify it: %s", err)
+        return None
+    key.update(values.tobytes())
+
+    # The backward transform is evaluated at the outputs of the forward
+    # one, where it is defined
+    try:
+        key.update(_fingerprint_values(wcs.backward_transform,
+                                       values).tobytes())
+    except Exception as err:
+        log.debug("Identifying WCS without its backward transform: %s", err)
+    return key.hexdigest()
+
+
+def _fingerprint_values(transform, inputs):
+    """
+    Evaluate a transform for `wcs_fingerprint`, as an array of float64 with
+    one row per output and the same NaN throughout.
+    """
+    values = transform(*inputs)
+    if transform.n_outputs == 1:
+        values = [values]
+    values = np.array(values, dtype=np.float64)
+    values[np.isnan(values)] = np.nan
+    return values
+
+
+def _domain_bounds(wcs):
+    """
+    Return the (lower, upper) bounds of each axis of a WCS domain.
+    """
+    domain = getattr(wcs, 'domain', None)
+    if domain is None:
+        return None
+    return tuple((float(axis['lower']), float(axis['upper']))
+                 for axis in domain)
+
+
+def get_wavelengths(model, compute=True, store=False):
+    """
+    Return the wavelength at each pixel of a slit or image, from its WCS.
+
+    Evaluating the WCS of a spectrum over every pixel is expensive, and
+    several steps need the result, so the wavelengths are kept together
+    with a fingerprint of the WCS they were computed from, and are reused
+    as long as the fingerprint of ``model.meta.wcs`` still matches.  They
+    are kept in memory, for the later steps run in the same process, and,
+    with ``store``, also in the model (and saved in its WAVELENGTH
+    extension), for the steps run on the saved product.
+
+    Parameters
+    ----------
+    model : `~jwst.datamodels.DataModel`
+        A slit of a `~jwst.datamodels.MultiSlitModel`, or an image, with a
+        WCS in ``model.meta.wcs``.
+    compute : bool
+        Whether to evaluate the WCS when there are no valid stored
+        wavelengths; if False, None is returned instead.
+    store : bool
+        Whether to store the wavelengths in the model.
+
+    Returns
+    -------
+    wavelength : ndarray or None
+        The wavelength at each pixel of the last two axes of
+        ``model.data``, NaN where the WCS is not defined.  This is a copy,
+        which the caller may modify.
+    """
+    wcs = model.meta.wcs
+    shape = model.data.shape[-2:]
+    key = wcs_fingerprint(wcs)
+    if key is None:
+        log.debug("Cannot identify the WCS; the wavelengths are not cached")
+    else:
+        stored_key = getattr(model, 'wavelength_wcs', None)
+        if stored_key == key:
+            wavelength = model.wavelength
+            if wavelength.shape == shape:
+                log.debug("Using the stored wavelengths")
+                return wavelength.copy()
+        wavelength = _wavelength_cache.get((key, shape))
+        if wavelength is not None:
+            log.debug("Using the wavelengths computed earlier")
+            if store:
+                model.wavelength = wavelength
+                model.wavelength_wcs = key
+            return wavelength.copy()
+
+    if not compute:
+        return None
+    grid = np.indices(shape, dtype=np.float64)
+    # The arguments are the X and Y pixel coordinates (in that order).
+    wavelength = np.array(wcs(grid[1], grid[0])[-1], dtype=np.float64)
+    if key is not None:
+        _wavelength_cache.put((key, shape), wavelength)
+        if store:
+            model.wavelength = wavelength
+            model.wavelength_wcs = key
+    return wavelength.copy()
+
+
+class _WavelengthCache(object):
+    """
+    The wavelengths computed by `get_wavelengths` in this process, keyed
+    by the fingerprint of the WCS and the shape of the data, evicting the
+    least recently used ones beyond ``max_memory`` MB.
+    """
+    def __init__(self, max_memory):
+        self.max_memory = max_memory
+        self._wavelengths = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            wavelength = self._wavelengths.pop(key, None)
+            if wavelength is not None:
+                self._wavelengths[key] = wavelength
+            return wavelength
+
+    def put(self, key, wavelength):
+        max_bytes = self.max_memory * 1024 * 1024
+        if wavelength.nbytes > max_bytes:
+            return
+        wavelength = wavelength.copy()
+        wavelength.flags.writeable = False
+        with self._lock:
+            old = self._wavelengths.pop(key, None)
+            if old is not None:
+                self._nbytes -= old.nbytes
+            self._wavelengths[key] = wavelength
+            self._nbytes += wavelength.nbytes
+            while self._nbytes > max_bytes:
+                _, old = self._wavelengths.popitem(last=False)
+                self._nbytes -= old.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._wavelengths.clear()
+            self._nbytes = 0
+
+
+# Enough for the slits of a few NIRSpec MOS exposures
+_wavelength_cache = _WavelengthCache(max_memory=256.)
@@ -3,13 +3,16 @@ from __future__ import absolute_import, print_function
 
 import sys
 import numpy as np
-import math
 from .. import datamodels
 from ..assign_wcs import nirspec
 from ..datamodels import dqflags
 from . import cube
 from . import coord
 from gwcs import wcstools
+
+# The maximum number of candidate (spaxel, point cloud member) pairs examined
+# at once by FindROI
+MAX_ROI_CANDIDATES = 2**21
 #________________________________________________________________________________
 
 def MakePointCloudMIRI(self, input_model,
@@ -220,9 +223,14 @@ def FindROI(self, Cube, spaxel, PointCloud):
     """
     Short Summary
     -------------
-    using the point cloud loop over the Spaxel and find the point cloud members that
-    fall withing the ROI of the spaxel center. 
+    Find the point cloud members that fall within the ROI of each spaxel center
+    and accumulate their weights and weighted fluxes for each spaxel.
 
+    The spaxel centers lie on the regularly spaced axes of the cube, so the
+    spaxels within the ROI of a point cloud member are found by searching
+    each axis with np.searchsorted. The members are handled in chunks, and the
+    weights of all the (spaxel, member) pairs of a chunk are computed at once
+    and summed into the spaxels with np.bincount.
 
     For MIRI the weighting of the Cloud points is based on the distance in the local
     MRS alpha-beta plane. Each cloud point as an associated alpha-beta coordinate
@@ -237,162 +245,225 @@ def FindROI(self, Cube, spaxel, PointCloud):
 
     Returns
     -------
-    location of x,y in Point Cloud as well as mapping of spaxel to each overlapping 
-    PointCloud member
+    spaxel_weight, spaxel_flux, spaxel_count: arrays over the spaxels of the
+    cube of the sum of the weights, the sum of the weighted fluxes and the
+    number of the point cloud members within the ROI of each spaxel
 
 
     """
 #________________________________________________________________________________
-    nxc = len(Cube.xcoord)
-    nzc = len(Cube.zcoord)
-    nyc = len(Cube.ycoord)
-
     nplane = Cube.naxis1 * Cube.naxis2
+    ncube = nplane * Cube.naxis3
     lower_limit = 0.01
 
-    iprint = 0
     nn = len(PointCloud[0])
 
     self.log.info('number of elements in PT %i',nn)
 
-# loop over each point cloud member - might want to change this to looping
-# over spaxels but for now just keep it point cloud elements because it
-# is easy to find ROI members because the cube spaxel values are regularily spaced
-# and we can search over the vector of each axis of the cube rather than entire 
-# point could
-
-    iprint = 0 
+    coord1 = PointCloud[0]  # Point cloud xi
+    coord2 = PointCloud[1]  # Point cloud eta
+    wave = PointCloud[2]    # Point cloud wavelength
+    fluxdet = PointCloud[5]
+
+    miripsf = (Cube.instrument == 'MIRI' and self.weighting == 'miripsf')
+    if(Cube.instrument == 'MIRI' and self.coord_system == 'alpha-beta'):
+        coord1 = PointCloud[3]
+        coord2 = PointCloud[4]
+
+    if(miripsf):
+        ifile = PointCloud[7].astype(int)
+        weights = FindNormalizationWeights(np.asarray(Cube.a_wave)[ifile],
+                                           np.asarray(Cube.c_wave)[ifile],
+                                           np.asarray(Cube.a_weight)[ifile],
+                                           np.asarray(Cube.c_weight)[ifile],
+                                           wave)
+
+    # range of cube indices along each axis that may be within the ROI
+    # of each point cloud member
+    xrange = _axis_range(Cube.xcoord, coord1, self.roi1)
+    yrange = _axis_range(Cube.ycoord, coord2, self.roi2)
+    zrange = _axis_range(Cube.zcoord, wave, self.roiw)
+
+    nbox = 1
+    if(nn > 0):
+        for lower, upper in (xrange, yrange, zrange):
+            nbox = nbox * max(1, int((upper - lower).max()))
+    chunk = max(1, MAX_ROI_CANDIDATES // nbox)
+
+    spaxel_weight = np.zeros(ncube)
+    spaxel_flux = np.zeros(ncube)
+    spaxel_count = np.zeros(ncube, dtype=int)
 #________________________________________________________________________________
-    for ipt in range(0, nn - 1):
-
-        coord1 = PointCloud[0, ipt]  # Point cloud xi 
-        coord2 = PointCloud[1, ipt]  # Point cloud eta
-        wave = PointCloud[2,ipt]     # Point cloud wavelength 
-        fluxdet = PointCloud[5,ipt]
-        xdet = PointCloud[8,ipt]
-        ydet = PointCloud[9,ipt]
-        ifiledet = PointCloud[7,ipt]
-
-
-        if(Cube.instrument == 'MIRI'):
-            if(self.weighting == 'miripsf'):
-                alpha = PointCloud[3, ipt]   
-                beta = PointCloud[4, ipt]    
-
-                ifile = int(PointCloud[7, ipt])
-                a = Cube.a_wave[ifile]
-                c = Cube.c_wave[ifile]
-                wa = Cube.a_weight[ifile]
-                wc = Cube.c_weight[ifile]
-                weights = FindNormalizationWeights(wave, a, c, wa, wc)
-                weight_alpha = weights[0]
-                weight_beta = weights[1]
-                weight_wave = weights[2]
-
-        # transform Cube Spaxel centers to alpha,beta system
-        # of point cloud member (only do this transformation for MIRI) 
-        # for MIRI weighting parameters are based on distance in alpha-beta coord system
-        # transform the cube coordinate values to alpha and beta values 
-        # xi,eta -> ra,dec
-        # ra-dec -> v2,v3 
-        # v2,v3 -> local alph,beta
-
-                v2ab_transform = Cube.transform_v23toab[ifile]
-                worldtov23 = Cube.transform_worldtov23[ifile]
+    for istart in range(0, nn, chunk):
+        members = slice(istart, min(istart + chunk, nn))
+
+        ix, validx = _axis_members(Cube.xcoord, coord1[members],
+                                   xrange[0][members], xrange[1][members], self.roi1)
+        iy, validy = _axis_members(Cube.ycoord, coord2[members],
+                                   yrange[0][members], yrange[1][members], self.roi2)
+        iz, validz = _axis_members(Cube.zcoord, wave[members],
+                                   zrange[0][members], zrange[1][members], self.roiw)
+
+        # all the combinations of the members along each axis of the ROI
+        valid = (validz[:, :, np.newaxis, np.newaxis] &
+                 validy[:, np.newaxis, :, np.newaxis] &
+                 validx[:, np.newaxis, np.newaxis, :])
+        ipt, kz, ky, kx = np.nonzero(valid)
+        xx = ix[ipt, kx]
+        yy = iy[ipt, ky]
+        zz = iz[ipt, kz]
+        ipt = ipt + istart
+        cube_index = zz * nplane + yy * Cube.naxis1 + xx
 #________________________________________________________________________________
-            if(self.coord_system == 'alpha-beta'):
-                coord1 = alpha
-                coord2 = beta
-#________________________________________________________________________________        
-        # Coord1 and Coord2 are in the coordinate system of the cube.
-        # using the Cube regularily spaced arrays - Cube.zcoord, xcoord,ycoord
-        # find the spaxels that fall withing ROI of point cloud
-
-        # find values within the ROI
-
-        indexz = np.where(abs(Cube.zcoord - wave) <= self.roiw)
-        indexx = np.where(abs(Cube.xcoord - coord1) <= self.roi1)
-        indexy = np.where(abs(Cube.ycoord - coord2) <= self.roi2)
-
-        zlam = Cube.zcoord[indexz]
-        xi = Cube.xcoord[indexx]   # Cube values for xi vector axis 
-        eta = Cube.ycoord[indexy]  # Cube values for eta vector axis
+# MIRI instrument, miripsf weighting
+        # For MIRI the distance between PT and Spaxel Center is
+        # in the alpha - beta cooridate system
+        if(miripsf):
+            alpha_spaxel, beta_spaxel, wave_spaxel = _spaxel_alpha_beta(Cube,
+                                                                        ifile[ipt],
+                                                                        xx, yy, zz)
+
+            xn = (PointCloud[3, ipt] - alpha_spaxel) / weights[0][ipt]
+            yn = (PointCloud[4, ipt] - beta_spaxel) / weights[1][ipt]
+            wn = np.abs(wave[ipt] - wave_spaxel) / weights[2][ipt]
+            weight_distance = np.sqrt(xn * xn + yn * yn + wn * wn)
 #________________________________________________________________________________
-# loop over the points in the ROI
-        for iz, zz in enumerate(indexz[0]):
-            istart = zz * nplane
-            for iy, yy in enumerate(indexy[0]):
-                for ix, xx in enumerate(indexx[0]):
-
+# NIRSPEC instrument and MIRI standard weighting
+        # distance between PT and Spaxel Center in the cube coordinate system
+        else:
+            d1 = (Cube.xcoord[xx] - coord1[ipt]) / Cube.Cdelt1
+            d2 = (Cube.ycoord[yy] - coord2[ipt]) / Cube.Cdelt2
+            d3 = (Cube.zcoord[zz] - wave[ipt]) / Cube.Cdelt3
+            weight_distance = np.sqrt(d1 * d1 + d2 * d2 + d3 * d3)
+
+        weight_distance = np.power(weight_distance, self.weight_power)
 #________________________________________________________________________________
-# NIRSPEC instrument
-                    # for NIRSPEC find distance between PT and Spaxel Center 
-                    # in xi,eta coordinate system
-                    if(Cube.instrument == 'NIRSPEC'):
-                        d1 = (xi[ix] - coord1)/Cube.Cdelt1
-                        d2 = (eta[iy] - coord2)/Cube.Cdelt2
-                        d3 = (zlam[iz] - wave)/Cube.Cdelt3
-                        weight_distance = math.sqrt(d1*d1 + d2*d2 + d3*d3)  
-                        weight_distance = math.pow(weight_distance,self.weight_power)
+# We have found the weight_distance based on instrument type
+
+        if(self.debug_pixel == 1):
+            debug = np.flatnonzero((xx == self.xdebug) & (yy == self.ydebug) &
+                                   (zz == self.zdebug))
+            for i in debug:
+                self.log.info('For spaxel %i %i %i, detector x,y,flux %i %i %f %i %f',
+                              self.xdebug + 1, self.ydebug + 1, self.zdebug + 1,
+                              PointCloud[8, ipt[i]], PointCloud[9, ipt[i]],
+                              fluxdet[ipt[i]], PointCloud[7, ipt[i]],
+                              weight_distance[i])
+
+        weight_distance[weight_distance < lower_limit] = lower_limit
+        weight_distance = 1.0 / weight_distance
+
+        spaxel_weight += np.bincount(cube_index, weights=weight_distance,
+                                     minlength=ncube)
+        spaxel_flux += np.bincount(cube_index,
+                                   weights=weight_distance * fluxdet[ipt],
+                                   minlength=ncube)
+        spaxel_count += np.bincount(cube_index, minlength=ncube)
+
+    return spaxel_weight, spaxel_flux, spaxel_count
+
 #________________________________________________________________________________
-# MIRI instrument
-                    elif(Cube.instrument == 'MIRI'):
-                        
-                        # weighting - standard - distance based on xi,eta distance
-                        if(self.weighting =='standard'):
-                            d1 = (xi[ix] - coord1)/Cube.Cdelt1
-                            d2 = (eta[iy] - coord2)/Cube.Cdelt2
-                            d3 = (zlam[iz] - wave)/Cube.Cdelt3
-                            weight_distance_abs = math.sqrt(d1*d1 + d2*d2 + d3*d3)
-                            weight_distance = math.pow(weight_distance_abs,self.weight_power)
-
-                        # For MIRI the distance between PT and Spaxel Center is
-                        # in the alpha - beta cooridate system
-                        elif(self.weighting =='miripsf'):
-
-                            ra_spaxel,dec_spaxel=coord.std2radec(Cube.Crval1,
-                                                             Cube.Crval2,
-                                                             xi[ix],eta[iy])
-
- 
-                            v2_spaxel,v3_spaxel,zl = worldtov23(ra_spaxel,dec_spaxel,zlam[iz])
-
-                            alpha_spaxel,beta_spaxel,wave_spaxel = v2ab_transform(v2_spaxel,
-                                                                              v3_spaxel,
-                                                                              zlam[iz])                    
-                            alpha_distance =alpha-alpha_spaxel
-                            beta_distance = beta-beta_spaxel
-                            wave_distance  = abs(wave-wave_spaxel)
-
-                            xn = alpha_distance/weight_alpha
-                            yn = beta_distance/weight_beta
-                            wn = wave_distance/weight_wave
-                                                         
-                        # only included the spatial dimensions
-                            weight_distance = math.sqrt(xn*xn + yn*yn + wn*wn)  
-                            weight_distance = math.pow(weight_distance,self.weight_power)
+
+def _axis_range(axis, values, roi):
+    """
+    Short Summary
+    -------------
+    For each value, find the range of indices into a cube axis that holds
+    all the axis values within roi of it (and possibly one more at each end)
+
+    Parameters
+    ----------
+    axis: increasing cube coordinates along one axis
+    values: point cloud coordinates along the same axis
+    roi: region of interest along the axis
+
+    Returns
+    -------
+    lower, upper: the first and one past the last index of each range
+
+    """
+    lower = np.searchsorted(axis, values - roi, side='left') - 1
+    upper = np.searchsorted(axis, values + roi, side='right') + 1
+    return np.clip(lower, 0, len(axis)), np.clip(upper, 0, len(axis))
+
 #________________________________________________________________________________
-# We have found the weight_distance based on instrument type
 
-                    if(self.debug_pixel == 1 and self.xdebug == xx and self.ydebug == yy and
-                       self.zdebug == zz ):
-                        self.log.info('For spaxel %i %i %i, detector x,y,flux %i %i %f %i %f',self.xdebug+1,self.ydebug+1,
-                          self.zdebug+1,xdet,ydet,fluxdet,ifiledet,weight_distance)
+def _axis_members(axis, values, lower, upper, roi):
+    """
+    Short Summary
+    -------------
+    Find the cube indices along one axis within the ROI of each value
+
+    Parameters
+    ----------
+    axis: increasing cube coordinates along one axis
+    values: point cloud coordinates along the same axis
+    lower, upper: ranges of indices returned by _axis_range
+    roi: region of interest along the axis
 
+    Returns
+    -------
+    index: cube indices of the ranges, one row for each value
+    valid: whether each index is within the ROI of the value
+
+    """
+    width = max(1, int((upper - lower).max()))
+    offset = np.arange(width)
+    index = np.minimum(lower[:, np.newaxis] + offset, len(axis) - 1)
+    valid = ((offset < (upper - lower)[:, np.newaxis]) &
+             (np.abs(axis[index] - values[:, np.newaxis]) <= roi))
+    return index, valid
 
-                    if(weight_distance < lower_limit): weight_distance = lower_limit
-                    weight_distance = 1.0 / weight_distance
+#________________________________________________________________________________
 
-                    cube_index = istart + yy * Cube.naxis1 + xx
-                    spaxel[cube_index].ipointcloud.append(ipt)
-                    spaxel[cube_index].pointcloud_weight.append(weight_distance)
+def _spaxel_alpha_beta(Cube, ifile, xx, yy, zz):
+    """
+    Short Summary
+    -------------
+    Transform the spaxel centers to the alpha-beta system of the files of the
+    point cloud members they are paired with. Each spaxel is transformed once
+    for each file.
 
+    xi,eta -> ra,dec
+    ra-dec -> v2,v3
+    v2,v3 -> local alph,beta
 
-#                    iprint = iprint + 1
-#                    if(iprint == 900000):
-#                        print('on point element',ipt)
-#                        iprint = 0 
-#                        print(ipt,ix,iy,iz,weight_distance)
+    Parameters
+    ----------
+    Cube: holds basic Cube information, including the transforms of each file
+    ifile: the index of the file of each point cloud member
+    xx, yy, zz: the cube indices of the spaxel paired with each member
+
+    Returns
+    -------
+    alpha, beta and wavelength of the spaxel centers
+
+    """
+    alpha = np.empty(len(ifile))
+    beta = np.empty(len(ifile))
+    wave = np.empty(len(ifile))
+    plane = Cube.naxis1 * Cube.naxis2
+
+    for file_no in np.unique(ifile):
+        select = np.flatnonzero(ifile == file_no)
+        spaxels, inverse = np.unique(zz[select] * plane + yy[select] * Cube.naxis1 +
+                                     xx[select], return_inverse=True)
+        xi = Cube.xcoord[spaxels % Cube.naxis1]
+        eta = Cube.ycoord[(spaxels // Cube.naxis1) % Cube.naxis2]
+        zlam = Cube.zcoord[spaxels // plane]
+
+        ra_spaxel, dec_spaxel = coord.std2radec(Cube.Crval1, Cube.Crval2, xi, eta)
+        worldtov23 = Cube.transform_worldtov23[file_no]
+        v2ab_transform = Cube.transform_v23toab[file_no]
+        v2_spaxel, v3_spaxel, zl = worldtov23(ra_spaxel.ravel(), dec_spaxel.ravel(), zlam)
+        alpha_spaxel, beta_spaxel, wave_spaxel = v2ab_transform(v2_spaxel, v3_spaxel, zlam)
+
+        inverse = inverse.ravel()
+        alpha[select] = np.ravel(alpha_spaxel)[inverse]
+        beta[select] = np.ravel(beta_spaxel)[inverse]
+        wave[select] = np.ravel(wave_spaxel)[inverse]
+
+    return alpha, beta, wave
 
 #_______________________________________________________________________
 def FindWaveWeights(channel, subchannel):
@@ -495,38 +566,24 @@ gs     weighting is determined from width of PSF as well as wavelength resolutio
 
     Parameters
     ----------
-    channel- channel for point
-    subchannel- subchannel for point
+    a, c, wa, wc - wavelength normalization parameters of the band of the point
+                   (see FindWaveWeights)
     wavelength of point
+    (all may be arrays of the same shape, one value for each point)
 
     Returns
     -------
     normalized weighting for 3 dimension
 
     """
-    alpha_weight = 1.0
-    beta_weight = 1.0
-    lambda_weight = 1.0
-
     beta_weight = 0.31 * (wavelength / 8.0)
 
-
-    if(wavelength < 8.0):
-        alpha_weight = 0.31
-    else:
-        alpha_weight = beta_weight
-
+    alpha_weight = np.where(wavelength < 8.0, 0.31, beta_weight)
 
         # linear interpolation
 
-    if (wavelength >= wa and wavelength <= wc):
-        b = a + (c - a) * (wavelength - wa) / (wc - wa)
-
-    elif (wavelength < wa):
-        b = a
-    else:
-        b = c
-
+    b = a + (c - a) * (wavelength - wa) / (wc - wa)
+    b = np.where((wavelength >= wa) & (wavelength <= wc), b, np.where(wavelength < wa, a, c))
 
     lambda_weight = wavelength / b
 
@@ -232,14 +232,13 @@ class CubeInfo(object):
 class Spaxel(object):
 
 
-    __slots__ = ['flux', 'error','ipointcloud', 'pointcloud_weight']
+    __slots__ = ['flux', 'error', 'npointcloud']
 
     def __init__(self):
         self.flux = 0
         self.error = 0
 
-        self.ipointcloud = []         # appended to in CubeCloud.MakePointCloud
-        self.pointcloud_weight = []   # appended to in CubeCloud.MakePointCloud
+        self.npointcloud = 0          # set in cube_build.FindCubeFlux
 
 
 class SpaxelAB(object):
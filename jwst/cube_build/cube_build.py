@@ -541,7 +541,7 @@ def MapDetectorToCube(self,this_par1, this_par2,
 
 
 #********************************************************************************
-def FindCubeFlux(self, Cube, spaxel, PixelCloud):
+def FindCubeFlux(self, Cube, spaxel, PixelCloud, roi=None):
 #********************************************************************************
     """
     Short Summary
@@ -553,6 +553,9 @@ def FindCubeFlux(self, Cube, spaxel, PixelCloud):
     Cube - contains the basic header information of Cube
     spaxel: List of Spaxels
     PixelCloud - pixel point cloud, only filled in if doing 3-D interpolation
+    roi - sums of the weights, weighted fluxes and number of point cloud members
+          within the ROI of each spaxel returned by CubeCloud.FindROI, only
+          used if doing 3-D interpolation
 
     Returns
     -------
@@ -572,46 +575,13 @@ def FindCubeFlux(self, Cube, spaxel, PixelCloud):
                 CubeOverlap.SpaxelFlux(self.roi2, i, Cube, spaxel)
 
     elif self.interpolation == 'pointcloud':
-        icube = 0
         t0 = time.time()
-        for iz, z in enumerate(Cube.zcoord):
-            for iy, y in enumerate(Cube.ycoord):
-                for ix, x in enumerate(Cube.xcoord):
-                    num = len(spaxel[icube].ipointcloud)
-
-                    if(num > 0):
-                        pointcloud_index = spaxel[icube].ipointcloud
-                        weightpt = spaxel[icube].pointcloud_weight
-                        pixelflux = PixelCloud[5, pointcloud_index]
-
-                        weight = 0
-                        value = 0
-                        for j in range(num):
-                            weight = weight + weightpt[j]
-                            value = value + (weightpt[j] * pixelflux[j])
-#                            if(iz == 39 or iz == 40 ):
-#                                if(ix == 14 and iy == 16): 
-#                                    print('Checking ', icube, ix, iy, iz)
-#                                    print('icube', icube)
-#                                    print('pointcloud', pointcloud_index[j])
-#                                    print('flux = {0:.5f}'.format(pixelflux[j]))
-#                                    print('w', weightpt[j])
-#                                    print(' ',weightpt[j] * pixelflux[j])
-#                                    print('num',num)
-
-
-                        if(weight != 0):
-                            value = value / weight
-                            spaxel[icube].flux = value
-#                            if(iz == 39 or iz == 40 ):
-#                                if(ix == 14 and iy == 16): 
-#                                    print('Final Flux', value* weight, weight, value,num)
-
-
-                    icube = icube + 1
-#                    ix = ix + 1
-#                iy = iy + 1
-#            iz = iz + 1
+        spaxel_weight, spaxel_flux, spaxel_count = roi
+
+        for icube in np.flatnonzero(spaxel_count):
+            spaxel[icube].npointcloud = spaxel_count[icube]
+            if(spaxel_weight[icube] != 0):
+                spaxel[icube].flux = spaxel_flux[icube] / spaxel_weight[icube]
 
         t1 = time.time()
         log.info("Time to interpolate at spaxel values = %.1f.s" % (t1 - t0,))
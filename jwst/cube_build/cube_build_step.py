@@ -317,14 +317,15 @@ class CubeBuildStep (Step):
 # now determine Cube Spaxel flux
 
         t0 = time.time()
+        roi = None
         if self.interpolation == 'pointcloud':
-            CubeCloud.FindROI(self, Cube, spaxel, PixelCloud)
+            roi = CubeCloud.FindROI(self, Cube, spaxel, PixelCloud)
         t1 = time.time()
         self.log.info("Time to find the ROI = %.1f.s" % (t1 - t0,))
 
 
         t0 = time.time()
-        cube_build.FindCubeFlux(self, Cube, spaxel, PixelCloud)
+        cube_build.FindCubeFlux(self, Cube, spaxel, PixelCloud, roi)
 
         t1 = time.time()
         self.log.info("Time find Cube Flux= %.1f.s" % (t1 - t0,))
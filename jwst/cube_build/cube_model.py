@@ -113,7 +113,7 @@ def UpdateIFUCube(self, Cube,IFUCube, spaxel):
 
     temp_flux =np.reshape(np.array([s.flux for s in spaxel]),
                           [Cube.naxis3,Cube.naxis2,Cube.naxis1])
-    temp_wmap =np.reshape(np.array([len(s.ipointcloud) for s in spaxel]),
+    temp_wmap =np.reshape(np.array([s.npointcloud for s in spaxel]),
                           [Cube.naxis3,Cube.naxis2,Cube.naxis1])
     
     IFUCube.data = temp_flux
@@ -124,7 +124,7 @@ def UpdateIFUCube(self, Cube,IFUCube, spaxel):
 #        for y in range(Cube.naxis2):
 #            for x in range(Cube.naxis1):
 #                IFUCube.data[z, y, x] = spaxel[icube].flux
-#                IFUCube.weightmap[z, y, x] = len(spaxel[icube].ipointcloud)
+#                IFUCube.weightmap[z, y, x] = spaxel[icube].npointcloud
 #                icube = icube + 1
 
 
@@ -0,0 +1,229 @@
+"""
+Tests of the point cloud interpolation of IFU cubes
+"""
+from __future__ import absolute_import, division
+
+import logging
+import math
+
+import numpy as np
+from numpy.testing import assert_allclose, assert_array_equal
+import pytest
+
+from .. import CubeCloud
+from .. import coord
+
+
+class _Step(object):
+    """The cube_build settings used by FindROI"""
+    log = logging.getLogger(__name__)
+
+    def __init__(self, weighting, coord_system):
+        self.weighting = weighting
+        self.coord_system = coord_system
+        self.roi1 = 0.25
+        self.roi2 = 0.3
+        self.roiw = 0.004
+        self.weight_power = 2.0
+        self.debug_pixel = 0
+
+
+class _Cube(object):
+    """The cube information used by FindROI, for a few MIRI files"""
+
+    def __init__(self, instrument, nfiles):
+        self.instrument = instrument
+        self.naxis1, self.naxis2, self.naxis3 = 20, 18, 30
+        self.Cdelt1, self.Cdelt2, self.Cdelt3 = 0.13, 0.13, 0.002
+        self.Crval1, self.Crval2 = 45.0, 30.0
+        self.xcoord = -1.3 + 0.065 + 0.13 * np.arange(self.naxis1)
+        self.ycoord = -1.17 + 0.065 + 0.13 * np.arange(self.naxis2)
+        self.zcoord = 5.001 + 0.002 * np.arange(self.naxis3)
+
+        self.a_wave, self.c_wave = [], []
+        self.a_weight, self.c_weight = [], []
+        self.transform_worldtov23, self.transform_v23toab = [], []
+        for ifile in range(nfiles):
+            subchannel = ['SHORT', 'MEDIUM', 'LONG'][ifile % 3]
+            a, c, wa, wc = CubeCloud.FindWaveWeights('1', subchannel)
+            self.a_wave.append(a)
+            self.c_wave.append(c)
+            self.a_weight.append(wa)
+            self.c_weight.append(wc)
+            self.transform_worldtov23.append(self._worldtov23(0.3 * ifile))
+            self.transform_v23toab.append(self._v23toab(0.3 * ifile))
+
+    def _worldtov23(self, angle):
+        def transform(ra, dec, lam):
+            return ((np.asarray(ra) - self.Crval1) * 3600. * math.cos(angle),
+                    (np.asarray(dec) - self.Crval2) * 3600. + 0.1 * angle,
+                    lam)
+        return transform
+
+    def _v23toab(self, angle):
+        def transform(v2, v3, lam):
+            return (v2 * math.cos(angle) - v3 * math.sin(angle),
+                    v2 * math.sin(angle) + v3 * math.cos(angle),
+                    np.asarray(lam) + 1e-4 * angle)
+        return transform
+
+
+def _make_cloud(rng, nfiles, npt):
+    """A point cloud of random members in and around the cube"""
+    cloud = np.zeros((10, npt))
+    cloud[0] = rng.uniform(-1.4, 1.4, npt)      # xi
+    cloud[1] = rng.uniform(-1.3, 1.3, npt)      # eta
+    cloud[2] = rng.uniform(4.99, 5.07, npt)     # wavelength
+    cloud[3] = rng.uniform(-1.4, 1.4, npt)      # alpha
+    cloud[4] = rng.uniform(-1.3, 1.3, npt)      # beta
+    cloud[5] = rng.normal(10., 2., npt)         # flux
+    cloud[7] = rng.randint(0, nfiles, npt)      # file
+    return cloud
+
+
+def _find_roi_per_member(step, cube, cloud):
+    """
+    The sums of the weights, weighted fluxes and members of each spaxel,
+    found one point cloud member and one spaxel at a time the way FindROI
+    used to
+    """
+    nplane = cube.naxis1 * cube.naxis2
+    ncube = nplane * cube.naxis3
+    weight_sum = np.zeros(ncube)
+    flux_sum = np.zeros(ncube)
+    count = np.zeros(ncube, dtype=int)
+    miripsf = (cube.instrument == 'MIRI' and step.weighting == 'miripsf')
+
+    for ipt in range(cloud.shape[1]):
+        coord1, coord2, wave = cloud[0, ipt], cloud[1, ipt], cloud[2, ipt]
+        alpha, beta = cloud[3, ipt], cloud[4, ipt]
+        ifile = int(cloud[7, ipt])
+        if miripsf:
+            weights = CubeCloud.FindNormalizationWeights(
+                cube.a_wave[ifile], cube.c_wave[ifile],
+                cube.a_weight[ifile], cube.c_weight[ifile], wave)
+        if cube.instrument == 'MIRI' and step.coord_system == 'alpha-beta':
+            coord1, coord2 = alpha, beta
+
+        indexz = np.where(abs(cube.zcoord - wave) <= step.roiw)[0]
+        indexx = np.where(abs(cube.xcoord - coord1) <= step.roi1)[0]
+        indexy = np.where(abs(cube.ycoord - coord2) <= step.roi2)[0]
+        for zz in indexz:
+            for yy in indexy:
+                for xx in indexx:
+                    xi = cube.xcoord[xx]
+                    eta = cube.ycoord[yy]
+                    zlam = cube.zcoord[zz]
+                    if miripsf:
+                        ra, dec = coord.std2radec(cube.Crval1, cube.Crval2,
+                                                  xi, eta)
+                        v2, v3, _ = cube.transform_worldtov23[ifile](
+                            ra, dec, zlam)
+                        alpha_spaxel, beta_spaxel, wave_spaxel = \
+                            cube.transform_v23toab[ifile](v2, v3, zlam)
+                        xn = (alpha - alpha_spaxel[0]) / weights[0]
+                        yn = (beta - beta_spaxel[0]) / weights[1]
+                        wn = abs(wave - wave_spaxel) / weights[2]
+                        distance = math.sqrt(xn * xn + yn * yn + wn * wn)
+                    else:
+                        d1 = (xi - coord1) / cube.Cdelt1
+                        d2 = (eta - coord2) / cube.Cdelt2
+                        d3 = (zlam - wave) / cube.Cdelt3
+                        distance = math.sqrt(d1 * d1 + d2 * d2 + d3 * d3)
+                    weight = 1.0 / max(math.pow(distance, step.weight_power),
+                                       0.01)
+
+                    cube_index = zz * nplane + yy * cube.naxis1 + xx
+                    weight_sum[cube_index] += weight
+                    flux_sum[cube_index] += weight * cloud[5, ipt]
+                    count[cube_index] += 1
+
+    return weight_sum, flux_sum, count
+
+
+def test_axis_range():
+    """The ranges of indices hold all the axis values within the ROI"""
+    rng = np.random.RandomState(1)
+    axis = 0.5 + 0.13 * np.arange(25)
+    values = rng.uniform(-0.5, 4.5, 500)
+    for roi in (0.01, 0.13, 0.4):
+        lower, upper = CubeCloud._axis_range(axis, values, roi)
+        for value, first, last in zip(values, lower, upper):
+            within = np.flatnonzero(np.abs(axis - value) <= roi)
+            assert np.all(within >= first)
+            assert np.all(within < last)
+            assert last - first <= len(within) + 2
+
+
+def test_find_normalization_weights():
+    """
+    The weights scale with the wavelength of each point, given last, and
+    the resolving power is interpolated between the ends of its band
+    """
+    a, c, wa, wc = CubeCloud.FindWaveWeights('2', 'LONG')
+    wavelength = np.array([wa - 0.5, wa, 0.5 * (wa + wc), wc, wc + 0.5])
+
+    alpha, beta, lam = CubeCloud.FindNormalizationWeights(a, c, wa, wc,
+                                                          wavelength)
+
+    assert_allclose(beta, 0.31 * wavelength / 8.0)
+    assert_allclose(alpha, np.where(wavelength < 8.0, 0.31, beta))
+    assert_allclose(wavelength / lam, [a, a, 0.5 * (a + c), c, c])
+
+    # A single point gets the same weights
+    single = CubeCloud.FindNormalizationWeights(a, c, wa, wc, wavelength[2])
+    assert_allclose(single, [alpha[2], beta[2], lam[2]])
+
+
+@pytest.mark.parametrize('instrument, weighting, coord_system', [
+    ('NIRSPEC', 'standard', 'ra-dec'),
+    ('MIRI', 'standard', 'ra-dec'),
+    ('MIRI', 'standard', 'alpha-beta'),
+    ('MIRI', 'miripsf', 'ra-dec'),
+    ('MIRI', 'miripsf', 'alpha-beta'),
+])
+def test_find_roi(monkeypatch, instrument, weighting, coord_system):
+    """
+    FindROI finds the members, weights and fluxes of each spaxel that the
+    loop over the point cloud members finds
+    """
+    # Small chunks, so that the members are handled in several of them
+    monkeypatch.setattr(CubeCloud, 'MAX_ROI_CANDIDATES', 5000)
+    rng = np.random.RandomState(2)
+    step = _Step(weighting, coord_system)
+    cube = _Cube(instrument, 3)
+    cloud = _make_cloud(rng, 3, 600)
+
+    weight_sum, flux_sum, count = CubeCloud.FindROI(step, cube, None, cloud)
+    expected_weight, expected_flux, expected_count = \
+        _find_roi_per_member(step, cube, cloud)
+
+    assert count.sum() > cloud.shape[1]
+    assert_array_equal(count, expected_count)
+    assert_allclose(weight_sum, expected_weight, rtol=1e-12)
+    assert_allclose(flux_sum, expected_flux, rtol=1e-12)
+
+
+def test_spaxel_alpha_beta():
+    """Each spaxel is transformed to the alpha-beta system of each file"""
+    rng = np.random.RandomState(3)
+    cube = _Cube('MIRI', 3)
+    npair = 200
+    ifile = rng.randint(0, 3, npair)
+    xx = rng.randint(0, cube.naxis1, npair)
+    yy = rng.randint(0, cube.naxis2, npair)
+    zz = rng.randint(0, cube.naxis3, npair)
+    # Some of the spaxels are paired with several members
+    xx[:50], yy[:50], zz[:50] = xx[50:100], yy[50:100], zz[50:100]
+
+    alpha, beta, wave = CubeCloud._spaxel_alpha_beta(cube, ifile, xx, yy, zz)
+
+    for i in range(npair):
+        ra, dec = coord.std2radec(cube.Crval1, cube.Crval2,
+                                  cube.xcoord[xx[i]], cube.ycoord[yy[i]])
+        zlam = cube.zcoord[zz[i]]
+        v2, v3, _ = cube.transform_worldtov23[ifile[i]](ra, dec, zlam)
+        expected = cube.transform_v23toab[ifile[i]](v2, v3, zlam)
+        assert_allclose([alpha[i], beta[i], wave[i]],
+                        [expected[0][0], expected[1][0], expected[2]],
+                        rtol=1e-12, atol=1e-12)
@@ -18,7 +18,7 @@ class DarkCurrentStep(Step):
     def process(self, input):
 
         # Open the input data model
-        with datamodels.open(input) as input_model:
+        with self.open_model(input) as input_model:
 
             # Get the name of the dark reference file to use
             self.dark_name = self.get_reference_file(input_model, 'dark')
@@ -35,13 +35,16 @@ class DarkCurrentStep(Step):
             # Open the dark ref file data model - based on Instrument
             instrument = input_model.meta.instrument.name
             if(instrument == 'MIRI'):
-                dark_model = datamodels.DarkMIRIModel(self.dark_name)
+                dark_model = self.open_reference_model(self.dark_name,
+                                                       datamodels.DarkMIRIModel)
             else:
-                dark_model = datamodels.DarkModel(self.dark_name)
+                dark_model = self.open_reference_model(self.dark_name,
+                                                       datamodels.DarkModel)
 
             # Do the dark correction
             result = dark_sub.do_correction(input_model, dark_model,
-                                                    self.dark_output)
+                                                    self.dark_output,
+                                                    self.in_place)
             dark_model.close()
 
 
@@ -12,7 +12,7 @@ log = logging.getLogger(__name__)
 log.setLevel(logging.DEBUG)
 
 
-def do_correction(input_model, dark_model, dark_output=None):
+def do_correction(input_model, dark_model, dark_output=None, in_place=False):
     """
     Short Summary
     -------------
@@ -29,6 +29,9 @@ def do_correction(input_model, dark_model, dark_output=None):
     dark_output: string
         file name in which to optionally save averaged dark data
 
+    in_place: bool
+        if True, correct the input model itself rather than a copy of it
+
     Returns
     -------
     output_model: data model object
@@ -36,6 +39,54 @@ def do_correction(input_model, dark_model, dark_output=None):
 
     """
 
+    # Get the dark data matching the science data
+    dark_data = match_dark(input_model, dark_model, dark_output)
+
+    if dark_data is None:
+        log.warning("Input will be returned without subtracting dark current.")
+        input_model.meta.cal_step.dark_sub = 'SKIPPED'
+        if in_place:
+            return input_model
+        return input_model.copy()
+
+    # Subtract the dark data from the science data
+    output_model = subtract_dark(input_model, dark_data, in_place)
+
+    if dark_data is not dark_model:
+        dark_data.close()
+
+    output_model.meta.cal_step.dark_sub = 'COMPLETE'
+
+    return output_model
+
+
+def match_dark(input_model, dark_model, dark_output=None):
+    """
+    Short Summary
+    -------------
+    Get the dark data to be subtracted from the science data: either the
+    dark reference data themselves, if their nframes and groupgap settings
+    match those of the science data, or a frame-averaged version of them.
+
+    Parameters
+    ----------
+    input_model: data model object
+        science data to be corrected
+
+    dark_model: dark model object
+        dark data
+
+    dark_output: string
+        file name in which to optionally save averaged dark data
+
+    Returns
+    -------
+    dark_data: dark model object
+        dark data matching the science data, or None if the dark data can
+        not be applied to the science data
+
+    """
+
     # Save some data params for easy use later
     instrument = input_model.meta.instrument.name
     sci_nints = input_model.data.shape[0]
@@ -62,57 +113,48 @@ def do_correction(input_model, dark_model, dark_output=None):
     if (sci_nframes + sci_groupgap) * sci_ngroups - sci_groupgap > drk_ngroups:
         log.warning("There are more groups in the science data than in the " +
         "dark data.")
-        log.warning("Input will be returned without subtracting dark current.")
-        input_model.meta.cal_step.dark_sub = 'SKIPPED'
-        return input_model.copy()
+        return None
 
     # Check that the value of nframes and groupgap in the dark
     # are not greater than those of the science data
     if drk_nframes > sci_nframes or drk_groupgap > sci_groupgap:
         log.warning("The value of nframes or groupgap in the dark data is " +
         "greater than that of the science data.")
-        log.warning("Input will be returned without subtracting dark current.")
-        input_model.meta.cal_step.dark_sub = 'SKIPPED'
-        return input_model.copy()
+        return None
 
-    # Replace NaN's in the dark with zeros
-    dark_model.data[np.isnan(dark_model.data)] = 0.0
+    # Replace NaN's in the dark with zeros.  The dark model is given a new
+    # data array rather than changing its array, which may be shared with
+    # other models (see jwst.stpipe.reference_cache) and read-only
+    nans = np.isnan(dark_model.data)
+    if nans.any():
+        dark_model.data = np.where(nans, 0.0, dark_model.data)
 
     # Check whether the dark and science data have matching
     # nframes and groupgap settings.
     if sci_nframes == drk_nframes and sci_groupgap == drk_groupgap:
 
         # They match, so we can subtract the dark ref file data directly
-        output_model = subtract_dark(input_model, dark_model)
+        return dark_model
 
-    else:
-
-        # Create a frame-averaged version of the dark data to match
-        # the nframes and groupgap settings of the science data.
-        # If the data are from MIRI, the darks are integration-dependent and
-        # we average them with a seperate routine.
-
-        if instrument == 'MIRI':
-            averaged_dark = average_MIRIdark_frames(dark_model, sci_nints,
-                            sci_ngroups, sci_nframes, sci_groupgap)
-        else:
-            averaged_dark = average_dark_frames(dark_model, sci_ngroups,
-                            sci_nframes, sci_groupgap)
-
-        # Save the frame-averaged dark data that was just created,
-        # if requested by the user
-        if dark_output is not None:
-            log.info('Writing averaged dark to %s', dark_output)
-            averaged_dark.save(dark_output)
-
-        # Subtract the frame-averaged dark data from the science data
-        output_model = subtract_dark(input_model, averaged_dark)
+    # Create a frame-averaged version of the dark data to match
+    # the nframes and groupgap settings of the science data.
+    # If the data are from MIRI, the darks are integration-dependent and
+    # we average them with a seperate routine.
 
-        averaged_dark.close()
+    if instrument == 'MIRI':
+        averaged_dark = average_MIRIdark_frames(dark_model, sci_nints,
+                        sci_ngroups, sci_nframes, sci_groupgap)
+    else:
+        averaged_dark = average_dark_frames(dark_model, sci_ngroups,
+                        sci_nframes, sci_groupgap)
 
-    output_model.meta.cal_step.dark_sub = 'COMPLETE'
+    # Save the frame-averaged dark data that was just created,
+    # if requested by the user
+    if dark_output is not None:
+        log.info('Writing averaged dark to %s', dark_output)
+        averaged_dark.save(dark_output)
 
-    return output_model
+    return averaged_dark
 
 
 def average_dark_frames(input_dark, ngroups, nframes, groupgap):
@@ -267,7 +309,7 @@ def average_MIRIdark_frames(input_dark, nints, ngroups, nframes, groupgap):
     return avg_dark
 
 
-def subtract_dark(input, dark):
+def subtract_dark(input, dark, in_place=False):
     """
     Subtracts dark current data from science arrays, combines
     error arrays in quadrature, and updates data quality array based on
@@ -281,6 +323,9 @@ def subtract_dark(input, dark):
     dark: dark model object
         the dark current data
 
+    in_place: bool
+        if True, subtract from the input model itself rather than a copy
+
     Returns
     -------
     output: data model object
@@ -298,8 +343,12 @@ def subtract_dark(input, dark):
               input.data.shape[0], input.data.shape[1],
               input.data.shape[2], input.data.shape[3])
 
-    # Create output as a copy of the input science data model
-    output = input.copy()
+    # Create output as a copy of the input science data model, unless the
+    # subtraction is to be done in place
+    if in_place:
+        output = input
+    else:
+        output = input.copy()
 
     if instrument == 'MIRI':
         # MIRI dark reference file has a DQ plane for each integration,
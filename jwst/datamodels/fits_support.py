@@ -30,7 +30,7 @@ from . import schema as mschema
 from . import util
 
 
-__all__ = ['to_fits', 'from_fits', 'fits_hdu_name', 'get_hdu']
+__all__ = ['to_fits', 'from_fits', 'load_array', 'fits_hdu_name', 'get_hdu']
 
 
 _builtin_regexes = [
@@ -441,7 +441,7 @@ def _fits_keyword_loader(hdulist, fits_keyword, schema, hdu_index, known_keyword
     return val
 
 
-def _fits_array_loader(hdulist, schema, hdu_index, known_datas):
+def _fits_array_loader(hdulist, schema, hdu_index, known_datas, lazy=False):
     hdu_name = _get_hdu_name(schema)
     _assert_non_primary_hdu(hdu_name)
     try:
@@ -450,8 +450,15 @@ def _fits_array_loader(hdulist, schema, hdu_index, known_datas):
         return None
 
     known_datas.add(hdu)
+    if lazy:
+        return hdu
+
+    return _load_hdu_array(hdu, schema)
+
+
+def _load_hdu_array(hdu, schema):
     data = hdu.data
-    
+
     data2 = properties._cast(data, schema)
 
     # Casting a table loses the listeners, so restore them
@@ -474,7 +481,7 @@ def _schema_has_fits_hdu(schema):
 
 
 def _load_from_schema(hdulist, schema, tree, validate=True,
-                      pass_invalid_values=False):
+                      pass_invalid_values=False, lazy_arrays=None):
     known_keywords = {}
     known_datas = set()
 
@@ -506,9 +513,14 @@ def _load_from_schema(hdulist, schema, tree, validate=True,
 
         elif 'fits_hdu' in schema and (
                 'max_ndim' in schema or 'ndim' in schema or 'datatype' in schema):
+            # Only the arrays at the top level of the tree are deferred
+            lazy = (lazy_arrays is not None and len(path) == 1 and
+                    isinstance(path[0], six.string_types))
             result = _fits_array_loader(
-                hdulist, schema, ctx.get('hdu_index'), known_datas)
-            if result is not None:
+                hdulist, schema, ctx.get('hdu_index'), known_datas, lazy)
+            if result is not None and lazy:
+                lazy_arrays[path[0]] = (result, schema)
+            elif result is not None:
                 temp_schema = {
                     '$schema':
                     'http://stsci.edu/schemas/asdf-schema/0.1.0/asdf-schema'}
@@ -568,13 +580,33 @@ def _load_history(hdulist, tree):
 
 
 def from_fits(hdulist, schema, extensions=None, validate=True,
-              pass_invalid_values=False):
+              pass_invalid_values=False, lazy_arrays=None):
+    """
+    Load a tree from a FITS file.
+
+    If `lazy_arrays` is a dict, the arrays at the top level of the tree
+    are not read, but are stored in it as (hdu, schema) pairs keyed by
+    name, so that they can be read later with `load_array`.
+    """
     ff = fits_embed.AsdfInFits.open(hdulist, extensions=extensions)
 
     known_keywords, known_datas = _load_from_schema(
         hdulist, schema, ff.tree, validate,
-        pass_invalid_values=pass_invalid_values)
+        pass_invalid_values=pass_invalid_values, lazy_arrays=lazy_arrays)
     _load_extra_fits(hdulist, known_keywords, known_datas, ff.tree)
     _load_history(hdulist, ff.tree)
 
     return ff
+
+
+def load_array(hdu, schema):
+    """
+    Read an array deferred by `from_fits` from its HDU.
+    """
+    data = _load_hdu_array(hdu, schema)
+    temp_schema = {
+        '$schema':
+        'http://stsci.edu/schemas/asdf-schema/0.1.0/asdf-schema'}
+    temp_schema.update(schema)
+    asdf_schema.validate(data, schema=temp_schema)
+    return data
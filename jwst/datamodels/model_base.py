@@ -41,7 +41,7 @@ class DataModel(properties.ObjectNode):
     schema_url = "core.schema.yaml"
 
     def __init__(self, init=None, schema=None, extensions=None,
-                 pass_invalid_values=False):
+                 pass_invalid_values=False, lazy=False):
         """
         Parameters
         ----------
@@ -74,7 +74,13 @@ class DataModel(properties.ObjectNode):
 
         pass_invalid_values: If True, values that do not validate the schema can
             be read and written, but with a warning message
+
+        lazy: If True, the arrays of a FITS file are not read when the
+            model is opened, but the first time they are accessed, which
+            must be before the model is closed.
         """
+        self._lazy_arrays = {}
+
         filename = os.path.abspath(inspect.getfile(self.__class__))
         base_url = os.path.join(
             os.path.dirname(filename), 'schemas', '')
@@ -103,6 +109,7 @@ class DataModel(properties.ObjectNode):
             self._pass_invalid_values = pass_invalid_values
 
         self._files_to_close = []
+        lazy_arrays = self._lazy_arrays if lazy else None
         is_array = False
         is_shape = False
         shape = None
@@ -115,6 +122,7 @@ class DataModel(properties.ObjectNode):
             shape = init.shape
             is_array = True
         elif isinstance(init, self.__class__):
+            init._load_lazy_arrays()
             instance = copy.deepcopy(init._instance)
             self._schema = init._schema
             self._shape = init._shape
@@ -140,7 +148,8 @@ class DataModel(properties.ObjectNode):
             asdf = fits_support.from_fits(init, self._schema,
                                           extensions=self._extensions,
                                           validate=False,
-                                          pass_invalid_values=self._pass_invalid_values)
+                                          pass_invalid_values=self._pass_invalid_values,
+                                          lazy_arrays=lazy_arrays)
         elif isinstance(init, six.string_types):
             if isinstance(init, bytes):
                 init = init.decode(sys.getfilesystemencoding())
@@ -157,7 +166,8 @@ class DataModel(properties.ObjectNode):
                 asdf = fits_support.from_fits(hdulist, self._schema,
                                               extensions=self._extensions,
                                               validate=False,
-                                              pass_invalid_values=self._pass_invalid_values)
+                                              pass_invalid_values=self._pass_invalid_values,
+                                              lazy_arrays=lazy_arrays)
                 self._files_to_close.append(hdulist)
         else:
             raise ValueError(
@@ -212,6 +222,7 @@ class DataModel(properties.ObjectNode):
         """
         Returns a deep copy of this model.
         """
+        self._load_lazy_arrays()
         result = self.__class__(
             init=copy.deepcopy(self._instance, memo=memo),
             schema=self._schema,
@@ -221,6 +232,14 @@ class DataModel(properties.ObjectNode):
 
     __copy__ = __deepcopy__ = copy
 
+    def _load_lazy_arrays(self):
+        """
+        Reads all of the arrays that have not been read yet, for the
+        operations that work on the whole tree.
+        """
+        for attr in list(self._lazy_arrays):
+            getattr(self, attr)
+
     def get_primary_array_name(self):
         """
         Returns the name "primary" array for this model, which
@@ -311,6 +330,7 @@ class DataModel(properties.ObjectNode):
             `asdf.AsdfFile.write_to`.
         """
         self.on_save(init)
+        self._load_lazy_arrays()
 
         AsdfFile(self._instance, extensions=self._extensions).write_to(init, *args, **kwargs)
 
@@ -349,6 +369,7 @@ class DataModel(properties.ObjectNode):
             `astropy.io.fits.writeto`.
         """
         self.on_save(init)
+        self._load_lazy_arrays()
 
         with fits_support.to_fits(self._instance, self._schema,
                                   extensions=self._extensions) as ff:
@@ -357,18 +378,34 @@ class DataModel(properties.ObjectNode):
     @property
     def shape(self):
         if self._shape is None:
-            if self.get_primary_array_name() in self._instance:
-                return getattr(self, self.get_primary_array_name()).shape
+            primary_array_name = self.get_primary_array_name()
+            if (primary_array_name in self._instance or
+                    primary_array_name in self._lazy_arrays):
+                return getattr(self, primary_array_name).shape
             else:
                 return None
         return self._shape
 
+    def __getattr__(self, attr):
+        lazy_arrays = self.__dict__.get('_lazy_arrays')
+        if lazy_arrays and attr in lazy_arrays:
+            hdu, schema = lazy_arrays.pop(attr)
+            self._instance[attr] = fits_support.load_array(hdu, schema)
+        return super(DataModel, self).__getattr__(attr)
+
     def __setattr__(self, attr, value):
         if attr == 'shape':
             object.__setattr__(self, attr, value)
         else:
+            self.__dict__.get('_lazy_arrays', {}).pop(attr, None)
             super(DataModel, self).__setattr__(attr, value)
 
+    def __delattr__(self, attr):
+        if attr in self.__dict__.get('_lazy_arrays', {}):
+            del self._lazy_arrays[attr]
+        else:
+            super(DataModel, self).__delattr__(attr)
+
     def extend_schema(self, new_schema):
         """
         Extend the model's schema using the given schema, by combining
@@ -526,6 +563,7 @@ class DataModel(properties.ObjectNode):
             elif tree is not None:
                 yield (str('.'.join(six.text_type(x) for x in path)), tree)
 
+        self._load_lazy_arrays()
         for x in recurse(self._instance):
             yield x
 
@@ -112,6 +112,22 @@ def test_from_scratch():
             assert np.all(dm2.data == data)
 
 
+def test_lazy():
+    with ImageModel((50, 50)) as dm:
+        data = np.asarray(np.random.rand(50, 50), np.float32)
+        dm.data[...] = data
+        dm.to_fits(TMP_FITS, overwrite=True)
+
+    with ImageModel(TMP_FITS, lazy=True) as dm:
+        assert 'data' not in dm._instance
+        assert dm.shape == (50, 50)
+        assert_array_equal(dm.data, data)
+        assert 'data' in dm._instance
+
+        dm2 = dm.copy()
+        assert_array_equal(dm2.data, data)
+
+
 def test_delete():
     with DataModel(FITS_FILE) as dm:
         dm.meta.instrument.name = 'NIRCAM'
@@ -0,0 +1,4 @@
+from __future__ import absolute_import
+from .detector_core_step import DetectorCoreStep
+
+__version__ = '0.7.0'
@@ -0,0 +1,237 @@
+from __future__ import division
+
+#
+#  Module for applying the saturation, superbias, linearity and dark current
+#  corrections to science data sets in a single pass
+#
+
+import numpy as np
+import logging
+
+from ..datamodels import dqflags
+from ..saturation import saturation
+from ..saturation import x_irs2
+from ..superbias import bias_sub
+from ..linearity import linearity
+from ..dark_current import dark_sub
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+
+
+def can_fuse(input_model):
+    """
+    Short Summary
+    -------------
+    Determine whether the fused corrections can be applied to a science data
+    set. They are not available for MIRI exposures (for which the dark
+    reference data are integration-dependent and there is no superbias) or
+    for data in IRS2 format, which are corrected by the individual steps.
+
+    Parameters
+    ----------
+    input_model: data model object
+        science data to be corrected
+
+    Returns
+    -------
+    True or False
+
+    """
+
+    if input_model.meta.instrument.name == 'MIRI':
+        return False
+
+    return not x_irs2.is_irs2(input_model)
+
+
+def do_correction(input_model, sat_model, bias_model, lin_model, dark_model,
+                  dark_output=None, in_place=False):
+    """
+    Short Summary
+    -------------
+    Apply the saturation, superbias, linearity and dark current corrections
+    to the science data, in that order, in a single pass over the groups of
+    each integration, rather than in a separate pass over the whole data set
+    for each correction. The results are identical to those of the
+    saturation, superbias, linearity and dark_current steps.
+
+    A reference model that is None causes the corresponding correction to
+    be skipped.
+
+    Parameters
+    ----------
+    input_model: data model object
+        science data to be corrected
+
+    sat_model: saturation model object
+        saturation reference data
+
+    bias_model: super-bias model object
+        bias data
+
+    lin_model: linearity model object
+        linearity reference data
+
+    dark_model: dark model object
+        dark data
+
+    dark_output: string
+        file name in which to optionally save averaged dark data
+
+    in_place: bool
+        if True, correct the input model itself rather than a copy of it
+
+    Returns
+    -------
+    output_model: data model object
+        corrected science data
+
+    """
+
+    # Create the output model as a copy of the input, unless the
+    # corrections are to be done in place
+    if in_place:
+        output_model = input_model
+    else:
+        output_model = input_model.copy()
+
+    # Get the reference data for each correction, extracting subarrays
+    # and propagating the reference file DQ flags into the PIXELDQ array
+    satmask = None
+    if sat_model is not None:
+        satmask, dqmask = saturation.get_sat_thresholds(output_model,
+                                                        sat_model)
+        output_model.pixeldq = np.bitwise_or(output_model.pixeldq, dqmask)
+
+    bias = None
+    if bias_model is not None:
+        # Replace NaN's in the superbias with zeros, in a new data array
+        # as in bias_sub.do_correction
+        nans = np.isnan(bias_model.data)
+        if nans.any():
+            bias_model.data = np.where(nans, 0.0, bias_model.data)
+        if not bias_sub.ref_matches_sci(bias_model, output_model):
+            bias_model = bias_sub.get_subarray(bias_model, output_model)
+        output_model.pixeldq = np.bitwise_or(output_model.pixeldq,
+                                             bias_model.dq)
+        bias = bias_model.data
+
+    lin_coeffs = None
+    if lin_model is not None:
+        linearity.propagate_dq_info(output_model, lin_model)
+        lin_coeffs = linearity.get_coeffs(output_model, lin_model)
+
+    dark_data = None
+    if dark_model is not None:
+        dark_data = dark_sub.match_dark(output_model, dark_model, dark_output)
+        if dark_data is None:
+            log.warning("Dark current will not be subtracted.")
+        else:
+            output_model.pixeldq = np.bitwise_or(output_model.pixeldq,
+                                                 dark_data.dq)
+
+    # Apply the corrections to each group in turn
+    apply_corrections(output_model.data, output_model.groupdq, satmask, bias,
+                      lin_coeffs, None if dark_data is None else dark_data.data)
+
+    if dark_data is not None and dark_data is not dark_model:
+        dark_data.close()
+
+    # Update the step status for each correction
+    for step, done in (('saturation', satmask is not None),
+                       ('superbias', bias is not None),
+                       ('linearity', lin_coeffs is not None),
+                       ('dark_sub', dark_data is not None)):
+        setattr(output_model.meta.cal_step, step,
+                'COMPLETE' if done else 'SKIPPED')
+
+    return output_model
+
+
+def apply_corrections(ramparr, dqarr, satmask, bias, lin_coeffs, dark):
+    """
+    Short Summary
+    -------------
+    Apply the saturation, superbias, linearity and dark current corrections
+    to the ramp data in place, one group at a time, so that the ramp data
+    are read and written only once, and without creating temporary arrays
+    the size of a group. Any of the reference arrays may be None, to skip
+    that correction.
+
+    Groups that are at or above the saturation threshold are flagged in that
+    and all following groups, and are not linearity corrected.
+
+    Parameters
+    ----------
+    ramparr: 4D array
+        ramp data, corrected in place
+
+    dqarr: 4D array
+        GROUPDQ array, updated in place with the saturation flags
+
+    satmask: 2D array
+        saturation thresholds
+
+    bias: 2D array
+        superbias image
+
+    lin_coeffs: 3D array
+        pixel-by-pixel linearity coefficient values for each term in the
+        polynomial fit
+
+    dark: 3D array
+        dark current data for each group
+
+    Returns
+    -------
+
+    """
+
+    nints, ngroups, nrows, ncols = ramparr.shape
+    sat_flag = dqflags.group['SATURATED']
+
+    # Work arrays for a single group, allocated once and reused
+    is_sat = np.zeros((nrows, ncols), dtype=bool)
+    newflags = np.zeros((nrows, ncols), dtype=dqarr.dtype)
+    dq_sat_flag = dqarr.dtype.type(sat_flag)
+    if lin_coeffs is not None:
+        ncoeffs = lin_coeffs.shape[0]
+        scorr = np.zeros((nrows, ncols), dtype=ramparr.dtype)
+        satdq = np.zeros((nrows, ncols), dtype=dqarr.dtype)
+
+    for ints in range(nints):
+
+        # Saturation flags found so far in this integration
+        satflags = np.zeros((nrows, ncols), dtype=dqarr.dtype)
+
+        for plane in range(ngroups):
+            data = ramparr[ints, plane]
+            dq = dqarr[ints, plane]
+
+            # Flag saturation in this group and, through satflags, in all
+            # of the following groups
+            if satmask is not None:
+                np.greater_equal(data, satmask, out=is_sat)
+                np.multiply(is_sat, dq_sat_flag, out=newflags)
+                np.bitwise_or(satflags, newflags, out=satflags)
+                np.bitwise_or(dq, satflags, out=dq)
+
+            # Subtract the superbias
+            if bias is not None:
+                data -= bias
+
+            # Apply the linearity correction where the group is not
+            # flagged as saturated
+            if lin_coeffs is not None:
+                np.multiply(lin_coeffs[ncoeffs - 1], data, out=scorr)
+                for j in range(ncoeffs - 2, 0, -1):
+                    scorr += lin_coeffs[j]
+                    scorr *= data
+                scorr += lin_coeffs[0]
+                np.bitwise_and(dq, sat_flag, out=satdq)
+                np.copyto(data, scorr, where=(satdq == 0))
+
+            # Subtract the dark current
+            if dark is not None:
+                data -= dark[plane]
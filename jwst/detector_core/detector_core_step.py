@@ -0,0 +1,105 @@
+#! /usr/bin/env python
+
+from ..stpipe import Step
+from .. import datamodels
+from ..saturation import saturation
+from ..superbias import bias_sub
+from ..linearity import linearity
+from ..dark_current import dark_sub
+from . import detector_core
+
+
+class DetectorCoreStep(Step):
+    """
+    DetectorCoreStep: Applies the saturation, superbias, linearity and dark
+    current corrections in a single pass over the input science data. The
+    results are the same as those of the SaturationStep, SuperBiasStep,
+    LinearityStep and DarkCurrentStep run in turn.
+    """
+
+    spec = """
+        dark_output = output_file(default = None)
+    """
+
+    reference_file_types = ['saturation', 'superbias', 'linearity', 'dark']
+
+    def process(self, input):
+
+        # Open the input data model
+        with self.open_model(input) as input_model:
+
+            # Open the reference file data models; a missing reference file
+            # causes the corresponding correction to be skipped
+            instrument = input_model.meta.instrument.name
+            sat_model = self.open_ref_model(input_model, 'saturation',
+                                            datamodels.SaturationModel)
+            if instrument == 'MIRI':
+                bias_model = None
+            else:
+                bias_model = self.open_ref_model(input_model, 'superbias',
+                                                 datamodels.SuperBiasModel)
+            lin_model = self.open_ref_model(input_model, 'linearity',
+                                            datamodels.LinearityModel)
+            if instrument == 'MIRI':
+                dark_model = self.open_ref_model(input_model, 'dark',
+                                                 datamodels.DarkMIRIModel)
+            else:
+                dark_model = self.open_ref_model(input_model, 'dark',
+                                                 datamodels.DarkModel)
+
+            if detector_core.can_fuse(input_model):
+
+                # Do all of the corrections in one pass
+                result = detector_core.do_correction(input_model, sat_model,
+                            bias_model, lin_model, dark_model,
+                            self.dark_output, self.in_place)
+            else:
+
+                # Do the corrections one at a time, as the individual steps
+                # would, except that only the first one makes a copy
+                self.log.info('Applying the corrections one at a time')
+                result = input_model
+                in_place = self.in_place
+                for ref_model, correction, status in (
+                        (sat_model, saturation.do_correction, 'saturation'),
+                        (bias_model, bias_sub.do_correction, 'superbias'),
+                        (lin_model, linearity.do_correction, 'linearity')):
+                    if ref_model is None:
+                        setattr(result.meta.cal_step, status, 'SKIPPED')
+                        continue
+                    result = correction(result, ref_model, in_place)
+                    setattr(result.meta.cal_step, status, 'COMPLETE')
+                    in_place = True
+                if dark_model is None:
+                    result.meta.cal_step.dark_sub = 'SKIPPED'
+                else:
+                    result = dark_sub.do_correction(result, dark_model,
+                                                    self.dark_output, in_place)
+                if result is input_model and not self.in_place:
+                    result = input_model.copy()
+
+            # Close the reference files
+            for ref_model in (sat_model, bias_model, lin_model, dark_model):
+                if ref_model is not None:
+                    ref_model.close()
+
+        return result
+
+    def open_ref_model(self, input_model, reference_file_type, model_class):
+        """
+        Open the reference file of the given type as an instance of
+        model_class, or return None if there is no such reference file.
+        """
+        ref_name = self.get_reference_file(input_model, reference_file_type)
+        self.log.info('Using %s reference file %s',
+                      reference_file_type.upper(), ref_name)
+
+        # Check for a valid reference file
+        if ref_name == 'N/A':
+            self.log.warning('No %s reference file found',
+                             reference_file_type.upper())
+            self.log.warning('The %s correction will be skipped',
+                             reference_file_type)
+            return None
+
+        return self.open_reference_model(ref_name, model_class)
@@ -0,0 +1,109 @@
+"""
+Tests of the fused saturation, superbias, linearity and dark corrections
+"""
+from __future__ import absolute_import, division
+
+import numpy as np
+from numpy.testing import assert_array_equal
+import pytest
+
+from ... import datamodels
+from ...datamodels import dqflags
+from ...saturation import saturation
+from ...superbias import bias_sub
+from ...linearity import linearity
+from ...dark_current import dark_sub
+from .. import detector_core
+
+SHAPE = (20, 30)
+
+
+def _set_subarray(model):
+    model.meta.subarray.xstart = 1
+    model.meta.subarray.xsize = SHAPE[1]
+    model.meta.subarray.ystart = 1
+    model.meta.subarray.ysize = SHAPE[0]
+
+
+@pytest.fixture(params=[(1, 5, 1), (2, 4, 3)],
+                ids=['one_frame', 'frame_averaged'])
+def models(request):
+    """
+    A ramp model and the saturation, superbias, linearity and dark models
+    to correct it, with NaNs and flags in the reference data
+    """
+    nints, ngroups, nframes = request.param
+    rng = np.random.RandomState(ngroups)
+
+    data = (1000. + np.cumsum(rng.uniform(0., 8000., size=(nints, ngroups) +
+                                          SHAPE), axis=1)).astype(np.float32)
+    model = datamodels.RampModel(
+        data=data, groupdq=np.zeros(data.shape, dtype=np.uint8),
+        pixeldq=np.zeros(SHAPE, dtype=np.uint32),
+        err=np.zeros(data.shape, dtype=np.float32))
+    model.meta.instrument.name = 'NIRCAM'
+    model.meta.instrument.detector = 'NRCA1'
+    model.meta.exposure.nframes = nframes
+    model.meta.exposure.groupgap = 0
+    _set_subarray(model)
+
+    sat_dq = np.zeros(SHAPE, dtype=np.uint32)
+    sat_dq[rng.uniform(size=SHAPE) < 0.05] = dqflags.pixel['NO_SAT_CHECK']
+    sat_data = rng.uniform(10000., 40000., size=SHAPE).astype(np.float32)
+    sat_data[rng.uniform(size=SHAPE) < 0.05] = np.nan
+    sat_model = datamodels.SaturationModel(data=sat_data, dq=sat_dq)
+
+    bias_data = rng.normal(500., 50., size=SHAPE).astype(np.float32)
+    bias_data[rng.uniform(size=SHAPE) < 0.05] = np.nan
+    bias_dq = np.zeros(SHAPE, dtype=np.uint32)
+    bias_dq[rng.uniform(size=SHAPE) < 0.05] = dqflags.pixel['DO_NOT_USE']
+    bias_model = datamodels.SuperBiasModel(
+        data=bias_data, dq=bias_dq, err=np.zeros(SHAPE, dtype=np.float32))
+    _set_subarray(bias_model)
+
+    coeffs = np.zeros((4,) + SHAPE, dtype=np.float32)
+    coeffs[1] = 1.
+    coeffs[2] = rng.uniform(0., 1e-6, size=SHAPE)
+    coeffs[3] = rng.uniform(0., 1e-11, size=SHAPE)
+    coeffs[2][rng.uniform(size=SHAPE) < 0.05] = np.nan
+    lin_dq = np.zeros(SHAPE, dtype=np.uint32)
+    lin_dq[rng.uniform(size=SHAPE) < 0.05] = dqflags.pixel['NO_LIN_CORR']
+    lin_model = datamodels.LinearityModel(coeffs=coeffs, dq=lin_dq)
+
+    dark_data = rng.normal(5., 2., size=(ngroups * nframes,) +
+                           SHAPE).astype(np.float32)
+    dark_data[0][rng.uniform(size=SHAPE) < 0.05] = np.nan
+    dark_dq = np.zeros(SHAPE, dtype=np.uint32)
+    dark_dq[rng.uniform(size=SHAPE) < 0.05] = dqflags.pixel['HOT']
+    dark_model = datamodels.DarkModel(
+        data=dark_data, dq=dark_dq,
+        err=np.zeros(dark_data.shape, dtype=np.float32))
+    dark_model.meta.exposure.nframes = 1
+    dark_model.meta.exposure.groupgap = 0
+
+    return model, sat_model, bias_model, lin_model, dark_model
+
+
+def test_do_correction(models):
+    """The fused corrections give the results of the four steps in turn"""
+    model, sat_model, bias_model, lin_model, dark_model = models
+    data = model.data.copy()
+
+    expected = saturation.do_correction(model, sat_model)
+    expected = bias_sub.do_correction(expected, bias_model)
+    expected = linearity.do_correction(expected, lin_model)
+    expected = dark_sub.do_correction(expected, dark_model)
+
+    # The reference models can be used again: only their data arrays
+    # without NaN's have been replaced
+    result = detector_core.do_correction(model, sat_model, bias_model,
+                                         lin_model, dark_model)
+
+    assert result is not model
+    assert_array_equal(model.data, data)
+    assert_array_equal(result.data, expected.data)
+    assert_array_equal(result.groupdq, expected.groupdq)
+    assert_array_equal(result.pixeldq, expected.pixeldq)
+    assert_array_equal(result.err, expected.err)
+    for step in ('saturation', 'superbias', 'dark_sub'):
+        assert getattr(result.meta.cal_step, step) == 'COMPLETE'
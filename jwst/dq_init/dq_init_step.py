@@ -16,7 +16,7 @@ class DQInitStep(Step):
 
     def process(self, input):
 
-        with datamodels.open(input) as input_model:
+        with self.open_model(input) as input_model:
 
             # Check for consistency between keyword values and data shape
             nints, ngroups, ysize, xsize = input_model.data.shape
@@ -50,10 +50,12 @@ class DQInitStep(Step):
                 return result
 
             # Load the reference file
-            mask_model = datamodels.MaskModel(self.mask_filename)
+            mask_model = self.open_reference_model(self.mask_filename,
+                                                   datamodels.MaskModel)
 
             # Apply the step
-            result = dq_initialization.correct_model(input_model, mask_model)
+            result = dq_initialization.correct_model(input_model, mask_model,
+                                                    self.in_place)
 
             # Close the reference file
             mask_model.close()
@@ -15,19 +15,22 @@ from .. import datamodels
 log = logging.getLogger(__name__)
 log.setLevel(logging.DEBUG)
 
-def correct_model(input_model, mask_model):
+def correct_model(input_model, mask_model, in_place=False):
     """DQ Initialize a JWST Model"""
 
-    output_model = do_dqinit(input_model, mask_model)
+    output_model = do_dqinit(input_model, mask_model, in_place)
 
     return output_model
 
-def do_dqinit(input_model, mask_model):
-    """Do the DQ initialization"""
+def do_dqinit(input_model, mask_model, in_place=False):
+    """Do the DQ initialization, in place if in_place is True"""
 
     check_dimensions(input_model)
 
-    output_model = input_model.copy()
+    if in_place:
+        output_model = input_model
+    else:
+        output_model = input_model.copy()
 
     if is_subarray(output_model):
         log.debug('input exposure is a subarray readout')
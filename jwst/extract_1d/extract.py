@@ -10,6 +10,8 @@ import numpy as np
 import json
 from astropy.modeling import polynomial
 from .. import datamodels
+from ..assign_wcs.util import get_wavelengths
+from ..lib import parallel
 from . import extract1d
 from . import ifu
 
@@ -647,6 +649,11 @@ class ExtractModel(object):
             self.wcs = input_model.meta.wcs
         else:
             self.wcs = None
+        # Wavelengths at every pixel, if an earlier step stored them
+        self._wavelengths = None
+        if self.wcs is not None:
+            self._wavelengths = get_wavelengths(input_model, compute=False)
+        self._wavelength = None
         self._wave_model = None
 
         # If source extraction coefficients src_coeff were specified, this
@@ -796,23 +803,13 @@ class ExtractModel(object):
                     self.p_bkg.append([lower, upper])
                 expect_lower = not expect_lower
 
-    def extract(self, data):
-        """
-        Do the actual extraction.
-
-        Parameters
-        ----------
-        data: array_like (2-D)
-            Data array for one slit of a MultiSlitModel object.
+    def dispersion_range(self):
+        """The limits of a slice in the dispersion direction.
 
         Returns
         -------
-        (wavelength, net, background)
-            These are all 1-D arrays.  `wavelength` is the wavelength in
-            micrometers at each pixel.  `net` is the count rate
-            (counts / s) minus the background at each pixel.  `background`
-            is the background count rate that was subtracted from the total
-            source count rate to get `net`.
+        (slice0, slice1): tuple of int
+            The first pixel to extract and the pixel after the last one.
         """
 
         # We need integer values that are the limits of a slice in the
@@ -824,6 +821,27 @@ class ExtractModel(object):
             slice0 = int(round(self.ystart))
             slice1 = int(round(self.ystop)) + 1
 
+        return (slice0, slice1)
+
+    def get_wavelength(self):
+        """The wavelength at each pixel of the extracted spectrum.
+
+        These are computed the first time they are needed, and then kept,
+        so the same array is returned for all data extracted with this
+        object; it should not be modified.
+
+        Returns
+        -------
+        wavelength: 1-D ndarray
+            The wavelength in micrometers at each pixel, or the pixel
+            number if there is neither a WCS nor a wavelength model.
+        """
+
+        if self._wavelength is not None:
+            return self._wavelength
+
+        (slice0, slice1) = self.dispersion_range()
+
         # x_array and y_array are just used for computing the wavelengths.
         if self.dispaxis == HORIZONTAL:
             x_array = np.arange(slice0, slice1, dtype=np.float64)
@@ -834,7 +852,14 @@ class ExtractModel(object):
             x_array = np.empty(y_array.shape, dtype=np.float64)
             x_array.fill((self.xstart + self.xstop) / 2.)
 
-        if self.wcs is not None:
+        wavelength = None
+        if self._wavelengths is not None:
+            wavelength = self._stored_wavelengths(slice0, slice1)
+
+        if wavelength is not None:
+            pass                        # taken from the stored wavelengths
+
+        elif self.wcs is not None:
             _, _, wavelength = self.wcs(x_array, y_array)
 
         elif self._wave_model is not None:
@@ -842,21 +867,10 @@ class ExtractModel(object):
                 wavelength = self._wave_model(x_array)
             else:
                 wavelength = self._wave_model(y_array)
-
-        else:
-            wavelength = None
         del x_array, y_array
 
-        # Range (slice) of pixel numbers in the dispersion direction.
-        disp_range = [slice0, slice1]
-        if self.dispaxis == HORIZONTAL:
-            image = data
-            if wavelength is None:
-                wavelength = np.arange(slice0, slice1, dtype=np.float64)
-        else:
-            image = np.transpose(data, (1, 0))
-            if wavelength is None:
-                wavelength = np.arange(slice0, slice1, dtype=np.float64)
+        if wavelength is None:
+            wavelength = np.arange(slice0, slice1, dtype=np.float64)
 
         mask = np.isnan(wavelength)
         n_nan = mask.sum(dtype=np.float64)
@@ -865,6 +879,37 @@ class ExtractModel(object):
             wavelength[mask] = 0.01         # workaround
         del mask
 
+        self._wavelength = wavelength
+        return wavelength
+
+    def extract(self, data):
+        """
+        Do the actual extraction.
+
+        Parameters
+        ----------
+        data: array_like (2-D)
+            Data array for one slit of a MultiSlitModel object.
+
+        Returns
+        -------
+        (wavelength, net, background)
+            These are all 1-D arrays.  `wavelength` is the wavelength in
+            micrometers at each pixel.  `net` is the count rate
+            (counts / s) minus the background at each pixel.  `background`
+            is the background count rate that was subtracted from the total
+            source count rate to get `net`.
+        """
+
+        wavelength = self.get_wavelength()
+
+        # Range (slice) of pixel numbers in the dispersion direction.
+        disp_range = list(self.dispersion_range())
+        if self.dispaxis == HORIZONTAL:
+            image = data
+        else:
+            image = np.transpose(data, (1, 0))
+
         # src total flux, area, total weight
         (net, background) = \
         extract1d.extract1d(image, wavelength, disp_range,
@@ -874,6 +919,33 @@ class ExtractModel(object):
 
         return (wavelength, net, background)
 
+    def _stored_wavelengths(self, slice0, slice1):
+        """Take the wavelengths along the middle of the extraction region
+        from the stored wavelengths.
+
+        This is possible only if the middle of the region in the
+        cross-dispersion direction is at the center of a pixel, where the
+        stored wavelengths are exactly those the WCS would give.
+
+        Returns
+        -------
+        1-D ndarray or None
+            The wavelength at each pixel from `slice0` to `slice1` in the
+            dispersion direction, or None if it must be computed from the
+            WCS.
+        """
+        if self.dispaxis == HORIZONTAL:
+            middle = (self.ystart + self.ystop) / 2.
+            wavelengths = self._wavelengths
+        else:
+            middle = (self.xstart + self.xstop) / 2.
+            wavelengths = self._wavelengths.T
+        if (middle != int(middle) or middle < 0 or
+                middle >= wavelengths.shape[0] or
+                slice0 < 0 or slice1 > wavelengths.shape[1]):
+            return None
+        return wavelengths[int(middle), slice0:slice1].copy()
+
     def __del__(self):
         self.dispaxis = None
         self.xstart = None
@@ -890,6 +962,8 @@ class ExtractModel(object):
         self.bkg_order = None
         self.nod_correction = None
         self.wcs = None
+        self._wavelengths = None
+        self._wavelength = None
         self._wave_model = None
 
 
@@ -947,7 +1021,8 @@ def interpolate_response(wavelength, relsens):
     return r_factor
 
 
-def do_extract1d(input_model, refname, smoothing_length, bkg_order):
+def do_extract1d(input_model, refname, smoothing_length, bkg_order,
+                 maximum_cores='none', parallel_backend='thread'):
 
     output_model = datamodels.MultiSpecModel()
     output_model.update(input_model)
@@ -1057,29 +1132,36 @@ def do_extract1d(input_model, refname, smoothing_length, bkg_order):
                 log.warning("No relsens for input file, "
                             "so can't compute flux.")
 
-            # Loop over each integration in the input model
-            for integ in range(input_model.data.shape[0]):
-                # Extract spectrum
-                wavelength, net, background = \
-                        extract_one_slit(input_model, integ,
-                                         input_model.meta,
-                                         slitname, **extract_params)
-                dq = np.zeros(net.shape, dtype=np.int32)
+            # The extraction region, the wavelengths and the response are
+            # the same for all integrations, so they are set up only once.
+            extract_model = setup_extraction(input_model, **extract_params)
+            wavelength = extract_model.get_wavelength()
+            if got_relsens:
+                r_factor = interpolate_response(wavelength,
+                                                input_model.relsens)
+            spec_dtype = datamodels.SpecModel().spec_table.dtype
+
+            # Extract the spectrum of each integration
+            nints = input_model.data.shape[0]
+            num_workers = parallel.compute_num_workers(maximum_cores, nints)
+            spectra = parallel.ordered_map(extract_model.extract,
+                                           input_model.data,
+                                           num_workers, parallel_backend)
+            spec_list = []
+            for (_, net, background) in spectra:
                 if got_relsens:
-                    r_factor = interpolate_response(wavelength,
-                                                    input_model.relsens)
                     flux = net / r_factor
                 else:
                     flux = np.zeros_like(net)
-                fl_error = np.ones_like(net)
-                nerror = np.ones_like(net)
-                berror = np.ones_like(net)
-                spec = datamodels.SpecModel()
-                otab = np.array(list(zip(wavelength, flux, fl_error, dq,
-                                     net, nerror, background, berror)),
-                                dtype=spec.spec_table.dtype)
-                spec = datamodels.SpecModel(spec_table=otab)
-                output_model.spec.append(spec)
+                otab = np.zeros(net.shape, dtype=spec_dtype)
+                columns = [wavelength, flux, 1., 0, net, 1., background, 1.]
+                for name, column in zip(spec_dtype.names, columns):
+                    otab[name] = column
+                spec = output_model.spec.item(spec_table=otab)
+                spec_list.append(spec.instance)
+            # Setting all of the spectra at once validates the model once,
+            # rather than once for every integration.
+            output_model.spec = spec_list
 
         elif isinstance(input_model, datamodels.IFUCubeModel):
 
@@ -1096,7 +1178,15 @@ def do_extract1d(input_model, refname, smoothing_length, bkg_order):
     return output_model
 
 
-def extract_one_slit(slit, integ, meta, slitname=None, **extract_params):
+def setup_extraction(slit, **extract_params):
+    """Set up the extraction region of a slit, or image, or cube.
+
+    Returns
+    -------
+    extract_model: ExtractModel
+        The object that extracts spectra from data with the shape of the
+        last two axes of `slit.data`.
+    """
 
     log_initial_parameters(extract_params)
     ap = get_aperture(slit, extract_params)
@@ -1106,6 +1196,13 @@ def extract_one_slit(slit, integ, meta, slitname=None, **extract_params):
     extract_model.log_extraction_parameters()
 
     extract_model.assign_polynomial_limits()
+
+    return extract_model
+
+
+def extract_one_slit(slit, integ, meta, slitname=None, **extract_params):
+
+    extract_model = setup_extraction(slit, **extract_params)
     data = slit.data
     if integ > -1:
         data = slit.data[integ]
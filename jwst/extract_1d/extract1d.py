@@ -12,11 +12,9 @@ from __future__ import division, print_function, absolute_import
 import logging
 import os
 import math
-import copy
 
 # THIRD PARTY
 import numpy as np
-from astropy.modeling import models, fitting
 
 __all__ = ['extract1d']
 __taskname__ = 'extract1d'
@@ -181,51 +179,59 @@ def extract1d(image, lambdas, disp_range,
     ##         Perform spectral extraction:        ##
     #################################################
 
-    bkg_model = None
-
-    countrate = np.zeros(nl, dtype=np.float32)
-    background = np.zeros(nl, dtype=np.float32)
-    # x is an index (column number) within `image`, while j is an index in
-    # lambdas, countrate, background, and the arrays in srclim and bkglim.
-    x = disp_range[0]
-    for j in range(nl):
-        lam = lambdas[j]
-
-        if nbkglim > 0:
-
-            # Compute a polynomial fit to the background for the current
-            # column, using the (optionally) smoothed background.
-            bkg_model, bkg_npts = _fit_background_model(
-                temp_image, x, j, bkglim, bkg_order
-            )
-
-            if bkg_npts == 0:
-                bkg_model = None
-                log.warning("Not enough valid pixels to determine background "
-                             "for lambda={} (column {:d})".format(lam, x))
-
-            elif len(bkg_model) < bkg_order:
-                log.warning("Not enough valid pixels to determine background "
-                             "with the required order for lambda={} "
-                             "(column {:d}).\n"
-                             "Lowering background order to {:d}"
-                             .format(lam, x, len(bkg_model)))
-
-        # Extract the source, and optionally subtract background using the
-        # polynomial fit to the background for this column.  Even if
-        # background smoothing was done, we must extract from the original,
-        # unsmoothed image.
-        # source total flux, background total flux, area, total weight
-        (total_flux, bkg_flux, tarea, twht) = _extract_src_flux(
-            image, x, j, lam, srclim,
-            weights=weights, bkgmodel=bkg_model
+    # All of the columns are extracted at once.  The extraction limits
+    # are turned into the fraction of each pixel that is within them, in
+    # each column; the source flux of every column is then a weighted sum
+    # along the cross-dispersion axis, and the background polynomials of
+    # all columns are fitted together.
+    # x0 is the first column within `image`, while the columns of the
+    # arrays below correspond to lambdas, countrate, and background.
+    x0 = disp_range[0]
+    limits = srclim + (bkglim if nbkglim > 0 else [])
+    row0, nrows = _row_range(limits, shape[0])
+    columns = slice(x0, x0 + nl)
+    rows = slice(row0, row0 + nrows)
+
+    if nbkglim > 0:
+        # Compute a polynomial fit to the background for each column,
+        # using the (optionally) smoothed background.
+        _, bkg_fitwt, bkg_count = _column_weights(bkglim, row0, nrows,
+                                                  shape[0])
+        bkg_coeff, bkg_npts, bkg_degree = _fit_background_model(
+            temp_image[rows, columns], row0, bkg_fitwt, bkg_count, bkg_order
         )
-        countrate[j] = total_flux
-        if nbkglim > 0:
-            background[j] = bkg_flux
 
-        x += 1
-        continue
+        no_bkg = (bkg_npts == 0)
+        if np.any(no_bkg):
+            log.warning("Not enough valid pixels to determine background "
+                        "for %d of %d columns, e.g. lambda=%s (column %d)",
+                        no_bkg.sum(), nl, lambdas[no_bkg][0],
+                        x0 + np.flatnonzero(no_bkg)[0])
+        lowered = np.logical_not(no_bkg) & (bkg_degree < bkg_order)
+        if np.any(lowered):
+            log.warning("Not enough valid pixels to determine background "
+                        "with the required order for %d of %d columns; "
+                        "the background order was lowered to as little "
+                        "as %d", lowered.sum(), nl,
+                        bkg_degree[lowered].min())
+    else:
+        bkg_coeff = None
+        no_bkg = np.ones(nl, dtype=np.bool_)
+
+    # Extract the source, and optionally subtract background using the
+    # polynomial fit to the background for each column.  Even if
+    # background smoothing was done, we must extract from the original,
+    # unsmoothed image.
+    src_area, _, src_count = _column_weights(srclim, row0, nrows, shape[0])
+    total_flux, bkg_flux = _extract_src_flux(
+        image[rows, columns], row0, lambdas, src_area, src_count,
+        weights=weights, bkg_coeff=bkg_coeff, no_bkg=no_bkg
+    )
+
+    countrate = total_flux.astype(np.float32)
+    background = np.zeros(nl, dtype=np.float32)
+    if nbkglim > 0:
+        background[:] = bkg_flux
 
     return (countrate, background)
 
@@ -248,193 +254,212 @@ def bxcar(image, smoothing_length):
     return temp_im[..., half:half + width].astype(image.dtype)
 
 
-def _extract_src_flux(image, x, j, lam, srclim,
-                      weights, bkgmodel):
-    # extract pixel values along the column that are within
-    # source limits:
-    y, val, area = _extract_colpix(image, x, j, srclim)
+def _row_range(limits, nrows_image):
+    """Return the first row and the number of rows that include all of
+    the pixels within any of the extraction limits."""
+
+    ns = nrows_image - 1
+    lowest = min(min(l[0].min(), l[1].min()) for l in limits)
+    highest = max(max(l[0].max(), l[1].max()) for l in limits)
+    row0 = max(0, int(math.floor(lowest + 0.5)))
+    row1 = min(ns, int(p2_round(highest)))
+    row0 = min(row0, row1)
+    return (row0, row1 - row0 + 1)
+
+
+def _column_weights(limits, row0, nrows, nrows_image):
+    """Find the pixels of each column that are within extraction limits.
+
+    Parameters
+    ----------
+    limits: list of two-element lists of 1-D arrays
+        Lower and upper limits, one value per column, of each extraction
+        region, as pixel coordinates in the cross-dispersion direction.
+    row0, nrows: int
+        The first row of the image, and the number of rows, for which
+        weights are returned.
+    nrows_image: int
+        The number of rows in the image.
+
+    Returns
+    -------
+    (area, fitwt, count): tuple of 2-D ndarrays, (nrows, ncolumns)
+        area is the fraction of each pixel that is within the limits,
+        fitwt the weight of each pixel in a fit, and count the number of
+        times that each pixel was included.  Regions are merged where
+        they overlap, but two regions can both include the two parts of
+        a pixel; that pixel is then counted twice, with the sum of the
+        two fractions as its area, and the equivalent weight in a
+        least-squares fit.
+    """
+
+    ncols = limits[0][0].shape[0]
+    area = np.zeros((nrows, ncols), dtype=np.float32)
+    fitwt2 = np.zeros((nrows, ncols), dtype=np.float64)
+    count = np.zeros((nrows, ncols), dtype=np.intp)
+
+    def add_interval(i1, i2, cols):
+        ns = nrows_image - 1
+        ns12 = ns + 0.5
+        i1 = np.where(i1 >= -0.5, i1, -0.5)
+        i2 = np.where(i2 <= ns12, i2, ns12)
+        ii1 = np.maximum(0, np.floor(i1 + 0.5)).astype(np.intp)
+        ii2 = np.minimum(ns, np.floor(i2 + np.copysign(0.5, i2)))
+        ii2 = ii2.astype(np.intp)
+
+        # The fractions of the pixels at the lower and upper bounds.
+        frac1 = np.where(i1 >= -0.5, 1.0 - np.mod(i1 - 0.5, 1.), 1.0)
+        frac2 = np.where(i2 < ns12, np.mod(i2 + 0.5, 1.), 1.0)
+        frac1 = np.where(ii1 == ii2, i2 - i1, frac1)
+
+        y = np.arange(row0, row0 + nrows)[:, np.newaxis]
+        wht = np.where(y == ii1, frac1, np.where(y == ii2, frac2, 1.))
+        wht = wht.astype(np.float32)
+        inside = (y >= ii1) & (y <= ii2) & cols
+        area[inside] += wht[inside]
+        fitwt2[inside] += wht[inside].astype(np.float64)**2
+        count[inside] += 1
+
+    # Sort the limits of each region, then sort the regions by their
+    # lower limits, and merge the regions that overlap, column by column.
+    lower = np.array([np.minimum(l[0], l[1]) for l in limits])
+    upper = np.array([np.maximum(l[0], l[1]) for l in limits])
+    order = np.argsort(lower, axis=0, kind='mergesort')
+    index = np.arange(ncols)
+    lower = lower[order, index]
+    upper = upper[order, index]
+
+    current_lower = lower[0]
+    current_upper = upper[0]
+    for k in range(1, len(limits)):
+        merge = lower[k] <= current_upper
+        add_interval(current_lower, current_upper, np.logical_not(merge))
+        # A merged region ends at the upper limit of region k, even if
+        # that is below the upper limit of the region it was merged into.
+        current_lower = np.where(merge, current_lower, lower[k])
+        current_upper = upper[k]
+    add_interval(current_lower, current_upper, np.ones(ncols, np.bool_))
+
+    return (area, np.sqrt(fitwt2), count)
+
+
+def _fit_background_model(image, row0, fitwt, count, bkg_order):
+    """Fit a polynomial to the background in each column.
+
+    The polynomials of all columns that have the same degree are fitted
+    together, as one stack of weighted least-squares problems.  This
+    gives the same solutions as fitting each column separately with
+    astropy's `LinearLSQFitter`.
+
+    Returns
+    -------
+    (coeff, npts, degree)
+        coeff is a 2-D array, (bkg_order + 1, ncolumns), of polynomial
+        coefficients (zero above the degree of each column), npts the
+        number of background pixels in each column (0 if none of them is
+        valid), and degree the degree of the polynomial of each column.
+    """
 
-    # find indices of "good" (finite) values:
-    good = np.isfinite(val)
-    npts = good.shape[0]
+    nrows, ncols = image.shape
+    y = np.arange(row0, row0 + nrows, dtype=np.float64)
+    good = np.isfinite(image) & (count > 0)
+    npts = count.sum(axis=0)
+    ngood = np.where(good, count, 0).sum(axis=0)
+    npts = np.where(ngood > 0, npts, 0)
+    degree = np.maximum(np.minimum(bkg_order, npts - 1), 0)
+
+    coeff = np.zeros((bkg_order + 1, ncols), dtype=np.float64)
+    wht = np.where(good, fitwt, 0.)
+    val = np.where(good, image, 0.).astype(np.float32)
+    for deg in np.unique(degree[npts > 0]):
+        cols = np.flatnonzero((npts > 0) & (degree == deg))
+        # The Vandermonde matrix, with each row weighted
+        vander = np.empty((nrows, deg + 1), dtype=np.float64)
+        vander[:, 0] = 1.
+        for i in range(1, deg + 1):
+            vander[:, i] = vander[:, i - 1] * y
+        lhs = wht[:, cols].T[:, :, np.newaxis] * vander
+        rhs = (wht[:, cols] * val[:, cols]).T
+        scl = (lhs * lhs).sum(axis=1)
+        scl[scl == 0.] = 1.
+        lhs /= scl[:, np.newaxis, :]
+
+        # Minimum-norm least-squares solutions via SVD, with the default
+        # cutoff of numpy.linalg.lstsq for small singular values
+        u, s, vt = np.linalg.svd(lhs, full_matrices=False)
+        rcond = np.finfo(np.float64).eps * np.maximum(ngood[cols], deg + 1)
+        cutoff = rcond * s.max(axis=1)
+        with np.errstate(divide='ignore'):
+            s_inv = np.where(s > cutoff[:, np.newaxis], 1. / s, 0.)
+        utb = (u * rhs[:, :, np.newaxis]).sum(axis=1)
+        coeff[:deg + 1, cols] = ((vt * (s_inv * utb)[:, :, np.newaxis])
+                                 .sum(axis=1) / scl).T
+
+    return (coeff, npts, degree)
+
+
+def _evaluate_background(coeff, y):
+    """Evaluate the background polynomial of each column at rows `y`,
+    returning a 2-D array (len(y), ncolumns)."""
+
+    value = coeff[-1] * np.ones((y.shape[0], 1))
+    for i in range(2, coeff.shape[0] + 1):
+        value = coeff[-i] + value * y[:, np.newaxis]
+    return value
+
+
+def _extract_src_flux(image, row0, lambdas, area, count,
+                      weights, bkg_coeff, no_bkg):
+    """Sum the source flux, and the background within the source limits,
+    in each column.
+
+    Returns
+    -------
+    (total_flux, bkg_flux): tuple of 1-D ndarrays
+        total_flux is NaN for columns without any source pixels.
+    """
 
-    if npts == 0:
-        return (np.nan, 0.0, 0.0, 0.0) # src total flux, bkg, area, total weight
+    nrows, ncols = image.shape
+    y = np.arange(row0, row0 + nrows, dtype=np.float64)
 
-    # filter-out bad values:
+    # find "good" (finite) values within the source limits:
     #TODO: in the future we may need to develop a way of interpolating
     #      over missing values either from a model or from adjacent columns
-    val = val[good]
-    area = area[good]
-    y = y[good]
-    if bkgmodel is None:
-        bkg = np.zeros_like(val, dtype=np.float64)
+    good = np.isfinite(image) & (count > 0)
+    npts = count.sum(axis=0)
+    if bkg_coeff is None:
+        bkg = np.zeros(image.shape, dtype=np.float64)
     else:
-        bkg = bkgmodel(y)
+        bkg = _evaluate_background(bkg_coeff, y)
+        bkg[:, no_bkg] = 0.
 
-    # subtract background:
-    val -= bkg
-
-    # brightness -> flux:
-    val *= area
-    bkg *= area
+    # subtract background, and brightness -> flux:
+    val = (np.where(good, image, 0.).astype(np.float32) - bkg)
+    val = val.astype(np.float32) * area
+    bkg = bkg * area
 
     # compute weights:
     if weights is None:
-        wht = np.ones_like(y, dtype=np.float64)
+        wht = np.ones(image.shape, dtype=np.float64)
     else:
-        wht = weights(lam, y)
+        wht = np.empty(image.shape, dtype=np.float64)
+        y32 = y.astype(np.float32)
+        for j in range(ncols):
+            wht[:, j] = weights(lambdas[j], y32)
 
     # compute weighted total flux
     # NOTE: the correct formulae must be derived depending on
     #       final interpretation of weights [not available at
     #       initial release v0.0.1]
-    tarea = area.sum(dtype=np.float64)
-    twht = wht.sum(dtype=np.float64)
-    mwht = twht / wht.shape[0]
-    total_flux = (val * wht).sum(dtype=np.float64) / mwht
-    bkg_flux = bkg.sum(dtype=np.float64)
-
-    # src total flux, bkg total flux, area, total weight
-    return (total_flux, bkg_flux, tarea, twht)
-
-
-def _fit_background_model(image, x, j, bkglim, bkg_order):
-    # extract pixel values along the column that are within
-    # background limits:
-    y, val, wht = _extract_colpix(image, x, j, bkglim)
-
-    # find indices of "good" (finite) values:
-    good = np.isfinite(val)
-    npts = good.shape[0]
-
-    if npts == 0 or not np.any(good):
-        return (models.Polynomial1D(0), 0)
-
-    # filter-out bad values:
-    val = val[good]
-    wht = wht[good]
-    y = y[good]
-
-    lsqfitter = fitting.LinearLSQFitter()
-    bkg_model = lsqfitter(models.Polynomial1D(min(bkg_order, npts - 1)),
-                          y, val, weights=wht)
-
-    return (bkg_model, npts)
-
-
-def _extract_colpix(image_data, x, j, limits):
-    # These are the extraction limits in image pixel coordinates:
-    intervals = []
-    for l in limits:
-        intervals.append([l[0][j], l[1][j]])
-
-    if len(intervals) == 0:
-        return ([], [], [])
-
-    # optimize limits:
-    intervals = _coalesce_bounds(intervals)
-
-    # compute number of data points:
-    ns = image_data.shape[0] - 1
-    ns12 = ns + 0.5
-
-    npts = sum(map(lambda x: min(ns, int(p2_round(x[1]))) - \
-                   max(0, int(math.floor(x[0] + 0.5))) + 1,
-                   intervals))
-
-    # pre-allocate data arrays:
-    y = np.empty(npts, dtype=np.float32)
-    val = np.empty(npts, dtype=np.float32)
-    wht = np.ones(npts, dtype=np.float32)
-
-    # populate data and weights:
-    k = 0
-    for i in intervals:
-        i1 = i[0] if i[0] >= -0.5 else -0.5
-        i2 = i[1] if i[1] <= ns12 else ns12
-
-        ii1 = max(0, int(math.floor(i1 + 0.5)))
-        ii2 = min(ns, int(p2_round(i2)))
-
-        # special case: ii1 == ii2:
-        if ii1 == ii2:
-            v = image_data[ii1, x]
-            val[k] = v
-            wht[k] = i2 - i1
-            k += 1
-            continue
-
-        # bounds in different pixels:
-        # a. lower bound:
-        v = image_data[ii1, x]
-        val[k] = v
-        wht[k] = 1.0 - divmod(i1 - 0.5, 1)[1] if i1 >= -0.5 else 1.0
-
-        # b. upper bound:
-        v = image_data[ii2, x]
-        kn = k + ii2 - ii1
-        val[kn] = v
-        wht[kn] = divmod(i2 + 0.5, 1)[1] if i2 < ns12 else 1.0
-
-        # c. all other intermediate pixels:
-        val[k + 1:kn] = image_data[ii1 + 1:ii2, x]
-        y[k:kn + 1] = np.arange(ii1, ii2 + 1, 1, dtype=np.float32)
-
-        k += ii2 - ii1 + 1
-
-    return (y, val, wht) # pixel coordinate, value, wheight=fractional pixel area
-
-
-def _coalesce_bounds(segments):
-    if not isinstance(segments, list):
-        raise TypeError("'segments' must be a list")
-
-    intervals = copy.deepcopy(segments)
-
-    if all([isinstance(x, list) for x in intervals]):
-        # make sure each nested list is a list of two numbers:
-        for x in intervals:
-            if len(x) != 2:
-                raise ValueError("Each list in the 'segments' list must have "
-                                 "exactly two elements")
-            try:
-                map(float, x)
-            except TypeError:
-                raise TypeError("Each segment in 'segments' must be a list of "
-                                "two numbers")
-    else:
-        # we have a single "interval" (or "segment"):
-        if len(intervals) != 2:
-            raise ValueError("'segments' list must be a list of lists of two "
-                             "numbers or 'segments' must be a list of exactly "
-                             "two numbers")
-        try:
-            map(float, intervals)
-        except TypeError:
-            raise TypeError("Each bound in 'segments' must be a number")
-
-        intervals.sort()
-        return intervals
-
-    # sort each "segment" in an increasing order, then sort the entire list
-    # in the increasing order of lower limit:
-    for segment in intervals:
-        segment.sort()
-    intervals.sort(key=lambda x: x[0])
-
-    # coalesce intervals/segments:
-    if len(intervals) > 0:
-        cint = [intervals.pop(0)]
-    else:
-        return [[]]
-
-    while len(intervals) > 0:
-        pint = cint[-1]
-        interval = intervals.pop(0)
-        if interval[0] <= pint[1]:
-            pint[1] = interval[1]
-            continue
-        cint.append(interval)
-
-    return cint
+    wht = np.where(good, wht, 0.)
+    twht = (wht * count).sum(axis=0, dtype=np.float64)
+    ngood = np.where(good, count, 0).sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mwht = twht / ngood
+        total_flux = (val * wht).sum(axis=0, dtype=np.float64) / mwht
+    total_flux[npts == 0] = np.nan
+    bkg_flux = np.where(good, bkg, 0.).sum(axis=0, dtype=np.float64)
+    bkg_flux[npts == 0] = 0.
+
+    # src total flux, bkg total flux
+    return (total_flux, bkg_flux)
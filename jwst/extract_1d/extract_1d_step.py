@@ -16,6 +16,10 @@ class Extract1dStep(Step):
     # Order of polynomial fit to one column (or row if the dispersion
     # direction is vertical) of background regions.
     bkg_order = integer(default=None, min=0)
+    # Parallel extraction of the integrations of a multi-integration
+    # exposure: max number of workers, and kind of workers.
+    maximum_cores = option('none', 'quarter', 'half', 'all', default='none')
+    parallel_backend = option('thread', 'process', default='thread')
     """
 
     reference_file_types = ['extract1d']
@@ -52,7 +56,9 @@ class Extract1dStep(Step):
 
         # Do the extraction
         result = extract.do_extract1d(input_model, self.ref_file,
-                                      self.smoothing_length, self.bkg_order)
+                                      self.smoothing_length, self.bkg_order,
+                                      self.maximum_cores,
+                                      self.parallel_backend)
 
         # Set the step flag to complete
         result.meta.cal_step.extract_1d = 'COMPLETE'
@@ -0,0 +1,75 @@
+"""
+Tests of the extraction of the spectra of multi-integration exposures
+"""
+from __future__ import absolute_import, division
+
+import json
+
+import numpy as np
+from numpy.testing import assert_array_equal
+import pytest
+
+from ... import datamodels
+from .. import extract
+
+
+@pytest.fixture
+def reference_file(tmpdir):
+    """An extract1d reference file with a source and background regions"""
+    ref = {'apertures': [{'id': 'ANY', 'region_type': 'target',
+                          'dispaxis': 1, 'xstart': 2, 'xstop': 50,
+                          'src_coeff': [[14.2], [19.7]],
+                          'bkg_coeff': [[1.3], [8.2], [24.6], [30.1]],
+                          'bkg_order': 1, 'smoothing_length': 3}]}
+    filename = str(tmpdir.join('extract1d.json'))
+    with open(filename, 'w') as f:
+        json.dump(ref, f)
+    return filename
+
+
+@pytest.fixture
+def cube():
+    """A SOSS cube of 7 integrations, with some NaN pixels"""
+    rng = np.random.RandomState(5)
+    shape = (7, 34, 60)
+    data = (rng.normal(10., 1., size=shape) +
+            0.1 * np.arange(shape[1])[:, np.newaxis])
+    data[rng.uniform(size=shape) < 0.02] = np.nan
+    relsens = np.array([(0., 1.), (100., 2.)],
+                       dtype=[('wavelength', 'f8'), ('response', 'f8')])
+    model = datamodels.CubeModel(data=data.astype(np.float32),
+                                 relsens=relsens)
+    model.meta.exposure.type = 'NIS_SOSS'
+    model.meta.subarray.name = 'SUBSTRIP256'
+    return model
+
+
+@pytest.mark.parametrize('maximum_cores, backend', [
+    ('none', 'thread'),
+    (3, 'thread'),
+    (2, 'process'),
+])
+def test_extract_integrations(reference_file, cube, maximum_cores, backend):
+    """
+    The spectra of the integrations, extracted with one set-up and in
+    worker threads or processes, are those of each integration extracted
+    on its own
+    """
+    model = cube
+    output_model = extract.do_extract1d(model, reference_file, None, None,
+                                        maximum_cores=maximum_cores,
+                                        parallel_backend=backend)
+
+    assert len(output_model.spec) == model.data.shape[0]
+    extract_params = extract.get_extract_parameters(
+        reference_file, 'SUBSTRIP256', model.meta, None, None)
+    for integ, spec in enumerate(output_model.spec):
+        wavelength, net, background = extract.extract_one_slit(
+            model, integ, model.meta, 'SUBSTRIP256', **extract_params)
+        r_factor = extract.interpolate_response(wavelength, model.relsens)
+        spec_table = spec.spec_table
+        assert_array_equal(spec_table['WAVELENGTH'], wavelength)
+        assert_array_equal(spec_table['NET'], net)
+        assert_array_equal(spec_table['BACKGROUND'], background)
+        assert_array_equal(spec_table['FLUX'], net / r_factor)
+        assert_array_equal(spec_table['DQ'], 0)
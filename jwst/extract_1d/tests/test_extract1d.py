@@ -0,0 +1,148 @@
+"""
+Tests of the extraction of all the columns of a spectrum at once
+"""
+from __future__ import absolute_import, division
+
+import math
+import warnings
+
+import numpy as np
+from numpy.testing import assert_allclose, assert_array_equal
+from astropy.modeling import models, fitting
+
+from .. import extract1d
+
+
+def _coalesce_bounds(intervals):
+    """Sort and merge the intervals, the way extract1d always has."""
+    intervals = sorted((sorted(interval) for interval in intervals),
+                       key=lambda interval: interval[0])
+    merged = [intervals.pop(0)]
+    for interval in intervals:
+        if interval[0] <= merged[-1][1]:
+            merged[-1][1] = interval[1]
+        else:
+            merged.append(interval)
+    return merged
+
+
+def _extract_colpix(image, x, limits):
+    """
+    The pixels of one column within the limits: their row, value and the
+    fraction of each pixel within the limits, as found one column at a
+    time before the extraction was done on whole arrays.  That code left
+    the row of an interval within a single pixel uninitialized; here it
+    is the row of that pixel, as in `extract1d._column_weights`.
+    """
+    intervals = _coalesce_bounds([[l[0][x], l[1][x]] for l in limits])
+    ns = image.shape[0] - 1
+    ns12 = ns + 0.5
+    y, val, wht = [], [], []
+    for i in intervals:
+        i1 = i[0] if i[0] >= -0.5 else -0.5
+        i2 = i[1] if i[1] <= ns12 else ns12
+        ii1 = max(0, int(math.floor(i1 + 0.5)))
+        ii2 = min(ns, int(extract1d.p2_round(i2)))
+        rows = np.arange(ii1, ii2 + 1)
+        frac = np.ones(rows.shape, dtype=np.float32)
+        if ii1 == ii2:
+            frac[0] = i2 - i1
+        else:
+            frac[0] = 1.0 - divmod(i1 - 0.5, 1)[1] if i1 >= -0.5 else 1.0
+            frac[-1] = divmod(i2 + 0.5, 1)[1] if i2 < ns12 else 1.0
+        y.append(rows)
+        val.append(image[rows, x])
+        wht.append(frac)
+    return (np.concatenate(y).astype(np.float32), np.concatenate(val),
+            np.concatenate(wht))
+
+
+def _fit_column(image, x, limits, bkg_order):
+    """Fit the background of one column with astropy, as extract1d did."""
+    y, val, wht = _extract_colpix(image, x, limits)
+    good = np.isfinite(val)
+    npts = good.shape[0]
+    if not np.any(good):
+        return (None, 0)
+    degree = min(bkg_order, npts - 1)
+    vander = np.vander(y[good], degree + 1) * wht[good][:, np.newaxis]
+    if not np.all(np.any(vander, axis=0)):
+        # The fitter rejects a term that is zero at every weighted pixel
+        # (e.g. only row 0 and a linear term), which extract1d drops
+        return (None, npts)
+    fitter = fitting.LinearLSQFitter()
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        model = fitter(models.Polynomial1D(degree),
+                       y[good], val[good], weights=wht[good])
+    return (model.parameters, npts)
+
+
+def _random_limits(rng, nrows, ncols):
+    """
+    Random extraction regions, some of them tilted, some overlapping, and
+    some within a single pixel, limited to the image as extract1d does.
+    """
+    limits = []
+    for k in range(rng.randint(1, 4)):
+        center = rng.uniform(0., nrows - 1.)
+        half_width = rng.choice([rng.uniform(0., 0.4),
+                                 rng.uniform(0.5, nrows / 3.)])
+        tilt = rng.choice([0., rng.uniform(-0.2, 0.2)])
+        columns = np.arange(ncols) - ncols / 2.
+        lower = center - half_width + tilt * columns
+        upper = center + half_width + tilt * columns
+        if rng.uniform() < 0.2:
+            # Limits on pixel edges
+            lower = np.round(lower) - 0.5
+            upper = np.round(upper) + 0.5
+        limits.append([np.clip(lower, 0., nrows - 1.),
+                       np.clip(upper, 0., nrows - 1.)])
+    return limits
+
+
+def test_column_weights_and_background_fit():
+    """
+    The weights and background fits of all columns at once agree with
+    those found one column at a time
+    """
+    rng = np.random.RandomState(4)
+    for trial in range(300):
+        nrows, ncols = rng.randint(3, 30), rng.randint(1, 12)
+        bkg_order = trial % 4
+        image = (rng.uniform(-5., 5.) + rng.uniform(-0.3, 0.3) *
+                 np.arange(nrows)[:, np.newaxis] +
+                 rng.normal(0., 1., size=(nrows, ncols)))
+        image[rng.uniform(size=image.shape) < 0.15] = np.nan
+        image = image.astype(np.float32)
+        limits = _random_limits(rng, nrows, ncols)
+
+        row0, nrows_used = extract1d._row_range(limits, nrows)
+        area, fitwt, count = extract1d._column_weights(limits, row0,
+                                                       nrows_used, nrows)
+        coeff, npts, degree = extract1d._fit_background_model(
+            image[row0:row0 + nrows_used], row0, fitwt, count, bkg_order)
+
+        for x in range(ncols):
+            y, _, wht = _extract_colpix(image, x, limits)
+            rows = y.astype(np.intp) - row0
+            expected_area = np.zeros(nrows_used, dtype=np.float32)
+            expected_fitwt2 = np.zeros(nrows_used)
+            expected_count = np.zeros(nrows_used, dtype=np.intp)
+            np.add.at(expected_area, rows, wht)
+            np.add.at(expected_fitwt2, rows, wht.astype(np.float64)**2)
+            np.add.at(expected_count, rows, 1)
+            assert_array_equal(area[:, x], expected_area)
+            assert_allclose(fitwt[:, x], np.sqrt(expected_fitwt2),
+                            rtol=1e-15)
+            assert_array_equal(count[:, x], expected_count)
+
+            expected_coeff, expected_npts = _fit_column(image, x, limits,
+                                                        bkg_order)
+            assert npts[x] == expected_npts
+            if expected_coeff is None:
+                continue
+            assert degree[x] == len(expected_coeff) - 1
+            assert_allclose(coeff[:degree[x] + 1, x], expected_coeff,
+                            rtol=1e-6, atol=1e-6 * np.nanmax(np.abs(image)))
+            assert not np.any(coeff[degree[x] + 1:, x])
@@ -11,13 +11,14 @@ from astropy.modeling.models import Shift
 from .. import datamodels
 from asdf import AsdfFile
 from ..assign_wcs import nirspec
+from ..assign_wcs.util import get_wavelengths
 
 
 log = logging.getLogger(__name__)
 log.setLevel(logging.INFO)
 
 
-def extract2d(input_model, which_subarray=None):
+def extract2d(input_model, which_subarray=None, store_wavelengths=False):
     supported_modes = ['NRS_FIXEDSLIT', 'NRS_MSASPEC', 'NRS_BRIGHTOBJ', 'NRS_LAMP']
     exp_type = input_model.meta.exposure.type.upper()
     log.info('EXP_TYPE is {0}'.format(exp_type))
@@ -81,6 +82,9 @@ def extract2d(input_model, which_subarray=None):
                 output_model.slits[nslit].slitlet_id = int(slit.name)
                 # for pathloss correction
                 output_model.slits[nslit].nshutters = int(slit.nshutters)
+            # Evaluate the WCS over the slit once, for the later steps
+            get_wavelengths(output_model.slits[nslit],
+                            store=store_wavelengths)
     del input_model
     # Set the step status to COMPLETE
     output_model.meta.cal_step.extract_2d = 'COMPLETE'
@@ -11,13 +11,15 @@ class Extract2dStep(Step):
 
     spec = """
         which_subarray = string(default = None)
+        store_wavelengths = boolean(default = False)
     """
 
     def process(self, input_file):
 
         with datamodels.open(input_file) as dm:
 
-            output_model = extract_2d.extract2d(dm, self.which_subarray)
+            output_model = extract_2d.extract2d(dm, self.which_subarray,
+                                                 self.store_wavelengths)
 
         return output_model
 
@@ -10,6 +10,7 @@ import logging
 from .. import datamodels
 from .. datamodels import dqflags
 from .. assign_wcs import nirspec       # for NIRSpec IFU data
+from .. assign_wcs.util import get_wavelengths
 
 log = logging.getLogger(__name__)
 log.setLevel(logging.DEBUG)
@@ -395,12 +396,10 @@ def do_NIRSpec_flat_field(output_model,
             else:
                 raise RuntimeError("The assign_wcs step has not been run.")
 
-        # Get the wavelength of each pixel in the extracted slit data.
-        # pixels with respect to the cutout
-        grid = np.indices((ysize, xsize), dtype=np.float64)
-        # The arguments are the X and Y pixel coordinates (in that order).
-        (ra, dec, wl) = slit.meta.wcs(grid[1], grid[0])
-        del ra, dec, grid
+        # Get the wavelength of each pixel in the extracted slit data;
+        # these have usually been computed by extract_2d already.  They
+        # are not stored in the slit, so that the output does not grow.
+        wl = get_wavelengths(slit, store=False)
         nan_mask = np.isnan(wl)
         good_mask = np.logical_not(nan_mask)
         sum_nan_mask = nan_mask.sum(dtype=np.intp)
@@ -1143,20 +1142,16 @@ def combine_fast_slow(wl, flat_2d, tab_wl, tab_flat):
     wl_low = wl - dwl / 2.
     wl_high = wl + dwl / 2.
 
-    # Values averaged within tab_flat.
-    values = np.zeros_like(wl)
-    (ny, nx) = wl.shape
     # Abscissas and weights for 3-point Gaussian integration, but taking
     # the width of the interval to be 1, so the result will be the average
     # over the interval.
     d = math.sqrt(0.6) / 2.
     dx = np.array([-d, 0., d])
     wgt = np.array([5., 8., 5.]) / 18.
-    for j in range(ny):
-        for i in range(nx):
-            # average the tabular data over the range of wavelengths
-            values[j, i] = g_average(wl[j, i], dwl[j, i],
-                                     tab_wl, tab_flat, dx, wgt)
+    # average the tabular data over the range of wavelengths, for all
+    # pixels at once; the values are stored with the type of `wl`
+    values = np.zeros_like(wl)
+    values[...] = g_average(wl, dwl, tab_wl, tab_flat, dx, wgt)
 
     return flat_2d * values
 
@@ -1165,11 +1160,13 @@ def g_average(wl0, dwl0, tab_wl, tab_flat, dx, wgt):
 
     Parameters
     ----------
-    wl0: float
-        Wavelength at the center of the current pixel.
+    wl0: float or ndarray
+        Wavelength at the center of the current pixel, or an array of
+        wavelengths, one for each pixel.
 
-    dwl0: float
-        Width (in wavelength units) of the current pixel.
+    dwl0: float or ndarray
+        Width (in wavelength units) of the current pixel, or an array of
+        widths with the same shape as `wl0`.
 
     tab_wl: ndarray, 1-D
         Array of wavelengths corresponding to `tab_flat` flat-field values.
@@ -1185,15 +1182,19 @@ def g_average(wl0, dwl0, tab_wl, tab_flat, dx, wgt):
 
     Returns
     -------
-    float
-        The average value of `tab_flat` over the current pixel.
+    float or ndarray
+        The average value of `tab_flat` over the current pixel, or over
+        each pixel.
     """
 
+    # The wavelengths are computed in double precision, whatever the type
+    # of the inputs
+    wl0 = np.asarray(wl0, dtype=np.float64)
+    dwl0 = np.asarray(dwl0, dtype=np.float64)
     npts = len(dx)
-    wavelengths = wl0 + dwl0 * dx
     sum = 0.
     for k in range(npts):
-        value = wl_interpolate(wavelengths[k], tab_wl, tab_flat)
+        value = wl_interpolate(wl0 + dwl0 * dx[k], tab_wl, tab_flat)
         sum += (value * wgt[k])
 
     return sum
@@ -1206,8 +1207,9 @@ def wl_interpolate(wavelength, tab_wl, tab_flat):
 
     Parameters
     ----------
-    wavelength: float
-        The wavelength (microns) at which to find the flat-field value.
+    wavelength: float or ndarray
+        The wavelength (microns) at which to find the flat-field value,
+        or an array of wavelengths.
 
     tab_wl: ndarray, 1-D
         Array of wavelengths corresponding to `tab_flat` flat-field values.
@@ -1218,17 +1220,25 @@ def wl_interpolate(wavelength, tab_wl, tab_flat):
 
     Returns
     -------
-    float
-        The flat-field value (from `tab_flat`) at `wavelength`.
+    float or ndarray
+        The flat-field value (from `tab_flat`) at `wavelength`, or an
+        array of values with the shape of `wavelength`.  The value is 1
+        for wavelengths outside the range of `tab_wl`.
     """
 
-    if wavelength < tab_wl[0] or wavelength > tab_wl[-1]:
-        return 1.
-    n0 = np.searchsorted(tab_wl, wavelength) - 1
-    p = (wavelength - tab_wl[n0]) / (tab_wl[n0 + 1] - tab_wl[n0])
+    wavelength = np.asarray(wavelength, dtype=np.float64)
+    good = (wavelength >= tab_wl[0]) & (wavelength <= tab_wl[-1])
+    # A wavelength equal to tab_wl[0] gives n0 = -1, which wraps around;
+    # p is then 1 and the value is tab_flat[0], as it should be.
+    n0 = np.searchsorted(tab_wl, wavelength[good]) - 1
+    p = (wavelength[good] - tab_wl[n0]) / (tab_wl[n0 + 1] - tab_wl[n0])
     q = 1. - p
 
-    return q * tab_flat[n0] + p * tab_flat[n0 + 1]
+    value = np.ones_like(wavelength)
+    value[good] = q * tab_flat[n0] + p * tab_flat[n0 + 1]
+    if value.ndim == 0:
+        return float(value)
+    return value
 
 
 def interpolate_flat(image_flat, image_dq, image_wl, wl):
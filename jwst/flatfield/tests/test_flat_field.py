@@ -0,0 +1,66 @@
+"""
+Test the combination of the fast and slow variations of the NIRSpec flats
+"""
+from __future__ import absolute_import, division
+
+import math
+
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from .. import flat_field
+
+
+def scalar_wl_interpolate(wavelength, tab_wl, tab_flat):
+    if wavelength < tab_wl[0] or wavelength > tab_wl[-1]:
+        return 1.
+    n0 = np.searchsorted(tab_wl, wavelength) - 1
+    p = (wavelength - tab_wl[n0]) / (tab_wl[n0 + 1] - tab_wl[n0])
+    q = 1. - p
+    return q * tab_flat[n0] + p * tab_flat[n0 + 1]
+
+
+def per_pixel_values(wl, dwl, tab_wl, tab_flat):
+    """The averages of tab_flat as computed one pixel at a time"""
+    d = math.sqrt(0.6) / 2.
+    dx = np.array([-d, 0., d])
+    wgt = np.array([5., 8., 5.]) / 18.
+    values = np.zeros_like(wl)
+    for j in range(wl.shape[0]):
+        for i in range(wl.shape[1]):
+            wavelengths = wl[j, i] + dwl[j, i] * dx
+            total = 0.
+            for k in range(len(dx)):
+                total += scalar_wl_interpolate(wavelengths[k], tab_wl,
+                                               tab_flat) * wgt[k]
+            values[j, i] = total
+    return values
+
+
+def test_combine_fast_slow_float32():
+    """
+    The averages over single precision wavelengths are computed in double
+    precision and stored in single precision, as they were one pixel at a
+    time, including at and beyond the ends of the table
+    """
+    tab_wl = np.linspace(1.0, 1.8, 41).astype(np.float32)
+    tab_flat = (1. + 0.05 * np.cos(7. * tab_wl)).astype(np.float32)
+
+    # Dispersion along x, running off both ends of the table
+    ny, nx = 6, 50
+    wl = np.empty((ny, nx), dtype=np.float32)
+    wl[:] = np.linspace(0.95, 1.85, nx) + 1.e-3 * np.arange(ny)[:, None]
+    wl[2, 3] = tab_wl[0]
+    wl[3, 40] = tab_wl[-1]
+    flat_2d = np.full((ny, nx), 0.9, dtype=np.float32)
+
+    dwl = np.zeros_like(wl)
+    dwl[:, 1:-1] = (wl[:, 2:] - wl[:, :-2]) / 2.
+    dwl[:, 0] = dwl[:, 1]
+    dwl[:, -1] = dwl[:, -2]
+
+    result = flat_field.combine_fast_slow(wl, flat_2d, tab_wl, tab_flat)
+
+    expected = flat_2d * per_pixel_values(wl, dwl, tab_wl, tab_flat)
+    assert result.dtype == np.float32
+    assert_array_equal(result, expected)
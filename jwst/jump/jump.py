@@ -6,12 +6,23 @@ import logging
 import numpy as np
 from . import twopoint_difference as twopt
 from . import yintercept as yint
+from ..lib import parallel
 
 log = logging.getLogger(__name__)
 log.setLevel(logging.DEBUG)
 
+MAX_MEMORY = 200.  # default memory budget (MB) for the temporaries of a tile
+
+# Approximate number of bytes of temporary arrays that the detection methods
+# need per group of each pixel, including the gain-scaled copy of the data
+BYTES_PER_GROUP = 40
+
+# Inputs shared with the worker processes; set by init_jump_worker
+_jump_worker_inputs = {}
+
 def detect_jumps (input_model, gain_model, readnoise_model,
-                  rejection_threshold, do_yint, signal_threshold):
+                  rejection_threshold, do_yint, signal_threshold,
+                  max_memory=MAX_MEMORY, max_cores='none', in_place=False):
     """
     This is the high-level controlling routine for the jump detection process.
     It loads and sets the various input data and parameters needed by each of
@@ -28,10 +39,27 @@ def detect_jumps (input_model, gain_model, readnoise_model,
     appropriate instrument- and detector-dependent values for each pixel of an
     image.  Also, a 2-dimensional read noise array with appropriate values for
     each pixel is passed to the detection methods.
+
+    All of the detection methods work on each pixel independently, so the
+    data are processed in tiles of whole rows, sized so that the temporary
+    arrays needed for a tile fit within max_memory (in MB). This bounds the
+    memory used on top of the output model no matter how large the exposure
+    is. The tiles can also be processed in parallel by a pool of worker
+    processes, whose number is given by max_cores ('none', 'quarter',
+    'half', or 'all' of the cores, or the number of processes itself); the
+    results are identical either way.
+
+    If in_place is True, the jumps are flagged in the input model itself,
+    which is returned, rather than in a copy of it. The copy is the default
+    because a step must leave its input model unchanged, so it costs the
+    size of the model on top of the budget of the tiles.
     """
 
     # Load the data arrays that we need from the input model
-    output_model = input_model.copy()
+    if in_place:
+        output_model = input_model
+    else:
+        output_model = input_model.copy()
     data = input_model.data
     err  = input_model.err
     gdq  = input_model.groupdq
@@ -61,40 +89,120 @@ def detect_jumps (input_model, gain_model, readnoise_model,
         log.debug('Extracting readnoise subarray to match science data')
         readnoise_2d = readnoise_model.data[ystart-1:ystop,xstart-1:xstop]
 
-    # Apply gain to the SCI and ERR arrays so they're in units of electrons
-    data *= gain_2d
-    err  *= gain_2d
+    # Set up the ramp time array for the y-intercept method
+    group_time = output_model.meta.exposure.group_time
+    times = np.array([(k+1)*group_time for k in range(ngroups)])
+
+    # Split the rows into tiles that fit within the memory budget
+    (nints, ngroups, nrows, ncols) = data.shape
+    nrows_tile = calc_tile_rows(data.shape, max_memory)
+    tiles = [(rlo, min(rlo + nrows_tile, nrows))
+             for rlo in range(0, nrows, nrows_tile)]
+    log.debug('Processing %d tile(s) of %d rows' % (len(tiles), nrows_tile))
 
-    # Apply the 2-point difference method as a first pass
     log.info('Executing two-point difference method')
+    if do_yint:
+        log.info('Executing yintercept method')
     start = time.time()
 
-    median_slopes = twopt.find_CRs( data, gdq, readnoise_2d,
-                                    rejection_threshold, nframes)
+    # Process the tiles, either serially or in a pool of worker processes;
+    # either way the flags found for a tile are written into its rows of
+    # the output GROUPDQ array
+    number_slices = parallel.compute_num_workers(max_cores, len(tiles))
+    if number_slices > 1:
+        pool = parallel._fork_context().Pool(processes=number_slices,
+                   initializer=init_jump_worker,
+                   initargs=(data, err, gdq, gain_2d, readnoise_2d, times,
+                             rejection_threshold, do_yint, signal_threshold,
+                             nframes))
+        try:
+            for (rlo, rhi), gdq_tile in zip(tiles,
+                                            pool.imap(jump_worker, tiles)):
+                output_model.groupdq[:, :, rlo:rhi, :] = gdq_tile
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        for (rlo, rhi) in tiles:
+            output_model.groupdq[:, :, rlo:rhi, :] = detect_jumps_tile(
+                data[:, :, rlo:rhi, :], err[:, :, rlo:rhi, :],
+                gdq[:, :, rlo:rhi, :], gain_2d[rlo:rhi, :],
+                readnoise_2d[rlo:rhi, :], times, rejection_threshold,
+                do_yint, signal_threshold, nframes)
 
     elapsed = time.time() - start
     log.debug('Elapsed time = %g sec' %elapsed)
 
-    # Apply the y-intercept method as a second pass, if requested
-    if do_yint:
+    return output_model
 
-        # Set up the ramp time array for the y-intercept method
-        group_time = output_model.meta.exposure.group_time
-        times = np.array([(k+1)*group_time for k in range(ngroups)])
-        median_slopes /= group_time
 
-        # Now apply the y-intercept method
-        log.info('Executing yintercept method')
-        start = time.time()
+def detect_jumps_tile(data, err, gdq, gain_2d, readnoise_2d, times,
+                      rejection_threshold, do_yint, signal_threshold,
+                      nframes):
+    """
+    Apply the detection methods to one tile of rows of the input data,
+    returning a copy of the GROUPDQ array of the tile with the jumps
+    flagged. The input arrays are not modified.
+    """
+
+    # Apply gain to the SCI and ERR arrays so they're in units of electrons
+    data = data * gain_2d
+    gdq = gdq.copy()
+
+    # Apply the 2-point difference method as a first pass
+    median_slopes = twopt.find_CRs( data, gdq, readnoise_2d,
+                                    rejection_threshold, nframes)
+
+    # Apply the y-intercept method as a second pass, if requested
+    if do_yint:
+        err = err * gain_2d
+        median_slopes /= times[0]   # i.e., the group time
         yint.find_CRs( data, err, gdq, times, readnoise_2d,
                        rejection_threshold, signal_threshold, median_slopes)
-        elapsed = time.time() - start
-        log.debug('Elapsed time = %g sec' %elapsed)
 
-    # Update the DQ array of the output model with the jump detection results
-    output_model.groupdq = gdq
+    return gdq
 
-    return output_model
 
+def calc_tile_rows(shape, max_memory):
+    """
+    Calculate the number of rows per tile, such that the temporary arrays
+    for a tile of data of the given (nints, ngroups, nrows, ncols) shape
+    take up at most max_memory MB (but with at least one row per tile).
+    """
+    (nints, ngroups, nrows, ncols) = shape
+
+    bytes_per_row = nints * ngroups * ncols * BYTES_PER_GROUP
+    nrows_tile = int(max_memory * 1024 * 1024 / bytes_per_row)
+
+    return max(1, min(nrows_tile, nrows))
 
 
+def init_jump_worker(data, err, gdq, gain_2d, readnoise_2d, times,
+                     rejection_threshold, do_yint, signal_threshold,
+                     nframes):
+    """
+    Initializer for the worker processes. The full input arrays are handed
+    to each worker once, when the pool is created (the workers are forked,
+    so the arrays are not copied), rather than pickling every tile.
+    """
+    _jump_worker_inputs.update(data=data, err=err, gdq=gdq, gain_2d=gain_2d,
+        readnoise_2d=readnoise_2d, times=times,
+        rejection_threshold=rejection_threshold, do_yint=do_yint,
+        signal_threshold=signal_threshold, nframes=nframes)
+
+
+def jump_worker(tile):
+    """
+    Process the tile of rows (rlo, rhi) in a worker process.
+    """
+    rlo, rhi = tile
+    inputs = _jump_worker_inputs
+
+    return detect_jumps_tile(inputs['data'][:, :, rlo:rhi, :],
+                             inputs['err'][:, :, rlo:rhi, :],
+                             inputs['gdq'][:, :, rlo:rhi, :],
+                             inputs['gain_2d'][rlo:rhi, :],
+                             inputs['readnoise_2d'][rlo:rhi, :],
+                             inputs['times'], inputs['rejection_threshold'],
+                             inputs['do_yint'], inputs['signal_threshold'],
+                             inputs['nframes'])
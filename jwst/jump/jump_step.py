@@ -13,6 +13,8 @@ class JumpStep(Step):
 
     spec = """
         rejection_threshold = float(default=4.0,min=0) # CR rejection threshold
+        max_memory = float(default=200.0,min=0) # memory budget (MB) per tile of rows
+        maximum_cores = option('none', 'quarter', 'half', 'all', default='none') # max number of processes to create
     """
 
     # Prior to 04/26/17, the following were also in the spec above:
@@ -27,7 +29,7 @@ class JumpStep(Step):
 
     def process(self, input):
 
-        with datamodels.open(input) as input_model:
+        with self.open_model(input) as input_model:
 
             # Check for consistency between keyword values and data shape
             ngroups = input_model.data.shape[1]
@@ -56,17 +58,23 @@ class JumpStep(Step):
             gain_filename = self.get_reference_file(input_model, 'gain')
             self.log.info('Using GAIN reference file: %s', gain_filename)
 
-            gain_model = datamodels.GainModel( gain_filename )
+            gain_model = self.open_reference_model(gain_filename,
+                                                   datamodels.GainModel)
 
             readnoise_filename = self.get_reference_file(input_model,
                                                           'readnoise')
             self.log.info('Using READNOISE reference file: %s',
                           readnoise_filename)
-            readnoise_model = datamodels.ReadnoiseModel( readnoise_filename )
+            readnoise_model = self.open_reference_model(readnoise_filename,
+                                                        datamodels.ReadnoiseModel)
 
             # Call the jump detection routine
+            self.log.info('Using max_memory = %g MB and maximum_cores = %s',
+                          self.max_memory, self.maximum_cores)
             result = detect_jumps(input_model, gain_model, readnoise_model,
-                                   rej_thresh, do_yint, sig_thresh)
+                                   rej_thresh, do_yint, sig_thresh,
+                                   self.max_memory, self.maximum_cores,
+                                   self.in_place)
 
             gain_model.close()
             readnoise_model.close()
@@ -0,0 +1,106 @@
+"""
+Tests of the tiled jump detection
+"""
+from __future__ import (absolute_import, unicode_literals, division,
+                        print_function)
+import numpy as np
+from numpy.testing import assert_array_equal
+import pytest
+
+from ... import datamodels
+from ...datamodels import dqflags
+from .. import jump
+
+JUMP_DET = dqflags.group['JUMP_DET']
+SATURATED = dqflags.group['SATURATED']
+
+# 2 integrations of 8 groups of 23 x 17 pixels
+SHAPE = (2, 8, 23, 17)
+
+
+@pytest.fixture
+def models():
+    """
+    A subarray exposure with a jump in about a tenth of its pixels, and full
+    frame gain and read noise reference models.
+    """
+    prng = np.random.RandomState(42)
+    nints, ngroups, nrows, ncols = SHAPE
+    rate = prng.uniform(5., 80., size=(nrows, ncols))
+    data = rate * np.arange(1, ngroups + 1)[:, np.newaxis, np.newaxis]
+    data = data + prng.normal(0., 4., size=SHAPE)
+    hit = prng.uniform(size=(nints, nrows, ncols)) < 0.1
+    first = prng.randint(1, ngroups, size=hit.shape)
+    for group in range(1, ngroups):
+        data[:, group] += 500. * (hit & (first <= group))
+    groupdq = np.zeros(SHAPE, dtype=np.uint8)
+    groupdq[:, 6:, 3, 4] = SATURATED
+
+    model = datamodels.RampModel(data=data.astype(np.float32),
+                                 err=np.ones(SHAPE, dtype=np.float32),
+                                 groupdq=groupdq,
+                                 pixeldq=np.zeros(SHAPE[2:], dtype=np.uint32))
+    model.meta.exposure.nframes = 1
+    model.meta.exposure.group_time = 10.7
+    model.meta.subarray.xstart = 5
+    model.meta.subarray.xsize = ncols
+    model.meta.subarray.ystart = 9
+    model.meta.subarray.ysize = nrows
+
+    gain = datamodels.GainModel(data=np.full((40, 30), 2., np.float32))
+    readnoise = datamodels.ReadnoiseModel(
+        data=prng.uniform(4., 6., size=(40, 30)).astype(np.float32))
+    readnoise.meta.subarray.xstart = 1
+    readnoise.meta.subarray.xsize = 30
+    readnoise.meta.subarray.ystart = 1
+    readnoise.meta.subarray.ysize = 40
+
+    return model, gain, readnoise
+
+
+def test_calc_tile_rows():
+    bytes_per_row = 2 * 8 * 17 * jump.BYTES_PER_GROUP
+    assert jump.calc_tile_rows(SHAPE, 5.5 * bytes_per_row / 2**20) == 5
+    # At least one row, and no more than there are
+    assert jump.calc_tile_rows(SHAPE, 0.) == 1
+    assert jump.calc_tile_rows(SHAPE, 1.e6) == 23
+
+
+@pytest.mark.parametrize('max_cores', ['none', 2])
+def test_tiles_match_untiled(models, max_cores):
+    model, gain, readnoise = models
+
+    untiled = jump.detect_jumps(model, gain, readnoise, 4., False, 1.,
+                                max_memory=1.e6)
+    assert (untiled.groupdq & JUMP_DET).any()
+
+    # Tiles of 5 rows, so that the tile edges fall mid-array and the last
+    # tile is cut short
+    bytes_per_row = 2 * 8 * 17 * jump.BYTES_PER_GROUP
+    tiled = jump.detect_jumps(model, gain, readnoise, 4., False, 1.,
+                              max_memory=5.5 * bytes_per_row / 2**20,
+                              max_cores=max_cores)
+
+    assert_array_equal(tiled.groupdq, untiled.groupdq)
+    # The input is left alone
+    assert not (model.groupdq & JUMP_DET).any()
+
+
+def test_worker_tiles_match_untiled(models):
+    """The tiles handed to worker processes give the same flags"""
+    model, gain, readnoise = models
+    untiled = jump.detect_jumps(model, gain, readnoise, 4., False, 1.,
+                                max_memory=1.e6)
+
+    gain_2d = gain.data[8:31, 4:21]
+    times = 10.7 * np.arange(1, 9)
+    jump.init_jump_worker(model.data, model.err, model.groupdq, gain_2d,
+                          readnoise.data[8:31, 4:21], times, 4., False, 1., 1)
+    try:
+        tiles = [(0, 7), (7, 14), (14, 21), (21, 23)]
+        gdq = np.concatenate([jump.jump_worker(tile) for tile in tiles],
+                             axis=2)
+    finally:
+        jump._jump_worker_inputs.clear()
+
+    assert_array_equal(gdq, untiled.groupdq)
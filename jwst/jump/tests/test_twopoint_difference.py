@@ -0,0 +1,215 @@
+"""
+Check the array-based outlier search of twopoint_difference against the
+per-pixel search it replaced.
+"""
+from __future__ import (absolute_import, unicode_literals, division,
+                        print_function)
+import numpy as np
+from numpy.testing import assert_array_equal, assert_allclose
+import pytest
+
+from ...datamodels import dqflags
+from .. import twopoint_difference
+
+SATURATED = dqflags.group['SATURATED']
+JUMP_DET = dqflags.group['JUMP_DET']
+HUGE_NUM = twopoint_difference.HUGE_NUM
+
+
+def per_pixel_find_CRs(data, gdq, read_noise, rej_threshold, nframes):
+    """
+    The original find_CRs: a full argsort of the ratios of every pixel, then
+    a loop over the pixels with an outlier to look for more of them.
+
+    The sorts are made stable, as the default sort of numpy was for the
+    few groups of a ramp when this was written (newer versions may use
+    sorting networks that order equal values arbitrarily).
+    """
+    (nints, ngroups, nrows, ncols) = data.shape
+    median_slopes = np.zeros((nints, nrows, ncols), dtype=np.float32)
+    read_noise_2 = read_noise*read_noise
+    data[gdq == SATURATED] = np.nan
+
+    for integration in range(nints):
+        rdata = np.rollaxis(data[integration], 0, 3)
+        first_diffs = np.diff(rdata, axis=2)
+        med_diffs = np.nanmedian(first_diffs, axis=2)
+        nans = np.where(np.isnan(med_diffs))
+        med_diffs[nans] = 0.
+        first_diffs[nans] = 0.
+        median_slopes[integration] = med_diffs
+
+        poisson_noise = np.sqrt(np.abs(med_diffs))
+        sigma = np.sqrt(poisson_noise*poisson_noise + read_noise_2/nframes)
+        sigma[np.where(sigma == 0.)] = HUGE_NUM
+        ratio = (np.abs(first_diffs - med_diffs[:, :, np.newaxis]) /
+                 sigma[:, :, np.newaxis])
+
+        sortindx = np.argsort(ratio, kind='mergesort')
+        max_index1 = sortindx[:, :, ngroups-2]
+        r, c = np.indices(max_index1.shape)
+        r1, c1 = np.where(ratio[r, c, max_index1] > rej_threshold)
+        total_1 = len(r1)
+        max_index2 = sortindx[:, :, ngroups-3]
+        r2, c2 = np.where(ratio[r, c, max_index2] > rej_threshold)
+        if nframes > 1:
+            rboth = np.concatenate((r1, r2))
+            cboth = np.concatenate((c1, c2))
+        else:
+            rboth = r1.copy()
+            cboth = c1.copy()
+
+        for j in range(len(rboth)):
+            row, col = rboth[j], cboth[j]
+            masked_diffs = first_diffs[row, col]
+            rn2 = read_noise_2[row, col]
+            sat_mask = np.isfinite(masked_diffs)
+            cr_mask = np.ones(masked_diffs.shape, dtype=bool)
+            if j < total_1:
+                cr_mask[max_index1[row, col]] = 0
+            else:
+                cr_mask[max_index2[row, col]] = 0
+
+            iter = 1
+            while iter:
+                med = np.median(masked_diffs[cr_mask*sat_mask])
+                poisson_noise = np.sqrt(np.abs(med))
+                sigma = np.sqrt(poisson_noise*poisson_noise + rn2/nframes)
+                ratio_pix = np.abs(masked_diffs - med)/sigma
+                for i in np.argsort(ratio_pix, kind='mergesort')[::-1]:
+                    if not cr_mask[i]*sat_mask[i]:
+                        continue
+                    elif ratio_pix[i] > rej_threshold:
+                        cr_mask[i] = 0
+                        iter = 1
+                        break
+                    else:
+                        iter = 0
+                        break
+
+            gdq[integration, 1:, row, col] = np.bitwise_or(
+                gdq[integration, 1:, row, col],
+                JUMP_DET*np.invert(cr_mask))
+            median_slopes[integration, row, col] = med
+
+    return median_slopes
+
+
+def check_against_per_pixel(data, gdq, read_noise, rej_threshold, nframes):
+    """
+    Run both searches on copies of the inputs and compare the flags and the
+    CR-cleaned median slopes.
+    """
+    gdq_new = gdq.copy()
+    gdq_old = gdq.copy()
+    with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+        slopes_new = twopoint_difference.find_CRs(
+            data.copy(), gdq_new, read_noise, rej_threshold, nframes)
+        slopes_old = per_pixel_find_CRs(
+            data.copy(), gdq_old, read_noise, rej_threshold, nframes)
+
+    assert_array_equal(gdq_new, gdq_old)
+    assert_allclose(slopes_new, slopes_old, rtol=1.e-6)
+    return gdq_new
+
+
+def cosmic_ray_ramps(nints=2, ngroups=10, nrows=12, ncols=15, ncrs=3,
+                     seed=0):
+    """
+    Noisy ramps of a range of count rates, with up to ncrs jumps of
+    assorted sizes and signs in each pixel.
+    """
+    prng = np.random.RandomState(seed)
+    rate = prng.uniform(0., 300., size=(nrows, ncols))
+    counts = prng.poisson(np.broadcast_to(rate, (nints, ngroups, nrows,
+                                                 ncols)))
+    data = np.cumsum(counts, axis=1).astype(np.float32)
+    data += prng.normal(0., 10., size=data.shape).astype(np.float32)
+    for n in range(ncrs):
+        hit = prng.uniform(size=(nints, nrows, ncols)) < 0.4
+        group = prng.randint(1, ngroups, size=hit.shape)
+        size = prng.choice([-1., 1.], size=hit.shape) * \
+            prng.uniform(50., 5000., size=hit.shape)
+        i, r, c = np.where(hit)
+        for g in range(1, ngroups):
+            on = group[i, r, c] <= g
+            data[i[on], g, r[on], c[on]] += size[i[on], r[on], c[on]]
+
+    gdq = np.zeros(data.shape, dtype=np.uint8)
+    read_noise = np.full((nrows, ncols), 10., dtype=np.float32)
+    return data, gdq, read_noise
+
+
+@pytest.mark.parametrize('nframes', [1, 4])
+def test_several_crs(nframes):
+    data, gdq, read_noise = cosmic_ray_ramps(ncrs=3, seed=nframes)
+    gdq_new = check_against_per_pixel(data, gdq, read_noise, 4., nframes)
+
+    # Make sure that the pixels with more than one jump were exercised
+    njumps = (gdq_new & JUMP_DET > 0).sum(axis=1)
+    assert (njumps >= 2).any()
+
+
+@pytest.mark.parametrize('nframes', [1, 4])
+def test_saturated_groups(nframes):
+    data, gdq, read_noise = cosmic_ray_ramps(ngroups=12, ncrs=2,
+                                             seed=10 + nframes)
+
+    # Saturate the ends of some of the ramps, including one that has a single
+    # saturated difference and one that is saturated from the first group
+    prng = np.random.RandomState(3)
+    first_sat = prng.randint(7, 13, size=data.shape[2:])
+    first_sat[0, 0] = 11
+    first_sat[0, 1] = 0
+    for g in range(data.shape[1]):
+        gdq[:, g][:, first_sat <= g] = SATURATED
+
+    check_against_per_pixel(data, gdq, read_noise, 4., nframes)
+
+
+@pytest.mark.parametrize('nframes', [1, 4])
+def test_zero_sigma(nframes):
+    # Flat ramps with no read noise have sigma=0, which is reset so that
+    # nothing is detected in them, whatever their first differences
+    data, gdq, read_noise = cosmic_ray_ramps(ngroups=6, nrows=4, ncols=5,
+                                             ncrs=0)
+    data[:, :, :2] = 0.
+    data[:, 3:, 0] += 1000.
+    read_noise[:2] = 0.
+
+    gdq_new = check_against_per_pixel(data, gdq, read_noise, 4., nframes)
+    assert not (gdq_new[:, :, :2] & JUMP_DET).any()
+
+
+@pytest.mark.parametrize('nframes', [1, 4])
+def test_infinite_ratios(nframes):
+    # A tiny read noise gives ratios that overflow to inf for a huge jump
+    # in an otherwise flat ramp; these are outliers
+    data = np.zeros((1, 8, 3, 4))
+    data[:, 4:, 1, 2] = 1.e300
+    data[:, 6:, 2, 3] = 1.e300
+    gdq = np.zeros(data.shape, dtype=np.uint8)
+    gdq[:, 7:, 2, 3] = SATURATED
+    read_noise = np.full((3, 4), 1.e-155)
+
+    gdq_new = check_against_per_pixel(data, gdq, read_noise, 4., nframes)
+    assert gdq_new[0, 4, 1, 2] == JUMP_DET
+
+    # Where a group is saturated, its NaN ratio ranks highest, so the jump
+    # is only found as the 2nd highest outlier
+    assert gdq_new[0, 6, 2, 3] == (JUMP_DET if nframes > 1 else 0)
+
+
+@pytest.mark.parametrize('nframes', [1, 4])
+def test_ties(nframes):
+    # Integer ramps have many equal ratios, both between jumps of the same
+    # size and between the groups left once those are masked; the group
+    # that is taken first affects the median slopes and the flags
+    data, gdq, read_noise = cosmic_ray_ramps(ngroups=9, ncrs=0, seed=5)
+    data = np.round(data / 50.) * 50.
+    data[:, 3:, ::2] += 800.
+    data[:, 6:, ::2] += 800.
+    data[:, 5:, 1::3] -= 800.
+    read_noise[:] = 1.
+
+    check_against_per_pixel(data, gdq, read_noise, 4., nframes)
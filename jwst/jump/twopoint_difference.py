@@ -4,9 +4,11 @@ Two-Point Difference method for finding outliers in a 3-d ramp data cube.
 The scheme used in this variation of the method uses numpy array methods
 to compute first-differences and find the max outlier in each pixel while
 still working in the full 3-d data array. This makes detection of the first
-outlier very fast. We then iterate pixel-by-pixel over only those pixels
-that are already known to contain an outlier, to look for any additional
-outliers and set the appropriate DQ mask for all outliers in the pixel.
+outlier very fast. We then iterate over only those pixels that are already
+known to contain an outlier, to look for any additional outliers and set the
+appropriate DQ mask for all outliers in the pixel. These pixels are also
+handled with array methods, all of them together on every iteration, rather
+than one pixel at a time.
 
 This is MUCH faster than doing all the work on a pixel-by-pixel basis.
 '''
@@ -54,8 +56,13 @@ def find_CRs(data, gdq, read_noise, rej_threshold, nframes):
         # Compute first differences of adjacent groups up the ramp
         first_diffs = np.diff(rdata, axis=2)
 
-        # Compute median of the first differences for all pixels
-        med_diffs = np.nanmedian(first_diffs, axis=2)
+        # Compute median of the first differences for all pixels. This uses
+        # the selection-based median, and the (sort-based) nanmedian only
+        # for the pixels that have saturated groups
+        med_diffs = np.median(first_diffs, axis=2)
+        sat_pix = np.where(np.isnan(med_diffs))
+        if len(sat_pix[0]) > 0:
+            med_diffs[sat_pix] = np.nanmedian(first_diffs[sat_pix], axis=1)
 
         # Zero-out results for pixels that have NaN's in all groups so they
         # don't cause trouble in later calculations
@@ -87,28 +94,37 @@ def find_CRs(data, gdq, read_noise, rej_threshold, nframes):
         # negative outliers
         ratio = np.abs(first_diffs - med_diffs[:,:,np.newaxis])/sigma[:,:,np.newaxis]
 
-        # Sort the ratios, as they will be checked against the threshold
-        # from greatest->least
-        sortindx = np.argsort(ratio)
-
-        # Find the group index of the max outlier in each pixel
-        # (the RHS is identical to the previous versions:
-        #  max_index = np.nanargmax (ratio, axis=2)
-        max_index1 = sortindx[:,:,ngroups-2]
+        # Find the group indexes of the highest and 2nd highest outliers in
+        # each pixel. Only these two are needed, so rather than sorting the
+        # ratios of every pixel, they are picked out with two passes.
+        # As in a sort, NaN's (saturated groups) are ranked above all other
+        # values, including infinite ratios, so that they are found first
+        # but never taken as outliers, and equal values are ranked in order
+        # of group.
+        r, c = np.indices(ratio.shape[:2])
+        nan_ratio = np.isnan(ratio)
+        ranked = np.where(nan_ratio, -1., ratio)
+
+        max_index1 = highest_ratio(ranked, nan_ratio)
+        max_ratio1 = ratio[r, c, max_index1]
+
+        # Exclude the highest ratio to find the 2nd highest
+        nan_ratio[r, c, max_index1] = False
+        ranked[r, c, max_index1] = -1.
+        max_index2 = highest_ratio(ranked, nan_ratio)
+        max_ratio2 = ratio[r, c, max_index2]
 
         # Get indices of highest values (may be outliers) that are above the
-        # rejection threshold
-        r, c = np.indices(max_index1.shape)
-        r1, c1 = np.where(ratio[r, c, max_index1] > rej_threshold)
+        # rejection threshold; NaN's never are
+        with np.errstate(invalid='ignore'):
+            r1, c1 = np.where(max_ratio1 > rej_threshold)
         total_1 = len(r1)
 
         log.debug('From highest outlier Twopt found %d pixels with at least one CR' % (len(r1)))
 
-        # Find the group index of the 2nd highest outlier in each pixel
-        max_index2 = sortindx[:,:,ngroups-3]
-
         # Get indices of the 2nd highest values above the rejection threshold
-        r2, c2 = np.where(ratio[r,c,max_index2] > rej_threshold)
+        with np.errstate(invalid='ignore'):
+            r2, c2 = np.where(max_ratio2 > rej_threshold)
 
         if nframes>1:  # Use 2nd highest outliers if nframes>1
             # Combine both sets of rows,columns for outliers above threshold
@@ -121,74 +137,136 @@ def find_CRs(data, gdq, read_noise, rej_threshold, nframes):
 
         total_both = len(rboth)  
 
-        # Loop over pixels that have an outlier, checking to see if they have
-        # more than 1 outlier
-        for j in range(total_both):
-            # Get the row/col indexes of current pixel with an outlier.
-            # From the concatenate() above, the initial total_1 values (r1,c1)
-            # correspond to the highest outlier, and the remaining values
-            # (r2,c2) correspond to the 2nd highest outlier.
-            row, col = rboth[j], cboth[j]
-            masked_diffs = first_diffs[row, col]
-            rn2 = read_noise_2[row, col]
-
-            # Create a saturation mask based on NaN's in the first_diffs
-            sat_mask = np.isfinite(masked_diffs)
-
-            # Create a CR mask and initialize with the max outlier;
-            # cr_mask=0 designates a CR
-            cr_mask = np.ones(masked_diffs.shape, dtype=bool)
-
-            if j < total_1:   # Set mask for the highest outlier
-                cr_mask[ max_index1[row, col]] = 0
-            else:  # It's the 2nd highest
-                cr_mask[ max_index2[row, col]] = 0
-
-            # Now iteratively search for and reject additional outliers for
-            # this pixel
-            iter = 1
-            while iter:
-                # Recompute the masked median, noise, and ratios for this pixel
-                med = np.median(masked_diffs[cr_mask*sat_mask])
-                poisson_noise = np.sqrt(np.abs(med))
-                sigma = np.sqrt(poisson_noise*poisson_noise + rn2/nframes)
-
-                ratio = np.abs(masked_diffs - med)/sigma
- 
-                # Get a list of group indexes sorted from largest to smallest
-                # deviation from the median
-                sortindx = np.argsort(ratio)[::-1]
-
-                # Check through the list to see if any qualify as an outlier.
-                # (since they are sorted, once these don't exceed the threshold
-                # you are done with this pixel)
-                
-                for i in sortindx:
-                    # If already masked, continue to next index
-                    if not cr_mask[i]*sat_mask[i]:
-                        continue
-
-                    # If above threshold, set a CR mask and iterate on this pixel
-                    elif ratio[i] > rej_threshold:
-                        cr_mask[i] = 0
-                        iter = 1
-                        break
-
-                    # If not above threshold, we're done with this pixel
-                    else:
-                        iter = 0
-                        break
-
-            # Set CR flags in input DQ array for this pixel
+        # Look for additional outliers in all pixels that have at least one,
+        # iterating on all of them at once. From the concatenate() above,
+        # the initial total_1 values (r1,c1) correspond to the highest
+        # outlier, and the remaining values (r2,c2) correspond to the 2nd
+        # highest outlier; a pixel may appear in both sets, in which case
+        # it is searched once starting from each of its outliers.
+        max_index = np.concatenate((max_index1[r1, c1],
+                                    max_index2[rboth[total_1:],
+                                               cboth[total_1:]]))
+        cr_mask, med = find_more_outliers(first_diffs[rboth, cboth],
+                                          read_noise_2[rboth, cboth],
+                                          max_index, rej_threshold, nframes)
+
+        # Set CR flags in input DQ array and save the CR-cleaned median
+        # slopes, first for the highest and then for the 2nd highest
+        # outliers, so that a pixel found in both sets is updated twice
+        for first, last in ((0, total_1), (total_1, total_both)):
+            row, col = rboth[first:last], cboth[first:last]
             gdq[integration, 1:, row, col] = np.bitwise_or \
                               (gdq[integration, 1:, row, col],
-                               dqflags.group['JUMP_DET']*np.invert(cr_mask))
-            
-            # Save the CR-cleaned median slope for this pixel
-            median_slopes[integration, row, col] = med
-
-        # Next pixel with an outlier (j loop)
+                               dqflags.group['JUMP_DET'] *
+                               np.invert(cr_mask[first:last]))
+            median_slopes[integration, row, col] = med[first:last]
 
     # Next integration (integration loop)
 
     return median_slopes
+
+
+def highest_ratio(ranked, nan_ratio):
+    """
+    Find the group index of the highest ratio in each pixel, ranking NaN's
+    above all other values, and equal values in order of group (the last
+    one is the highest), as np.argsort does for the few groups of a ramp.
+
+    Parameters
+    ----------
+    ranked : 3-D float array, shape (nrows, ncols, ngroups-1)
+        The ratios, with -1 (below any ratio) in place of NaN's.
+    nan_ratio : 3-D bool array, shape (nrows, ncols, ngroups-1)
+        True where the ratios are NaN.
+
+    Returns
+    -------
+    2-D int array, shape (nrows, ncols)
+    """
+    nlast = ranked.shape[2] - 1
+    max_index = nlast - np.argmax(ranked[:, :, ::-1], axis=2)
+    nan_index = nlast - np.argmax(nan_ratio[:, :, ::-1], axis=2)
+    return np.where(nan_ratio.any(axis=2), nan_index, max_index)
+
+
+def find_more_outliers(diffs, read_noise_2, max_index, rej_threshold,
+                       nframes):
+    """
+    Iteratively search for additional outliers in a set of pixels that are
+    already known to contain one, working on all of the pixels at once.
+
+    On every pass the median, noise and ratios are recomputed for every
+    pixel from its remaining (unmasked) first differences, and the largest
+    remaining outlier of each pixel is masked if it is above the rejection
+    threshold. Pixels in which nothing more is masked are done; the passes
+    continue until all pixels are done.
+
+    Parameters
+    ----------
+    diffs : 2-D float array, shape (npix, ngroups-1)
+        First differences of the pixels to search; NaN for saturated groups.
+    read_noise_2 : 1-D float array, shape (npix,)
+        Squared read noise of the pixels.
+    max_index : 1-D int array, shape (npix,)
+        Index of the outlier already found in each pixel.
+    rej_threshold : float
+        Rejection threshold, in units of sigma.
+    nframes : int
+        Number of frames averaged into each group.
+
+    Returns
+    -------
+    cr_mask : 2-D bool array, shape (npix, ngroups-1)
+        False for the first differences flagged as outliers.
+    med : 1-D float array, shape (npix,)
+        CR-cleaned median first difference of each pixel.
+    """
+    npix, ndiffs = diffs.shape
+
+    # Create a saturation mask based on NaN's in the first_diffs
+    sat_mask = np.isfinite(diffs)
+
+    # Create a CR mask and initialize with the known outlier;
+    # cr_mask=0 designates a CR
+    cr_mask = np.ones(diffs.shape, dtype=bool)
+    cr_mask[np.arange(npix), max_index] = False
+
+    med = np.zeros(npix, dtype=diffs.dtype)
+
+    # Pixels still being searched
+    active = np.arange(npix)
+    while len(active) > 0:
+        a_diffs = diffs[active]
+        a_mask = cr_mask[active] & sat_mask[active]
+
+        # Recompute the masked median, noise, and ratios for these pixels.
+        # Masked values are set to NaN, which sort after all others, so the
+        # median is taken from the first ngood sorted values of each pixel.
+        ngood = a_mask.sum(axis=1)
+        sorted_diffs = np.sort(np.where(a_mask, a_diffs, np.nan), axis=1)
+        rows = np.arange(len(active))
+        lo = sorted_diffs[rows, np.maximum((ngood - 1) // 2, 0)]
+        hi = sorted_diffs[rows, np.maximum(ngood // 2, 0)]
+        a_med = np.where(ngood % 2 == 1, lo, (lo + hi) / 2.)
+        med[active] = a_med
+
+        poisson_noise = np.sqrt(np.abs(a_med))
+        sigma = np.sqrt(poisson_noise*poisson_noise +
+                        read_noise_2[active]/nframes)
+
+        ratio = np.abs(a_diffs - a_med[:, np.newaxis])/sigma[:, np.newaxis]
+
+        # Find the largest remaining deviation from the median in each
+        # pixel; if it is above threshold, set a CR mask and iterate on
+        # the pixel, otherwise we're done with the pixel. Ties (e.g. the
+        # two values left in a pixel are equally far from their mean) go
+        # to the later group, as when checking a list of indexes sorted
+        # from largest to smallest deviation.
+        ratio[~a_mask] = -1.
+        imax = ndiffs - 1 - np.argmax(ratio[:, ::-1], axis=1)
+        is_cr = ratio[rows, imax] > rej_threshold
+
+        cr_mask[active[is_cr], imax[is_cr]] = False
+        active = active[is_cr]
+
+    return cr_mask, med
@@ -1,5 +1,4 @@
 from ..stpipe import Step
-from .. import datamodels
 from . import lastframe_sub
 
 
@@ -13,13 +12,14 @@ class LastFrameStep(Step):
     def process(self, input):
 
         # Open the input data model
-        with datamodels.open(input) as input_model:
+        with self.open_model(input) as input_model:
 
             # check the data is MIRI data
             detector = input_model.meta.instrument.detector
             if detector[:3] == 'MIR':
                 # Do the lastframe correction subtraction
-                result = lastframe_sub.do_correction(input_model)
+                result = lastframe_sub.do_correction(input_model,
+                                                     self.in_place)
             else:
                 self.log.warning('Last Frame Correction is only for MIRI data')
                 self.log.warning('Last frame step will be skipped')
@@ -11,7 +11,7 @@ log = logging.getLogger(__name__)
 log.setLevel(logging.DEBUG)
 
 
-def do_correction(input_model):
+def do_correction(input_model, in_place=False):
     """
     Short Summary
     -------------
@@ -23,6 +23,9 @@ def do_correction(input_model):
     input_model: data model object
         science data to be corrected
 
+    in_place: bool
+        if True, correct the input model itself rather than a copy of it
+
     Returns
     -------
     output: data model object
@@ -33,8 +36,12 @@ def do_correction(input_model):
     # Save some data params for easy use later
     sci_ngroups = input_model.data.shape[1]
 
-    # Create output as a copy of the input science data model
-    output = input_model.copy()
+    # Create output as a copy of the input science data model, unless the
+    # correction is to be done in place
+    if in_place:
+        output = input_model
+    else:
+        output = input_model.copy()
 
     # Update the step status, and if ngroups > 1, set all of the GROUPDQ in
     # the final group to 'DO_NOT_USE'
@@ -0,0 +1,165 @@
+"""
+Apply a function to a sequence of independent items (for example one
+per exposure) in a pool of worker threads or processes, with a bounded
+number of items in flight.
+"""
+from __future__ import absolute_import, division
+
+from collections import deque
+import logging
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+__all__ = [
+    'compute_num_workers',
+    'ordered_map'
+]
+
+# The function and items of the current process pool; set in the worker
+# processes by _init_worker.
+_worker_state = {}
+
+
+def compute_num_workers(max_cores, n_tasks):
+    """
+    Calculate the number of workers to use.
+
+    Parameters
+    ----------
+    max_cores: str or int
+        Fraction of the available cores to use; one of 'none', 'quarter',
+        'half', or 'all'.  An integer is the number of workers itself,
+        whatever the number of cores.
+
+    n_tasks: int
+        Number of independent tasks.
+
+    Returns
+    -------
+    num_workers: int
+        Number of workers; 1 means that processing is serial.
+    """
+    if isinstance(max_cores, int):
+        return max(1, min(max_cores, n_tasks))
+
+    num_cores = multiprocessing.cpu_count()
+
+    if max_cores == 'quarter':
+        num_workers = num_cores // 4
+    elif max_cores == 'half':
+        num_workers = num_cores // 2
+    elif max_cores == 'all':
+        num_workers = num_cores
+    else:
+        num_workers = 1
+
+    # There is no point in having more workers than tasks
+    return max(1, min(num_workers, n_tasks))
+
+
+def ordered_map(func, items, num_workers=1, backend='thread',
+                max_in_flight=None):
+    """
+    Apply a function to each item, returning the results in the order of
+    the items.
+
+    No more than `max_in_flight` items are submitted to the workers ahead
+    of the result being consumed, so that the results held in memory at
+    any time are bounded, however many items there are.  Except with the
+    'process' backend, the items are also taken from `items` only as they
+    are submitted, so they may be generated on the fly.
+
+    Parameters
+    ----------
+    func: callable
+        The function to apply to each item.  With the 'process' backend,
+        its results must be picklable, and any changes it makes to its
+        arguments are not seen by the caller.
+
+    items: iterable
+        The items.  With the 'process' backend, the function and the items
+        are inherited by the worker processes when they are forked, so
+        neither needs to be picklable, and all the items are gathered
+        before the workers start.  This backend is therefore only
+        available on platforms that support the 'fork' start method.
+
+    num_workers: int
+        The number of worker threads or processes; 1 (the default) applies
+        the function serially in this thread.
+
+    backend: str
+        'thread' or 'process'.
+
+    max_in_flight: int or None
+        The maximum number of items being processed or whose results have
+        not been consumed yet.  The default is twice `num_workers`.
+
+    Returns
+    -------
+    results: iterator
+        The result of `func` for each item, in order.
+    """
+    if num_workers <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    if max_in_flight is None:
+        max_in_flight = 2 * num_workers
+    max_in_flight = max(1, max_in_flight)
+
+    if backend == 'thread':
+        pool = ThreadPool(num_workers)
+
+        def submit(index, item):
+            return pool.apply_async(func, (item,))
+    elif backend == 'process':
+        context = _fork_context()
+        items = list(items)
+        pool = context.Pool(num_workers, initializer=_init_worker,
+                            initargs=(func, items))
+
+        def submit(index, item):
+            return pool.apply_async(_run_worker, (index,))
+    else:
+        raise ValueError("Unknown backend {0!r}".format(backend))
+    logger.debug('Using %d worker %ss', num_workers, backend)
+
+    try:
+        pending = deque()
+        for index, item in enumerate(items):
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().get()
+            pending.append(submit(index, item))
+        while pending:
+            yield pending.popleft().get()
+    except BaseException:
+        pool.terminate()
+        raise
+    else:
+        pool.close()
+    finally:
+        pool.join()
+
+
+def _fork_context():
+    # The workers must inherit the function and items rather than receive
+    # them pickled, whatever the default start method of the platform is
+    try:
+        return multiprocessing.get_context('fork')
+    except ValueError:
+        raise RuntimeError("The 'process' backend needs the 'fork' start "
+                           "method, which is not available on this "
+                           "platform; use the 'thread' backend instead")
+
+
+def _init_worker(func, items):
+    _worker_state['func'] = func
+    _worker_state['items'] = items
+
+
+def _run_worker(index):
+    return _worker_state['func'](_worker_state['items'][index])
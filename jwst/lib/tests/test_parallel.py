@@ -0,0 +1,119 @@
+"""
+Tests of the parallel module
+"""
+from __future__ import absolute_import
+
+import os
+import threading
+
+import pytest
+
+from .. import parallel
+
+
+def square(x):
+    return x * x
+
+
+def fail_on_three(x):
+    if x == 3:
+        raise RuntimeError('three')
+    return x
+
+
+@pytest.mark.parametrize('backend', ['thread', 'process'])
+@pytest.mark.parametrize('num_workers', [1, 2, 4])
+def test_ordered_map(backend, num_workers):
+    results = parallel.ordered_map(square, range(20),
+                                   num_workers=num_workers, backend=backend)
+    assert list(results) == [x * x for x in range(20)]
+
+
+def test_ordered_map_unpicklable_function():
+    """Processes inherit the function, so closures can be used"""
+    offset = 10
+    results = parallel.ordered_map(lambda x: x + offset, range(5),
+                                   num_workers=2, backend='process')
+    assert list(results) == [10, 11, 12, 13, 14]
+
+
+def test_ordered_map_uses_processes():
+    pids = set(parallel.ordered_map(lambda x: os.getpid(), range(8),
+                                    num_workers=2, backend='process'))
+    assert os.getpid() not in pids
+
+
+def test_ordered_map_in_flight():
+    lock = threading.Lock()
+    state = {'started': 0, 'max_ahead': 0}
+
+    def work(x):
+        with lock:
+            state['started'] += 1
+        return x
+
+    consumed = 0
+    for result in parallel.ordered_map(work, range(30), num_workers=4,
+                                       max_in_flight=3):
+        consumed += 1
+        with lock:
+            state['max_ahead'] = max(state['max_ahead'],
+                                     state['started'] - consumed)
+    assert consumed == 30
+    assert state['max_ahead'] <= 3 - 1
+
+
+def test_ordered_map_lazy_items():
+    """Threads take the items from a generator only as they are needed"""
+    state = {'taken': 0}
+
+    def generate():
+        for x in range(30):
+            state['taken'] += 1
+            yield x
+
+    consumed = 0
+    for result in parallel.ordered_map(square, generate(), num_workers=4,
+                                       max_in_flight=3):
+        assert result == consumed * consumed
+        consumed += 1
+        assert state['taken'] <= consumed + 3
+    assert consumed == 30
+
+
+@pytest.mark.parametrize('backend', ['thread', 'process'])
+def test_ordered_map_error(backend):
+    results = parallel.ordered_map(fail_on_three, range(10),
+                                   num_workers=2, backend=backend)
+    assert next(results) == 0
+    with pytest.raises(RuntimeError):
+        list(results)
+
+
+def test_ordered_map_process_needs_fork(monkeypatch):
+    def get_context(method=None):
+        raise ValueError('cannot find context for {0!r}'.format(method))
+
+    monkeypatch.setattr(parallel.multiprocessing, 'get_context', get_context)
+    with pytest.raises(RuntimeError):
+        list(parallel.ordered_map(square, range(4), num_workers=2,
+                                  backend='process'))
+
+
+def test_ordered_map_bad_backend():
+    with pytest.raises(ValueError):
+        list(parallel.ordered_map(square, range(4), num_workers=2,
+                                  backend='cluster'))
+
+
+@pytest.mark.parametrize('max_cores', ['none', 'quarter', 'half', 'all'])
+def test_compute_num_workers(max_cores):
+    num_workers = parallel.compute_num_workers(max_cores, 3)
+    assert 1 <= num_workers <= 3
+    assert parallel.compute_num_workers(max_cores, 1) == 1
+
+
+def test_compute_num_workers_explicit():
+    assert parallel.compute_num_workers(4, 10) == 4
+    assert parallel.compute_num_workers(4, 3) == 3
+    assert parallel.compute_num_workers(0, 3) == 1
@@ -10,7 +10,7 @@ log = logging.getLogger(__name__)
 log.setLevel(logging.DEBUG)
 
 
-def do_correction(input_model, lin_model):
+def do_correction(input_model, lin_model, in_place=False):
     """
     Short Summary
     -------------
@@ -24,14 +24,21 @@ def do_correction(input_model, lin_model):
     lin_model: linearity model object
         linearity reference file data model
 
+    in_place: bool
+        if True, correct the input model itself rather than a copy of it
+
     Returns
     -------
     output_model: data model object
         linearity corrected data
 
     """
-    # Create the output model as a copy of the input
-    output_model = input_model.copy()
+    # Create the output model as a copy of the input, unless the
+    # correction is to be done in place
+    if in_place:
+        output_model = input_model
+    else:
+        output_model = input_model.copy()
 
     # Propagate the DQ flags from the linearity ref data into the 2D science DQ
     propagate_dq_info(output_model, lin_model)
@@ -98,6 +105,40 @@ def apply_linearity(input, linearity_ref_model):
     if len(dq) == 0:
         dq = (ramp * 0).astype(np.uint32)
 
+    # Get the correction coefficients for the science data
+    lin_coeffs = get_coeffs(input, linearity_ref_model)
+
+    # Get the DQ bit value that represents saturation
+    sat_val = dqflags.group['SATURATED']
+
+    # Apply the correction function
+    input.data = apply_linearity_func(ramp, dq, lin_coeffs, sat_val)
+
+
+def get_coeffs(input, linearity_ref_model):
+    """
+    Short Summary
+    -------------
+    Get the linearity correction coefficients from the reference file,
+    extracting the subarray that matches the science data if necessary.
+    The coefficients of pixels flagged as NO_LIN_CORR, or that are NaN, are
+    reset so that no correction is applied to the pixels.
+
+    Parameters
+    ----------
+    input: data model object
+        science data model to be corrected; the PIXELDQ of pixels with
+        NaN coefficients is updated in place
+
+    linearity_ref_model: linearity model object
+        linearity reference data
+
+    Returns
+    -------
+    lin_coeffs: 3D array
+        array of correction coefficients for the science data
+    """
+
     # Check for subarray mode
     if ref_matches_sci(linearity_ref_model, input):
         lin_coeffs = linearity_ref_model.coeffs
@@ -112,11 +153,7 @@ def apply_linearity(input, linearity_ref_model):
     # Check for NaNs in the COEFFS extension of the ref file
     lin_coeffs = correct_for_NaN(lin_coeffs, input)
 
-    # Get the DQ bit value that represents saturation
-    sat_val = dqflags.group['SATURATED']
-
-    # Apply the correction function
-    input.data = apply_linearity_func(ramp, dq, lin_coeffs, sat_val)
+    return lin_coeffs
 
 
 def ref_matches_sci(ref_model, sci_model):
@@ -181,8 +218,10 @@ def correct_for_NaN(lin_coeffs, input):
                          dtype=np.uint32)
 
     # If there are NaNs as the correction coefficients, update those
-    # coefficients so that those SCI values will be unchanged.
+    # coefficients (in a copy, so that the reference file data are not
+    # modified) so that those SCI values will be unchanged.
     if len(wh_nan[0]) > 0:
+        lin_coeffs = lin_coeffs.copy()
         ben_cor = ben_coeffs(lin_coeffs) # get benign coefficients
         num_nan = len(wh_nan[0])
 
@@ -231,8 +270,10 @@ def correct_for_flag(lin_coeffs, lin_dq):
     yf, xf = wh_lin[0], wh_lin[1]
 
     # If there are pixels flagged as 'NO_LIN_CORR', update the corresponding
-    #     coefficients so that those SCI values will be unchanged.
+    #     coefficients (in a copy, so that the reference file data are not
+    #     modified) so that those SCI values will be unchanged.
     if (num_flag > 0):
+        lin_coeffs = lin_coeffs.copy()
         ben_cor = ben_coeffs(lin_coeffs) # get benign coefficients
 
         for ii in range(num_flag):
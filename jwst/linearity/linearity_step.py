@@ -14,7 +14,7 @@ class LinearityStep(Step):
     def process(self, input):
 
         # Open the input data model
-        with datamodels.open(input) as input_model:
+        with self.open_model(input) as input_model:
 
             # Get the name of the linearity reference file to use
             self.lin_name = self.get_reference_file(input_model, 'linearity')
@@ -29,10 +29,12 @@ class LinearityStep(Step):
                 return result
 
             # Open the linearity reference file data model
-            lin_model = datamodels.LinearityModel(self.lin_name)
+            lin_model = self.open_reference_model(self.lin_name,
+                                                  datamodels.LinearityModel)
 
             # Do the linearity correction
-            result = linearity.do_correction(input_model, lin_model)
+            result = linearity.do_correction(input_model, lin_model,
+                                             self.in_place)
 
             # Close the reference file and update the step status
             lin_model.close()
@@ -8,30 +8,72 @@ Create a blotted images that match the inputs from the combined median image.
 """
 import numpy as np
 
+from ..lib import parallel
 from ..resample import gwcs_blot
 from .. import datamodels
 
 
 def do_blot(median_model, input_models, **pars):
+    """
+    Blot the median image back to the frame of each input image.
+
+    Returns a ModelContainer of the blot products made by `blot_images`.
+    """
+    blot_models = datamodels.ModelContainer()
+    for blot_model in blot_images(median_model, input_models, **pars):
+        blot_models.append(blot_model)
+    return blot_models
+
+
+def blot_images(median_model, input_models, **pars):
+    """
+    Generate the blotted median image for each input image, in order.
+
+    Each blot product is a new ImageModel holding only the blotted data,
+    the metadata of its input image and the input WCS; the arrays of the
+    input image are not copied.  Products are generated as they are
+    consumed, so that they need not all be held in memory at once.
+
+    Parameters
+    ----------
+    median_model : ImageModel
+        the median image
+
+    input_models : ModelContainer
+        the input images
+
+    pars : dict
+        'interp' and 'sinscl' for the blotting, and 'maximum_cores' and
+        'parallel_backend' for blotting several images in parallel
+
+    Returns
+    -------
+    blot_models : iterator of ImageModel
+        the blot products, named after their input images
+    """
     # start by interpreting input parameters
     interp = pars.get('interp', 'poly5')
     sinscl = pars.get('sinscl', 1.0)
 
-    # Initialize output product
-    blot_models = datamodels.ModelContainer()
-
     do_blot = gwcs_blot.GWCSBlot(median_model)
 
-    for input_img in input_models:
-        blot_model = input_img.copy()
+    # The input images are blotted independently of each other, possibly
+    # in parallel
+    def blot_image(input_img):
+        # apply blot to re-create input_img.data from median image
+        return do_blot.extract_image(input_img.meta.wcs,
+                                     interp=interp, sinscl=sinscl)
+
+    num_workers = parallel.compute_num_workers(
+        pars.get('maximum_cores', 'none'), len(input_models))
+    blot_results = parallel.ordered_map(blot_image, input_models,
+                        num_workers=num_workers,
+                        backend=pars.get('parallel_backend', 'thread'))
+
+    for input_img, blot_data in zip(input_models, blot_results):
+        blot_model = datamodels.ImageModel(data=blot_data)
+        blot_model.update(input_img)
+        blot_model.meta.wcs = input_img.meta.wcs
         blot_root = '_'.join(input_img.meta.filename.replace('.fits', '').split('_')[:-1])
         blot_model.meta.filename = '{}_blot.fits'.format(blot_root)
-
-        # clean out extra data not related to blot result
-        blot_model.err = None
-        blot_model.dq = None
-        # apply blot to re-create input_img.data from median image
-        blot_model.data = do_blot.extract_image(input_img.meta.wcs,
-                                        interp=interp, sinscl=sinscl)
-        blot_models.append(blot_model)
-    return blot_models
+        yield blot_model
@@ -5,20 +5,53 @@ NOTE: This version is simplified from astrodrizzle's version in the
         following ways:
         - type of combination: fixed to 'median'
         - 'minmed' not implemented as an option
-        - does not use buffers to try to minimize memory usage
+
+The median may be computed section by section (strips of rows) to limit
+the memory used, by setting the 'buffer_size' parameter.
 
 :Authors: Warren Hack
 
 :License:
 
 """
+import logging
+
 import numpy as np
 
 from stsci.image import numcombine
 from stsci.imagestats import ImageStats
 
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+
 
 def do_median(drizzle_groups_sci, drizzle_groups_wht, **pars):
+    """
+    Create the median of the singly drizzled images.
+
+    Parameters
+    ----------
+    drizzle_groups_sci : list of 2-D arrays
+        The science arrays of the drizzled images.  These may be memory
+        maps of arrays on disk, in which case only one section of each
+        is read at a time if 'buffer_size' is given; otherwise they are
+        already in memory, and 'buffer_size' only bounds the memory used
+        to combine them.
+
+    drizzle_groups_wht : list of 2-D arrays
+        The weight arrays of the drizzled images.
+
+    pars : dict
+        Parameters of the combination: 'nlow', 'nhigh', 'hthresh',
+        'lthresh', 'nsigma', 'maskpt', and 'buffer_size', the size in MB
+        of the sections of all of the input arrays that are combined at a
+        time; None (the default) combines the whole images at once.
+
+    Returns
+    -------
+    median_array : 2-D array
+        The median image.
+    """
     # start by interpreting input parameters
     nlow = pars.get('nlow', 0)
     nhigh = pars.get('nhigh', 0)
@@ -26,6 +59,7 @@ def do_median(drizzle_groups_sci, drizzle_groups_wht, **pars):
     low_threshold = pars.get('lthresh', None)
     nsigma = pars.get('nsigma', '4 3')
     maskpt = pars.get('maskpt', 0.7)
+    buffer_size = pars.get('buffer_size', None)
 
     # Perform additional interpretation of some parameters
     sigmaSplit = nsigma.split()
@@ -40,26 +74,69 @@ def do_median(drizzle_groups_sci, drizzle_groups_wht, **pars):
     if high_threshold is not None: high_threshold = float(high_threshold)
     if low_threshold is not None: low_threshold = float(low_threshold)
 
-
-    _weight_mask_list = []
-
+    # The weight below which a pixel is masked, for each image.  This is
+    # computed from the whole weight image, whether or not the median is
+    # computed section by section.
+    _wht_means = []
     for weight_arr in drizzle_groups_wht:
-        # Initialize an output mask array to ones
-        # This array will be reused for every output weight image
-        _weight_mask = np.zeros(weight_arr.shape, dtype=np.uint8)
         try:
             tmp_mean_value = ImageStats(weight_arr, lower=1e-8,
                 fields="mean", nclip=0).mean
         except ValueError:
             tmp_mean_value = 0.0
-        _wht_mean = tmp_mean_value * maskpt
+        _wht_means.append(tmp_mean_value * maskpt)
+
+    nrows = drizzle_groups_sci[0].shape[0]
+    if buffer_size is None:
+        section_rows = nrows
+    else:
+        # Bytes per row of the input sections, their masks, and the
+        # masks created by numCombine.
+        row_bytes = sum(sci.shape[1] * (sci.dtype.itemsize +
+                                        wht.dtype.itemsize + 3)
+                        for sci, wht in zip(drizzle_groups_sci,
+                                            drizzle_groups_wht))
+        section_rows = int(buffer_size * 1024.**2 / row_bytes)
+        section_rows = min(max(section_rows, 1), nrows)
+
+    if section_rows >= nrows:
+        return _median_section(drizzle_groups_sci, drizzle_groups_wht,
+                               _wht_means, nlow, nhigh,
+                               high_threshold, low_threshold)
+
+    log.debug("Computing the median in sections of %d rows", section_rows)
+    median_array = np.empty(drizzle_groups_sci[0].shape,
+                            dtype=drizzle_groups_sci[0].dtype)
+    for rlo in range(0, nrows, section_rows):
+        rhi = min(rlo + section_rows, nrows)
+        # Copying the sections reads them, if the arrays are memory maps.
+        median_array[rlo:rhi] = _median_section(
+            [np.array(sci[rlo:rhi]) for sci in drizzle_groups_sci],
+            [np.array(wht[rlo:rhi]) for wht in drizzle_groups_wht],
+            _wht_means, nlow, nhigh, high_threshold, low_threshold)
+
+    return median_array
+
+
+def _median_section(drizzle_groups_sci, drizzle_groups_wht, wht_means,
+                    nlow, nhigh, high_threshold, low_threshold):
+    """
+    Create the median of the same section of each drizzled image,
+    masking the pixels with weights below `wht_means`.
+    """
+    _weight_mask_list = []
+
+    for weight_arr, _wht_mean in zip(drizzle_groups_wht, wht_means):
+        # Initialize an output mask array to ones
+        # This array will be reused for every output weight image
+        _weight_mask = np.zeros(weight_arr.shape, dtype=np.uint8)
         # 0 means good, 1 means bad here...
         np.putmask(_weight_mask, np.less(weight_arr, _wht_mean), 1)
         #_weight_mask.info()
         _weight_mask_list.append(_weight_mask)
 
     # Create the combined array object using the numcombine task
-    result = numcombine.numCombine(drizzle_groups_sci,
+    result = numcombine.numCombine(list(drizzle_groups_sci),
                             numarrayMaskList=_weight_mask_list,
                             combinationType="median",
                             nlow=nlow,
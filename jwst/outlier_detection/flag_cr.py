@@ -7,6 +7,7 @@ from stsci.tools import bitmask
 
 from .. import datamodels
 from .. import assign_wcs
+from ..lib import parallel
 # from ..stpipe import Step
 
 from . import quickDeriv
@@ -26,7 +27,7 @@ def do_detection(input_models, blot_models, ref_filename, **pars):
     input_models: JWST ModelContainer object
         data model container holding science ImageModels, modified in place
 
-    blot_models : JWST ModelContainer object
+    blot_models : JWST ModelContainer object or iterator of ImageModel
         data model container holding ImageModels of the median output frame
         blotted back to the wcs and frame of the ImageModels in input_models
 
@@ -37,6 +38,13 @@ def do_detection(input_models, blot_models, ref_filename, **pars):
     -------
     None
         The dq array in each input model is modified in place
+
+    Notes
+    -----
+    The outliers in each image are found independently of the other
+    images, in parallel if the parameter 'maximum_cores' is 'quarter',
+    'half' or 'all', using the 'parallel_backend' parameter, 'thread' or
+    'process'.  The DQ arrays are updated and saved in this process.
     """
 
     #gain_models = build_reffile_container(input_models, 'gain')
@@ -45,9 +53,22 @@ def do_detection(input_models, blot_models, ref_filename, **pars):
     gain_models = ref_filename['gain']
     rn_models = ref_filename['readnoise']
 
-    for image, blot, gain, rn in zip(input_models, blot_models, gain_models,
-        rn_models):
-        flag_cr(image, blot, gain, rn, **pars)
+    # The blot models may be generated on the fly, so they are only
+    # iterated over once
+    inputs = zip(input_models, blot_models, gain_models, rn_models)
+
+    def find_image_crs(args):
+        image, blot, gain, rn = args
+        return find_crs(image, blot, gain, rn, **pars)
+
+    num_workers = parallel.compute_num_workers(
+        pars.get('maximum_cores', 'none'), len(input_models))
+    cr_masks = parallel.ordered_map(find_image_crs, inputs,
+                        num_workers=num_workers,
+                        backend=pars.get('parallel_backend', 'thread'))
+
+    for image, cr_mask in zip(input_models, cr_masks):
+        update_dq(image, cr_mask)
 
 
 #def build_reffile_container_func(input_models, reftype):
@@ -105,7 +126,43 @@ def flag_cr(sci_image, blot_image, gain_image, readnoise_image, **pars):
     Masks outliers in science image
 
     Mask blemishes in dithered data by comparing a science image
+    with a model image and the derivative of the model image, and save
+    the science image with its updated DQ array.
+
+    The parameters are those of `find_crs`.
+    """
+    cr_mask = find_crs(sci_image, blot_image, gain_image, readnoise_image,
+                       **pars)
+    update_dq(sci_image, cr_mask)
+
+
+def update_dq(sci_image, cr_mask):
+    """
+    Flag the outliers in the DQ array of a science image, and save the
+    image to its file to preserve the changes.
+
+    Parameters
+    ----------
+    sci_image : ImageModel
+        the science data
+
+    cr_mask : ndarray
+        the mask returned by `find_crs`; False for outliers
+    """
+    # Update the DQ array in the input image
+    np.bitwise_or(sci_image.dq, np.invert(cr_mask) * CRBIT, sci_image.dq)
+
+    # write out the updated file to disk to preserve the changes
+    sci_image.save(sci_image.meta.filename)
+
+
+def find_crs(sci_image, blot_image, gain_image, readnoise_image, **pars):
+    """
+    Find outliers in science image
+
+    Find blemishes in dithered data by comparing a science image
     with a model image and the derivative of the model image.
+    The science image is not modified.
 
     Parameters
     ----------
@@ -131,6 +188,11 @@ def flag_cr(sci_image, blot_image, gain_image, readnoise_image, **pars):
     snr      = "4.0 3.0"       # Signal-to-noise ratio
     scale    = "0.5 0.4"       # scaling factor applied to the derivative
     backg    = 0               # Background value
+
+    Returns
+    -------
+    cr_mask : ndarray of bool
+        False for the outliers, True elsewhere
     """
 
     grow = pars.get('grow', 1)
@@ -257,9 +319,6 @@ def flag_cr(sci_image, blot_image, gain_image, readnoise_image, **pars):
     np.logical_and(where_cr_ctegrow_kernel_conv, where_cr_grow_kernel_conv, cr_mask)
     cr_mask = cr_mask.astype(bool)
 
-    # Update the DQ array in the input image
-    np.bitwise_or(sci_image.dq, np.invert(cr_mask) * CRBIT, sci_image.dq)
-
     del cr_mask_orig_bool
     del cr_grow_kernel
     del cr_grow_kernel_conv
@@ -268,8 +327,7 @@ def flag_cr(sci_image, blot_image, gain_image, readnoise_image, **pars):
     del where_cr_grow_kernel_conv
     del where_cr_ctegrow_kernel_conv
 
-    # write out the updated file to disk to preserve the changes
-    sci_image.save(sci_image.meta.filename)
+    return cr_mask
 
     # # write out the dq array as a separate file
     # outfilename = sci_image.meta.filename.split('.')[0] + '_dq.fits'
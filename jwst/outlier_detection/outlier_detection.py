@@ -2,6 +2,8 @@ import time
 import numpy as np
 from collections import OrderedDict
 
+from astropy.io import fits
+
 from .. import datamodels
 from .. import assign_wcs
 from .. import resample
@@ -43,7 +45,9 @@ class OutlierDetection(object):
                         'hthresh': None, 'lthresh': None,
                         'nsigma': '4 3', 'maskpt': 0.7,
                     'grow': 1, 'ctegrow': 0, 'snr': "4.0 3.0",
-                        'scale': "0.5 0.4", 'backg': 0
+                        'scale': "0.5 0.4", 'backg': 0,
+                    'buffer_size': None,
+                    'maximum_cores': 'none', 'parallel_backend': 'thread'
                 }
 
     def __init__(self, input_models, ref_filename=None, to_file=False, **pars):
@@ -133,22 +137,43 @@ class OutlierDetection(object):
         median_filename = '_'.join(base_filename.split('_')[:2] + ['median.fits'])
         median_model.meta.filename = median_filename
 
-        # Perform median combination on set of drizzled mosaics
-        drizzle_groups_sci = [i.data for i in drizzled_models]
-        drizzle_groups_wht = [i.wht for i in drizzled_models]
-        median_model.data = create_median.do_median(drizzle_groups_sci,
-                                        drizzle_groups_wht,
-                                        **pars)
+        # Perform median combination on set of drizzled mosaics.  Once they
+        # are saved, the drizzled models are released and the mosaics are
+        # read back memory-mapped, so that with a buffer_size only one
+        # section of each is read into memory at a time.
+        if self.to_file:
+            drizzle_files = [fits.open(model.meta.filename, memmap=True)
+                             for model in drizzled_models]
+            del sdriz, drizzled_models
+            drizzle_groups_sci = [f['SCI'].data for f in drizzle_files]
+            drizzle_groups_wht = [f['WHT'].data for f in drizzle_files]
+        else:
+            drizzle_files = []
+            drizzle_groups_sci = [i.data for i in drizzled_models]
+            drizzle_groups_wht = [i.wht for i in drizzled_models]
+        try:
+            median_model.data = create_median.do_median(drizzle_groups_sci,
+                                            drizzle_groups_wht,
+                                            **pars)
+        finally:
+            del drizzle_groups_sci, drizzle_groups_wht
+            for drizzle_file in drizzle_files:
+                drizzle_file.close()
         if self.to_file:
             log.info("Writing out MEDIAN image to: {}".format(median_model.meta.filename))
             median_model.save(median_model.meta.filename)
         # Blot the median image back to recreate each input image specified in
-        # the original input list/ASN/ModelContainer
-        blot_models = blot_median.do_blot(median_model, self.input_models,
-                     **pars)
+        # the original input list/ASN/ModelContainer.  Unless they are
+        # saved, the blot products are streamed into the outlier detection
+        # rather than all held at once.
         if self.to_file:
+            blot_models = blot_median.do_blot(median_model,
+                         self.input_models, **pars)
             log.info("Writing out BLOT input images...")
             blot_models.save(None)
+        else:
+            blot_models = blot_median.blot_images(median_model,
+                         self.input_models, **pars)
 
         # Perform outlier detection using statistical comparisons between
         # original input images and their blotted-median images
@@ -34,6 +34,9 @@ class OutlierDetectionStep(Step):
         snr = string(default='4.0 3.0')
         scale = string(default='0.5 0.4')
         backg = float(default=0.0)
+        buffer_size = float(default=None) # MB of input sections to combine at a time for the median; None for whole images
+        maximum_cores = option('none', 'quarter', 'half', 'all', default='none') # max number of workers for the per-exposure stages
+        parallel_backend = option('thread', 'process', default='thread') # kind of workers for the per-exposure stages
     """
     reference_file_types = ['gain', 'readnoise'] # No ref file for Build6...
 
@@ -48,7 +51,10 @@ class OutlierDetectionStep(Step):
         # Call the resampling routine
         self.step = outlier_detection.OutlierDetection(self.input_models,
                                 to_file=to_file,
-                                ref_filename=self.ref_filename)
+                                ref_filename=self.ref_filename,
+                                buffer_size=self.buffer_size,
+                                maximum_cores=self.maximum_cores,
+                                parallel_backend=self.parallel_backend)
         self.step.do_detection()
 
         return self.input_models
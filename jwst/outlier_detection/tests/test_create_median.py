@@ -0,0 +1,79 @@
+from __future__ import absolute_import, division
+
+import numpy as np
+from numpy.testing import assert_allclose
+import pytest
+from astropy.io import fits
+
+from .. import create_median
+
+NIMAGES, NROWS, NCOLS = 7, 23, 30
+
+# Bytes per row that do_median budgets for, for the mosaics below
+ROW_BYTES = NIMAGES * NCOLS * (4 + 4 + 3)
+
+
+@pytest.fixture(scope='module')
+def mosaics():
+    """
+    Drizzled science and weight mosaics, with low weights (below maskpt
+    times the mean weight) in some pixels of each but the first.
+    """
+    y, x = np.mgrid[:NROWS, :NCOLS]
+    sci, wht = [], []
+    for i in range(NIMAGES):
+        sci.append((100. + 10. * np.sin(x / 3. + i) +
+                    5. * np.cos(y * (i + 1) / 4.)).astype(np.float32))
+        weight = np.full((NROWS, NCOLS), 1000., dtype=np.float32)
+        if i:
+            weight[(x * y + i) % (i + 3) == 0] = 1.
+        wht.append(weight)
+    return sci, wht
+
+
+def expected_median(sci, wht, maskpt=0.7):
+    stack = np.array(sci, dtype=np.float64)
+    for image, weight in zip(stack, wht):
+        image[weight < maskpt * weight[weight > 1e-8].mean()] = np.nan
+    return np.nanmedian(stack, axis=0)
+
+
+@pytest.mark.parametrize('section_rows', [None, 1, 4, 5, 23, 40])
+def test_sections_match_nanmedian(mosaics, section_rows):
+    """
+    The median is the same whatever the size of the sections, including
+    sections of a number of rows that does not divide the image
+    """
+    sci, wht = mosaics
+    buffer_size = None
+    if section_rows is not None:
+        buffer_size = (section_rows + 0.5) * ROW_BYTES / 1024.**2
+
+    median = create_median.do_median(sci, wht, buffer_size=buffer_size)
+
+    assert median.shape == (NROWS, NCOLS)
+    assert_allclose(median, expected_median(sci, wht), rtol=1e-6)
+
+
+def test_sections_of_memory_maps(mosaics, tmpdir):
+    """Mosaics memory-mapped from their files give the same median"""
+    sci, wht = mosaics
+    filenames = []
+    for i, (image, weight) in enumerate(zip(sci, wht)):
+        filename = str(tmpdir.join('mosaic{0}.fits'.format(i)))
+        fits.HDUList([fits.PrimaryHDU(),
+                      fits.ImageHDU(image, name='SCI'),
+                      fits.ImageHDU(weight, name='WHT')]).writeto(filename)
+        filenames.append(filename)
+
+    hduls = [fits.open(filename, memmap=True) for filename in filenames]
+    try:
+        median = create_median.do_median(
+            [hdul['SCI'].data for hdul in hduls],
+            [hdul['WHT'].data for hdul in hduls],
+            buffer_size=4.5 * ROW_BYTES / 1024.**2)
+    finally:
+        for hdul in hduls:
+            hdul.close()
+
+    assert_allclose(median, expected_median(sci, wht), rtol=1e-6)
@@ -1,5 +1,6 @@
 #!/usr/bin/env python
 from ..stpipe import Pipeline
+from ..stpipe import crds_client
 from .. import datamodels
 import os
 
@@ -13,6 +14,7 @@ from ..rscd import rscd_step
 from ..lastframe import lastframe_step
 from ..linearity import linearity_step
 from ..dark_current import dark_current_step
+from ..detector_core import detector_core_step
 from ..persistence import persistence_step
 from ..jump import jump_step
 from ..ramp_fitting import ramp_fit_step
@@ -33,10 +35,18 @@ class SloperPipeline(Pipeline):
     dq_init, saturation, ipc, superbias, refpix, rscd, lastframe,
     linearity, dark_current, persistence, jump detection, and ramp_fit.
 
+    For Near-IR exposures, the saturation, superbias, linearity and
+    dark_current steps can instead be applied together in a single pass over
+    the data by the detector_core step, when fuse_detector_steps is set,
+    none of the four steps is skipped, and the ipc, refpix and persistence
+    steps, which come between them, are skipped. Reference files that are
+    given to the four steps are used by the detector_core step.
+
     """
 
     spec = """
         save_calibrated_ramp = boolean(default=False)
+        fuse_detector_steps = boolean(default=False) # use detector_core
     """
 
     # Define aliases to steps
@@ -49,6 +59,7 @@ class SloperPipeline(Pipeline):
                  'lastframe': lastframe_step.LastFrameStep,
                  'linearity': linearity_step.LinearityStep,
                  'dark_current': dark_current_step.DarkCurrentStep,
+                 'detector_core': detector_core_step.DetectorCoreStep,
                  'persistence': persistence_step.PersistenceStep,
                  'jump': jump_step.JumpStep,
                  'ramp_fit': ramp_fit_step.RampFitStep,
@@ -60,13 +71,22 @@ class SloperPipeline(Pipeline):
 
         log.info('Starting calwebb_sloper ...')
 
-        # open the input
-        input = datamodels.open(input)
+        # open the input; when running in place, a model that is passed in
+        # is used as is, and each step modifies the model that it is given
+        # rather than a copy of it
+        if not (self.in_place and isinstance(input, datamodels.DataModel)):
+            input = datamodels.open(input)
 
         # propagate output_dir to steps that might need it
         self.dark_current.output_dir = self.output_dir
+        self.detector_core.output_dir = self.output_dir
         self.ramp_fit.output_dir = self.output_dir
 
+        # propagate in_place to all of the steps
+        if self.in_place:
+            for step_name in self.step_defs:
+                getattr(self, step_name).in_place = True
+
         if input.meta.instrument.name == 'MIRI':
 
             # process MIRI exposures;
@@ -88,14 +108,43 @@ class SloperPipeline(Pipeline):
             # process Near-IR exposures
             log.debug('Processing a Near-IR exposure')
 
+            # the detector_core step can only replace the saturation,
+            # superbias, linearity and dark_current steps if none of the
+            # steps in between them is run
+            fuse = self.fuse_detector_steps
+            if fuse and not (self.ipc.skip and self.refpix.skip and
+                             self.persistence.skip):
+                log.warning('Can not use detector_core unless the ipc, '
+                            'refpix and persistence steps are skipped')
+                fuse = False
+            fused_steps = (self.saturation, self.superbias, self.linearity,
+                           self.dark_current)
+            if fuse and any(step.skip for step in fused_steps):
+                log.warning('Can not use detector_core when any of the '
+                            'saturation, superbias, linearity and '
+                            'dark_current steps is skipped')
+                fuse = False
+
             input = self.dq_init(input)
-            input = self.saturation(input)
-            input = self.ipc(input)
-            input = self.superbias(input)
-            input = self.refpix(input)
-            input = self.linearity(input)
-            input = self.persistence(input)
-            input = self.dark_current(input)
+            if fuse:
+                self.detector_core.dark_output = self.dark_current.dark_output
+                # use any reference file overrides of the fused steps
+                for step in fused_steps:
+                    for reftype in step.reference_file_types:
+                        override_name = crds_client.get_override_name(reftype)
+                        override = getattr(step, override_name, None)
+                        if override:
+                            setattr(self.detector_core, override_name,
+                                    override)
+                input = self.detector_core(input)
+            else:
+                input = self.saturation(input)
+                input = self.ipc(input)
+                input = self.superbias(input)
+                input = self.refpix(input)
+                input = self.linearity(input)
+                input = self.persistence(input)
+                input = self.dark_current(input)
 
         # apply the jump step
         input = self.jump(input)
@@ -233,6 +233,36 @@ def determine_slope(data_sect, input_var_sect,
     return (intercept_sect, int_var_sect, slope_sect, slope_var_sect,
             cr_sect, cr_var_sect)
 
+def bytes_per_pixel(ngroups, max_num_cr):
+    """Estimate the memory used by determine_slope for each pixel.
+
+    This includes the copies of the section of the input data, the
+    previous fit, and the arrays of the pixels passed to gls_fit, as well
+    as the temporary arrays of gls_fit itself (which uses the default,
+    'structured', solver) for the largest number of cosmic rays.  The
+    ngroups x ngroups covariance matrices are not created, so this is
+    proportional to ngroups.
+
+    Parameters
+    ----------
+    ngroups: int
+        The number of groups in the ramp.
+
+    max_num_cr: non-negative int
+        The maximum number of cosmic rays that will be handled.
+
+    Returns
+    -------
+    int
+        The approximate peak number of bytes used per pixel.
+    """
+
+    num_params = 2 + max_num_cr
+    # About 8 float64 values per group in determine_slope and compute_slope
+    # and 6 in gls_fit, plus x, E @ x, and the solution of the tridiagonal
+    # systems, which each have num_params values per group.
+    return 8 * ngroups * (14 + 3 * num_params)
+
 def evaluate_fit(intercept_sect, slope_sect, cr_sect,
                  frame_time, group_time,
                  gdq_sect, jump_flag):
@@ -549,7 +579,7 @@ def gls_fit(ramp_data, input_var_data,
              readnoise, gain,
              frame_time, group_time, nframes_used,
              num_cr, cr_flagged_2d, saturated_data,
-             use_extra_terms=True):
+             use_extra_terms=True, solver='structured'):
     """Generalized least squares linear fit.
 
     It is assumed that every input pixel has num_cr cosmic-ray hits
@@ -615,6 +645,13 @@ def gls_fit(ramp_data, input_var_data,
         weight matrix.
         See JWST-STScI-003193.pdf
 
+    solver: str
+        'structured' (the default) to solve the matrix equations using the
+        structure of the covariance matrix (see `structured_products`),
+        in time and memory proportional to ngroups; 'dense' to compute the
+        inverse of each ngroups x ngroups covariance matrix.  The results
+        are the same, apart from rounding errors.
+
     Returns
     -------
     tuple:  (result2d, variances)
@@ -662,6 +699,79 @@ def gls_fit(ramp_data, input_var_data,
 
     y = np.transpose(ramp_data, (1, 0)).reshape((nz, ngroups, 1))
 
+    # prev_slope_data must be non-negative.
+    flags = prev_slope_data < 0.
+    prev_slope_data[flags] = 1.
+
+    if solver == 'structured':
+        temp_var, temp2 = structured_products(
+                x, ramp_data, input_var_data, prev_fit_data,
+                prev_slope_data, readnoise, gain, frame_time, M,
+                saturated_data, use_extra_terms)
+    else:
+        temp_var, temp2 = dense_products(
+                x, y, input_var_data, prev_fit_data,
+                prev_slope_data, readnoise, gain, frame_time, M,
+                saturated_data, use_extra_terms)
+
+    # `covar` is an array of nz covariance matrices.
+    # covar = (xT @ weight @ x)^-1
+    # shape of covar is (nz, 2 + num_cr, 2 + num_cr)
+    I_2 = np.eye(2 + num_cr).reshape((1, 2 + num_cr, 2 + num_cr))
+    try:
+        covar = la.solve(temp_var, I_2)         # inverse of temp_var
+    except la.LinAlgError as msg:
+        for z in range(nz):
+            try:
+                dummy = la.solve(temp_var[z], I_2)
+            except la.LinAlgError as msg2:
+                log.warn("singular matrix, z = %d" % z)
+                raise la.LinAlgError(msg2)
+    del I_2
+
+    # shape of result is (nz, 2 + num_cr, 1)
+    result = np.einsum('...ij,...jk->...ik', covar, temp2)
+    r_shape = result.shape
+    result2d = result.reshape((r_shape[0], r_shape[1]))
+    del result
+
+    # shape of both result2d and variances is (nz, 2 + num_cr)
+    variances = covar.diagonal(axis1=1, axis2=2).copy()
+
+    return (result2d, variances)
+
+
+def dense_products(x, y, input_var_data, prev_fit_data, prev_slope_data,
+                   readnoise, gain, frame_time, M, saturated_data,
+                   use_extra_terms):
+    """Compute the matrix products for the GLS fit, using dense matrices.
+
+    The ngroups x ngroups covariance matrix of each pixel is created and
+    inverted, which takes time proportional to ngroups**3 and memory
+    proportional to ngroups**2.
+
+    Parameters
+    ----------
+    x: 3-D ndarray, shape (nz, ngroups, 2 + num_cr)
+        The independent variable of the linear equation of each pixel.
+
+    y: 3-D ndarray, shape (nz, ngroups, 1)
+        The ramp data of each pixel.
+
+    The other parameters are those of the same names of gls_fit, except
+    that M is nframes_used, as a float.
+
+    Returns
+    -------
+    tuple:  (temp_var, temp2)
+        temp_var is a 3-D ndarray, shape (nz, 2 + num_cr, 2 + num_cr), the
+        matrix product xT @ C^-1 @ x for each pixel, where C is the
+        covariance matrix.
+        temp2 is a 3-D ndarray, shape (nz, 2 + num_cr, 1), the product
+        xT @ C^-1 @ y for each pixel.
+    """
+    nz, ngroups = x.shape[:2]
+
     # cov is an array of nz matrices, each ngroups x ngroups.  The
     # inverse of each of these matrices is a weight matrix.
     # Note that there are two objects that are called the covariance
@@ -696,10 +806,6 @@ def gls_fit(ramp_data, input_var_data,
     rn3d = readnoise.reshape((nz, 1, 1)) * SINGLE_READOUT_RN_FACTOR
     cov += (I * (rn3d**2 / M))
 
-    # prev_slope_data must be non-negative.
-    flags = prev_slope_data < 0.
-    prev_slope_data[flags] = 1.
-
     if use_extra_terms:
         # Include two dummy axes to allow broadcasting with cov.
         slope3d = prev_slope_data.reshape((nz, 1, 1))
@@ -733,32 +839,131 @@ def gls_fit(ramp_data, input_var_data,
     # shape of temp_var is (nz, 2 + num_cr, 2 + num_cr)
     temp_var = np.einsum('...ij,...jk->...ik', temp1, x)
 
-    # `covar` is an array of nz covariance matrices.
-    # covar = (xT @ weight @ x)^-1
-    # shape of covar is (nz, 2 + num_cr, 2 + num_cr)
-    I_2 = np.eye(2 + num_cr).reshape((1, 2 + num_cr, 2 + num_cr))
-    try:
-        covar = la.solve(temp_var, I_2)         # inverse of temp_var
-    except la.LinAlgError as msg:
-        for z in range(nz):
-            try:
-                dummy = la.solve(temp_var[z], I_2)
-            except la.LinAlgError as msg2:
-                log.warn("singular matrix, z = %d" % z)
-                raise la.LinAlgError(msg2)
-    del I_2
-
     # [xT @ weight @ y]
     # shape of temp2 is (nz, 2 + num_cr, 1)
     temp2 = np.einsum('...ij,...jk->...ik', temp1, y)
 
-    # shape of result is (nz, 2 + num_cr, 1)
-    result = np.einsum('...ij,...jk->...ik', covar, temp2)
-    r_shape = result.shape
-    result2d = result.reshape((r_shape[0], r_shape[1]))
-    del result
+    return (temp_var, temp2)
 
-    # shape of both result2d and variances is (nz, 2 + num_cr)
-    variances = covar.diagonal(axis1=1, axis2=2).copy()
 
-    return (result2d, variances)
+def structured_products(x, ramp_data, input_var_data, prev_fit_data,
+                        prev_slope_data, readnoise, gain, frame_time, M,
+                        saturated_data, use_extra_terms):
+    """Compute the matrix products for the GLS fit, using the structure
+    of the covariance matrix.
+
+    The covariance matrix of each pixel is C = A + D, where
+    A[k, j] = prev_fit[min(k, j)] and D is diagonal (the variances of
+    the input data, read noise, etc.).  A = L @ P @ LT, where L is the
+    lower triangular matrix of ones and P is the diagonal matrix of the
+    first differences of prev_fit (with P[0, 0] = prev_fit[0]).  The
+    inverse of L is the first-difference operator E, so
+
+        E @ C @ ET = P + E @ D @ ET = T
+
+    is tridiagonal, and C^-1 = ET @ T^-1 @ E.  The products needed for
+    the fit are therefore
+
+        xT @ C^-1 @ x = (E @ x)T @ T^-1 @ (E @ x)
+        xT @ C^-1 @ y = (T^-1 @ E @ x)T @ (E @ y)
+
+    which are computed by solving the tridiagonal systems, in time and
+    memory proportional to ngroups rather than to ngroups**3 and
+    ngroups**2.
+
+    Parameters
+    ----------
+    x: 3-D ndarray, shape (nz, ngroups, 2 + num_cr)
+        The independent variable of the linear equation of each pixel.
+
+    The other parameters are those of the same names of gls_fit, except
+    that M is nframes_used, as a float.
+
+    Returns
+    -------
+    tuple:  (temp_var, temp2)
+        temp_var is a 3-D ndarray, shape (nz, 2 + num_cr, 2 + num_cr), the
+        matrix product xT @ C^-1 @ x for each pixel.
+        temp2 is a 3-D ndarray, shape (nz, 2 + num_cr, 1), the product
+        xT @ C^-1 @ y for each pixel.
+    """
+    ngroups, nz = ramp_data.shape
+
+    # The diagonal of D, shape (ngroups, nz).  Divide by sqrt(2) to
+    # convert the readnoise from CDS to single readout.
+    diag = input_var_data + saturated_data
+    diag += (readnoise * SINGLE_READOUT_RN_FACTOR)**2 / M
+    if use_extra_terms:
+        if gain is not None:
+            g = gain
+        else:
+            g = 1.
+        diag += (prev_slope_data * frame_time *
+                 (M - 1.) * (M - 2.) / (3. * M) + (g * M)**2 / 12.)
+
+    # The main diagonal and the subdiagonal of T, shape (ngroups, nz).
+    # off_diag[k] is T[k, k-1] = T[k-1, k]; off_diag[0] is not used.
+    main_diag = np.array(prev_fit_data, dtype=np.float64)
+    main_diag[1:] -= prev_fit_data[:-1]
+    main_diag += diag
+    main_diag[1:] += diag[:-1]
+    off_diag = np.empty_like(main_diag)
+    off_diag[1:] = -diag[:-1]
+
+    # E @ x and E @ y, with the groups as the first axis
+    ex = np.transpose(x, (1, 0, 2)).copy()
+    ex[1:] -= ex[:-1].copy()
+    ey = np.array(ramp_data, dtype=np.float64)
+    ey[1:] -= ramp_data[:-1]
+
+    z = solve_tridiagonal(main_diag, off_diag, ex)
+
+    temp_var = np.einsum('gzi,gzj->zij', ex, z)
+    temp2 = np.einsum('gzi,gz->zi', z, ey)
+
+    return (temp_var, temp2.reshape(temp2.shape + (1,)))
+
+
+def solve_tridiagonal(main_diag, off_diag, b):
+    """Solve symmetric tridiagonal systems of equations T @ z = b.
+
+    This uses the Thomas algorithm (Gaussian elimination without
+    pivoting), which is stable for the symmetric positive definite
+    matrices of the GLS fit.
+
+    Parameters
+    ----------
+    main_diag: 2-D ndarray, shape (ngroups, nz)
+        The main diagonal of T for each of the nz systems.
+
+    off_diag: 2-D ndarray, shape (ngroups, nz)
+        off_diag[k] is T[k, k-1] = T[k-1, k]; off_diag[0] is not used.
+
+    b: 3-D ndarray, shape (ngroups, nz, nrhs)
+        The right-hand sides.
+
+    Returns
+    -------
+    z: 3-D ndarray, shape (ngroups, nz, nrhs)
+        The solutions.
+    """
+    ngroups = len(main_diag)
+
+    # Forward elimination
+    pivot = np.empty_like(main_diag)
+    rhs = np.empty_like(b)
+    pivot[0] = main_diag[0]
+    rhs[0] = b[0]
+    for k in range(1, ngroups):
+        factor = off_diag[k] / pivot[k - 1]
+        pivot[k] = main_diag[k] - factor * off_diag[k]
+        rhs[k] = b[k] - factor[:, np.newaxis] * rhs[k - 1]
+
+    # Back substitution
+    z = rhs
+    z[-1] /= pivot[-1][:, np.newaxis]
+    for k in range(ngroups - 2, -1, -1):
+        z[k] -= off_diag[k + 1][:, np.newaxis] * z[k + 1]
+        z[k] /= pivot[k][:, np.newaxis]
+
+    return z
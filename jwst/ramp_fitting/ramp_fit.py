@@ -19,6 +19,7 @@ import logging
 
 from .. import datamodels
 from ..datamodels import dqflags
+from ..lib import parallel
 
 from . import gls_fit           # used only if algorithm is "GLS"
 from . import utils
@@ -32,9 +33,15 @@ MIN_ERR = 1.E-10 # minimum allowed value for error cube
 # Replace zero or negative variances with this.
 LARGE_VARIANCE = 1.e8
 
+# Inputs shared by the OLS worker processes; populated by init_ols_worker
+_ols_worker_inputs = {}
+
+# Inputs shared by the GLS worker processes; populated by init_gls_worker
+_gls_worker_inputs = {}
+
 
 def ramp_fit(model, buffsize, save_opt, readnoise_model, gain_model,
-              algorithm, weighting):
+              algorithm, weighting, max_cores='none', vectorized_fit=False):
     """
     Extended Summary
     ----------------
@@ -70,6 +77,16 @@ def ramp_fit(model, buffsize, save_opt, readnoise_model, gain_model,
         'unweighted' specifies that no weighting should be used (default)
         'optimal' specifies that optimal weighting should be used
 
+    max_cores: string or int
+        fraction of the available cores to use for fitting the data
+        sections in parallel; one of 'none' (default), 'quarter', 'half',
+        or 'all', or the number of worker processes
+
+    vectorized_fit: boolean
+        for OLS, fit all the segments of the ramps of a data section at
+        once with `calc_slope_segments`, rather than one segment at a time
+        with `calc_slope` (the default); see `ols_ramp_fit`
+
     Returns
     -------
     new_model: Data Model object
@@ -90,19 +107,19 @@ def ramp_fit(model, buffsize, save_opt, readnoise_model, gain_model,
     if algorithm == "GLS":
         new_model, int_model, gls_opt_model = gls_ramp_fit(model,
                                 buffsize, save_opt,
-                                readnoise_model, gain_model)
+                                readnoise_model, gain_model, max_cores)
         opt_model = None
     else:
         new_model, int_model, opt_model = \
                ols_ramp_fit(model, buffsize, save_opt, readnoise_model, \
-               gain_model, weighting)
+               gain_model, weighting, max_cores, vectorized_fit)
         gls_opt_model = None
 
     return new_model, int_model, opt_model, gls_opt_model
 
 
 def ols_ramp_fit(model, buffsize, save_opt, readnoise_model, gain_model,
-                  weighting):
+                  weighting, max_cores='none', vectorized_fit=False):
     """
     Extended Summary
     ----------------
@@ -132,6 +149,21 @@ def ols_ramp_fit(model, buffsize, save_opt, readnoise_model, gain_model,
         'unweighted' specifies that no weighting should be used
         'optimal' specifies that optimal weighting should be used
 
+    max_cores: string or int
+        fraction of the available cores to use for fitting the data
+        sections in parallel; one of 'none' (default), 'quarter', 'half',
+        or 'all', or the number of worker processes.  The independent
+        (integration, data section) fits are sent to a pool of worker
+        processes, which share the input arrays with this process, and the
+        results are accumulated in the same order as in the serial case.
+
+    vectorized_fit: boolean
+        if True, fit all the segments of the ramps of a data section at
+        once with `calc_slope_segments` (for NGROUPS > 2), which is much
+        faster than fitting one segment at a time with `calc_slope` (the
+        default).  calc_slope accumulates its sums in single precision,
+        so the results of the two only agree to within its rounding.
+
     Returns
     -------
     new_model: Data Model object
@@ -229,10 +261,11 @@ def ols_ramp_fit(model, buffsize, save_opt, readnoise_model, gain_model,
     # Flag any bad pixels in the gain
     pixeldq = utils.reset_bad_gain( pixeldq, gain_2d )
 
-    # loop over data integrations
+    # Build the list of independent (integration, data section) fits. The
+    #   sections of an integration following one that is all NaNs are
+    #   not processed.
+    sections = []
     for num_int in range(0, n_int):
-
-        # loop over data sections
         for rlo in range(0, cubeshape[1], nrows):
             rhi = rlo + nrows
 
@@ -244,73 +277,103 @@ def ols_ramp_fit(model, buffsize, save_opt, readnoise_model, gain_model,
             # skip data section if it is all NaNs
             if  np.all(np.isnan( data_sect)):
                 log.error('Current data section is all nans, so not processing the section.')
-                break   
-
-            # Poisson noise only; read noise only
-            var_p_2d = np.zeros((max_seg, (rhi - rlo) * imshape[-1]),
-                                dtype=np.float32)
-            var_r_2d = np.zeros((max_seg, (rhi - rlo) * imshape[-1]),
-                                dtype=np.float32)
-
-            # first frame section for 1st read of current integration
-            ff_sect = model.get_section('data')[ num_int, 0, rlo:rhi, :].\
-                astype(np.float32)
-            # get appropriate sections
-            gdq_sect = gdq_cube[num_int, :, rlo:rhi, :]
-            rn_sect = readnoise_2d[rlo:rhi, :]
-            gain_sect = gain_2d[rlo:rhi, :]
-
-            t_err_cube, t_dq_cube, m_by_var, inv_var, opt_res, f_max_seg = \
-                 calc_slope(data_sect, gdq_sect, frame_time, opt_res,
-                     rn_sect, gain_sect, max_seg, ngroups, weighting, f_max_seg,
-                     var_p_2d, var_r_2d)
-
-            err_cube[num_int, :, rlo:rhi, :] += t_err_cube
-            gdq_cube[num_int, :, rlo:rhi, :] = t_dq_cube
-
-            # Compress 4D->2D dq arrays for saturated and jump-detected pixels
-            pixeldq_sect = pixeldq[rlo:rhi, :].copy()
-            dq_int[num_int, rlo:rhi, :] = \
-                  dq_compress_sect(t_dq_cube, pixeldq_sect).copy()
-
-            sect_shape = data_sect.shape[-2:]
-            m_sum_2d[rlo:rhi, :] += m_by_var.reshape(sect_shape)
-            var_sum_2d[rlo:rhi, :] += inv_var.reshape(sect_shape)
-
-            # Loop over the segments and copy the reshaped 2D segment-specific
-            #  results for the current data section to the 4D output arrays.
-            opt_res.reshape_res(num_int, rlo, rhi, sect_shape, ff_sect)
-   
-            # Populate the segment- and instrument-specific variances for the 
-            #  recent section results
-            for ii_seg in range(0, max_seg):
-                var_p_s_4d[num_int, ii_seg, rlo:rhi, :] = \
-                     var_p_2d[ii_seg, :].reshape(sect_shape)
-                var_r_s_4d[num_int, ii_seg, rlo:rhi, :] = \
-                     var_r_2d[ii_seg, :].reshape(sect_shape)
-
-            # Calculate difference between each slice and the previous slice
-            #   as approximation to cosmic ray amplitude for those pixels
-            #   having their DQ set for cosmic rays
-            data_diff = data_sect - utils.shift_z(data_sect, -1)
-            dq_cr = np.bitwise_and(dqflags.group['JUMP_DET'], gdq_sect)
-
-            opt_res.cr_mag_seg[num_int, :, rlo:rhi, :] = \
-                       data_diff * (dq_cr != 0)
- 
-            m_by_var_int[num_int, rlo:rhi, :] = m_by_var.reshape(sect_shape)
-            inv_var_int[num_int, rlo:rhi, :] = inv_var.reshape(sect_shape)
-
-        slope_int[num_int, :, :] = \
-            utils.calc_slope_int(slope_int, m_by_var_int, inv_var_int, num_int)
-
-        opt_res.ped_int[num_int, :, :] = \
-            utils.calc_pedestal(num_int, slope_int, opt_res.firstf_int,\
-            gdq_cube, nframes, groupgap, dropframes1)
+                break
+
+            sections.append((num_int, rlo, rhi))
+
+    # Fit the sections, either serially or in a pool of worker processes.
+    #   Either way the results are returned in the order of `sections`, so
+    #   they are accumulated below exactly as in the serial case.
+    number_slices = parallel.compute_num_workers(max_cores, len(sections))
+    pool = None
+    if number_slices > 1:
+        pool = parallel._fork_context().Pool(processes=number_slices,
+                   initializer=init_ols_worker,
+                   initargs=(model.get_section('data'), gdq_cube,
+                   readnoise_2d, gain_2d, frame_time, max_seg, ngroups,
+                   weighting, vectorized_fit))
+        sect_results = pool.imap(ols_worker, sections)
+    else:
+        sect_results = (ols_fit_section(
+                    model.get_section('data')[num_int, :, rlo:rhi, :],
+                    gdq_cube[num_int, :, rlo:rhi, :],
+                    readnoise_2d[rlo:rhi, :], gain_2d[rlo:rhi, :],
+                    frame_time, opt_res, max_seg, ngroups, weighting,
+                    vectorized_fit)
+                    for (num_int, rlo, rhi) in sections)
 
-        var_p_int[num_int, :, :], var_r_int[num_int, :, :] = \
-            utils.calc_vars_int( slope_int, readnoise_2d, gdq_cube, num_int, \
-            var_p_int, var_r_int)
+    try:
+        # loop over data integrations
+        for num_int in range(0, n_int):
+
+            # loop over the data sections of this integration
+            for (i_int, rlo, rhi) in sections:
+                if i_int != num_int:
+                    continue
+
+                t_err_cube, t_dq_cube, m_by_var, inv_var, opt_2d, \
+                    sect_max_seg, var_p_2d, var_r_2d = next(sect_results)
+                f_max_seg = max(f_max_seg, sect_max_seg)
+
+                data_sect = model.get_section('data')[num_int, :, rlo:rhi, :]
+                gdq_sect = gdq_cube[num_int, :, rlo:rhi, :]
+
+                # first frame section for 1st read of current integration
+                ff_sect = model.get_section('data')[ num_int, 0, rlo:rhi, :].\
+                    astype(np.float32)
+
+                err_cube[num_int, :, rlo:rhi, :] += t_err_cube
+                gdq_cube[num_int, :, rlo:rhi, :] = t_dq_cube
+
+                # Compress 4D->2D dq arrays for saturated and jump-detected pixels
+                pixeldq_sect = pixeldq[rlo:rhi, :].copy()
+                dq_int[num_int, rlo:rhi, :] = \
+                      dq_compress_sect(t_dq_cube, pixeldq_sect).copy()
+
+                sect_shape = data_sect.shape[-2:]
+                m_sum_2d[rlo:rhi, :] += m_by_var.reshape(sect_shape)
+                var_sum_2d[rlo:rhi, :] += inv_var.reshape(sect_shape)
+
+                # Loop over the segments and copy the reshaped 2D segment-specific
+                #  results for the current data section to the 4D output arrays.
+                opt_res.interc_2d, opt_res.slope_2d, opt_res.siginterc_2d, \
+                    opt_res.sigslope_2d, opt_res.inv_var_2d = opt_2d
+                opt_res.reshape_res(num_int, rlo, rhi, sect_shape, ff_sect)
+
+                # Populate the segment- and instrument-specific variances for the
+                #  recent section results
+                for ii_seg in range(0, max_seg):
+                    var_p_s_4d[num_int, ii_seg, rlo:rhi, :] = \
+                         var_p_2d[ii_seg, :].reshape(sect_shape)
+                    var_r_s_4d[num_int, ii_seg, rlo:rhi, :] = \
+                         var_r_2d[ii_seg, :].reshape(sect_shape)
+
+                # Calculate difference between each slice and the previous slice
+                #   as approximation to cosmic ray amplitude for those pixels
+                #   having their DQ set for cosmic rays
+                data_diff = data_sect - utils.shift_z(data_sect, -1)
+                dq_cr = np.bitwise_and(dqflags.group['JUMP_DET'], gdq_sect)
+
+                opt_res.cr_mag_seg[num_int, :, rlo:rhi, :] = \
+                           data_diff * (dq_cr != 0)
+
+                m_by_var_int[num_int, rlo:rhi, :] = m_by_var.reshape(sect_shape)
+                inv_var_int[num_int, rlo:rhi, :] = inv_var.reshape(sect_shape)
+
+            slope_int[num_int, :, :] = \
+                utils.calc_slope_int(slope_int, m_by_var_int, inv_var_int, num_int)
+
+            opt_res.ped_int[num_int, :, :] = \
+                utils.calc_pedestal(num_int, slope_int, opt_res.firstf_int,\
+                gdq_cube, nframes, groupgap, dropframes1)
+
+            var_p_int[num_int, :, :], var_r_int[num_int, :, :] = \
+                utils.calc_vars_int( slope_int, readnoise_2d, gdq_cube, num_int, \
+                var_p_int, var_r_int)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
 
     # Average integration-specific variances 
     var_p_2d_all = var_p_int.mean( axis=0 ) 
@@ -383,9 +446,182 @@ def ols_ramp_fit(model, buffsize, save_opt, readnoise_model, gain_model,
 
     return new_model, int_model, opt_model
 
+
+def ols_fit_section(data_sect, gdq_sect, rn_sect, gain_sect, frame_time,
+                    opt_res, max_seg, ngroups, weighting,
+                    vectorized_fit=False):
+    """
+    Short Summary
+    -------------
+    Fit the ramps of a single data section of a single integration. The
+    section is independent of all others, so this may be run in a worker
+    process.
+
+    Parameters
+    ----------
+    data_sect: float, 3D array
+        section of input data cube array
+
+    gdq_sect: int, 3D array
+        section of GROUPDQ data quality array
+
+    rn_sect: float, 2D array
+        read noise values for all pixels in data section
+
+    gain_sect: float, 2D array
+        gain values for all pixels in data section
+
+    frame_time: float
+        integration time
+
+    opt_res: OptRes object
+        holder for the 2D segment-specific optional results of this section
+
+    max_seg: int
+        maximum possible number of segments within the ramp
+
+    ngroups: int
+        number of groups per integration
+
+    weighting: string
+        'unweighted' specifies that no weighting should be used
+        'optimal' specifies that optimal weighting should be used
+
+    vectorized_fit: boolean
+        fit all the segments at once with `calc_slope_segments`, rather
+        than with `calc_slope`
+
+    Returns
+    -------
+    t_err_cube: float, 3D array
+        fitting error estimate for pixels in section
+
+    t_dq_cube: int, 3D array
+        data quality flags for pixels in section
+
+    m_by_var: float, 1D array
+        values of slope/variance for good pixels
+
+    inv_var: float, 1D array
+        values of 1/variance for good pixels
+
+    opt_2d: tuple of float, 2D arrays
+        segment-specific intercepts, slopes, sigmas of the intercepts,
+        sigmas of the slopes, and inverse variances for the section
+
+    f_max_seg: int
+        actual maximum number of segments within a ramp in this section
+
+    var_p_2d: float, 2D array
+        segment-specific variances due to Poisson noise only
+
+    var_r_2d: float, 2D array
+        segment-specific variances due to read noise only
+    """
+    npix = data_sect.shape[1] * data_sect.shape[2]
+
+    # Poisson noise only; read noise only
+    var_p_2d = np.zeros((max_seg, npix), dtype=np.float32)
+    var_r_2d = np.zeros((max_seg, npix), dtype=np.float32)
+
+    # Datasets having NGROUPS=1 or 2 are handled by the special cases
+    #   of the segment-by-segment fit
+    if vectorized_fit and ngroups > 2:
+        fit_sect = calc_slope_segments
+    else:
+        fit_sect = calc_slope
+
+    t_err_cube, t_dq_cube, m_by_var, inv_var, opt_res, f_max_seg = \
+         fit_sect(data_sect, gdq_sect, frame_time, opt_res,
+             rn_sect, gain_sect, max_seg, ngroups, weighting, 0,
+             var_p_2d, var_r_2d)
+
+    opt_2d = (opt_res.interc_2d, opt_res.slope_2d, opt_res.siginterc_2d,
+              opt_res.sigslope_2d, opt_res.inv_var_2d)
+
+    return t_err_cube, t_dq_cube, m_by_var, inv_var, opt_2d, f_max_seg, \
+           var_p_2d, var_r_2d
+
+
+def init_ols_worker(data, gdq_cube, readnoise_2d, gain_2d, frame_time,
+                    max_seg, ngroups, weighting, vectorized_fit=False):
+    """
+    Short Summary
+    -------------
+    Initializer for the OLS worker processes. The full input arrays are
+    handed to each worker once, when the pool is created (the workers are
+    forked, so they share the arrays of the parent process rather than
+    copying them), rather than pickling every data section.
+
+    Parameters
+    ----------
+    data: float, 4D array
+        science data of the input model
+
+    gdq_cube: int, 4D array
+        GROUPDQ array of the input model
+
+    readnoise_2d: float, 2D array
+        read noise values for all pixels
+
+    gain_2d: float, 2D array
+        gain values for all pixels
+
+    frame_time: float
+        integration time
+
+    max_seg: int
+        maximum possible number of segments within the ramp
+
+    ngroups: int
+        number of groups per integration
+
+    weighting: string
+        'unweighted' specifies that no weighting should be used
+        'optimal' specifies that optimal weighting should be used
+
+    vectorized_fit: boolean
+        fit all the segments at once with `calc_slope_segments`
+    """
+    _ols_worker_inputs.update(data=data, gdq_cube=gdq_cube,
+        readnoise_2d=readnoise_2d, gain_2d=gain_2d, frame_time=frame_time,
+        max_seg=max_seg, ngroups=ngroups, weighting=weighting,
+        vectorized_fit=vectorized_fit,
+        opt_res=utils.OptRes(1, (1, 1), max_seg, 1))
+
+
+def ols_worker(section):
+    """
+    Short Summary
+    -------------
+    Fit a single (integration, data section) in a worker process.
+
+    Parameters
+    ----------
+    section: (int, int, int) tuple
+        integration number, and first and last (exclusive) rows of the
+        data section
+
+    Returns
+    -------
+    tuple
+        the results of `ols_fit_section` for this section
+    """
+    num_int, rlo, rhi = section
+    inputs = _ols_worker_inputs
+
+    return ols_fit_section(inputs['data'][num_int, :, rlo:rhi, :],
+                           inputs['gdq_cube'][num_int, :, rlo:rhi, :],
+                           inputs['readnoise_2d'][rlo:rhi, :],
+                           inputs['gain_2d'][rlo:rhi, :],
+                           inputs['frame_time'], inputs['opt_res'],
+                           inputs['max_seg'], inputs['ngroups'],
+                           inputs['weighting'], inputs['vectorized_fit'])
+
+
 def gls_ramp_fit(model,
                  buffsize, save_opt,
-                 readnoise_model, gain_model):
+                 readnoise_model, gain_model, max_cores='none'):
     """Fit a ramp using generalized least squares.
 
     Extended Summary
@@ -405,7 +641,9 @@ def gls_ramp_fit(model,
         Input data model, assumed to be of type RampModel.
 
     buffsize: int
-        Size of data section (buffer) in bytes.
+        Approximate size in bytes of the arrays used to fit one data
+        section, including the temporary arrays of the fit, i.e. the
+        memory used by each process.
 
     save_opt: boolean
         Calculate optional fitting results.
@@ -416,6 +654,14 @@ def gls_ramp_fit(model,
     gain_model: instance of gain model
         Gain for all pixels.
 
+    max_cores: string or int
+        Number of cores to use for multiprocessing. If set to 'none' (the
+        default), then no multiprocessing will be done. The other allowable
+        values are 'quarter', 'half', and 'all'. This is the fraction of
+        cores to use for multi-proc. The total number of cores includes the
+        SMT cores (Hyper Threading for Intel). An integer is the number of
+        worker processes itself.
+
     Returns
     -------
     new_model: Data Model object
@@ -469,9 +715,6 @@ def gls_ramp_fit(model,
         # The pedestal is the extrapolation of the first group back to zero
         # time, for each integration.
         pedestal_int = np.zeros((n_int,) + imshape, dtype=np.float32)
-        # The first group, for calculating the pedestal.  (This only needs
-        # to be nrows high, but we don't have nrows yet.  xxx)
-        first_group = np.zeros(imshape, dtype=np.float32)
         # If there are no cosmic rays, set the last axis length to 1.
         shape_ampl = (n_int, imshape[0], imshape[1], max(1, max_num_cr))
         ampl_int = np.zeros(shape_ampl, dtype=np.float32)
@@ -488,8 +731,9 @@ def gls_ramp_fit(model,
     # (uint16) PIXELDQ in the outgoing ImageModel.
     pixeldq = model.pixeldq.copy()
 
-    # calculate number of (contiguous) rows per data section
-    nrows = calc_nrows(model, buffsize, cubeshape, nreads)
+    # calculate number of (contiguous) rows per data section, such that
+    #   the arrays used to fit a section take about buffsize bytes
+    nrows = calc_gls_nrows(buffsize, cubeshape, max_num_cr)
 
     # Get readnoise array for calculation of variance of noiseless ramps, and
     #   gain array in case optimal weighting is to be done
@@ -499,93 +743,110 @@ def gls_ramp_fit(model,
     # Flag any bad pixels in the gain
     pixeldq = utils.reset_bad_gain( pixeldq, gain_2d )
 
-    # loop over data integrations
+    # Build the list of independent (integration, data section) fits.
+    sections = []
     for num_int in range(n_int):
-
-        if save_opt:
-            first_group[:, :] = 0.      # re-use this for each integration
-
-        # loop over data sections
         for rlo in range(0, cubeshape[1], nrows):
             rhi = rlo + nrows
 
             if rhi > cubeshape[1]:
                 rhi = cubeshape[1]
 
-            data_sect = model.get_section('data')[num_int, :, rlo:rhi, :]
+            sections.append((num_int, rlo, rhi))
+
+    # Fit the sections, either serially or in a pool of worker processes.
+    #   Either way the results are returned in the order of `sections`.
+    number_slices = parallel.compute_num_workers(max_cores, len(sections))
+    pool = None
+    if number_slices > 1:
+        pool = parallel._fork_context().Pool(processes=number_slices,
+                   initializer=init_gls_worker,
+                   initargs=(model.get_section('data'),
+                   model.get_section('err'), gdq_cube,
+                   readnoise_2d, gain_2d, frame_time, group_time,
+                   nframes_used, max_num_cr, saturated_flag, jump_flag))
+        sect_results = pool.imap(gls_worker, sections)
+    else:
+        sect_results = (gls_fit_section(
+                    model.get_section('data')[num_int, :, rlo:rhi, :],
+                    model.get_section('err')[num_int, :, rlo:rhi, :],
+                    gdq_cube[num_int, :, rlo:rhi, :],
+                    readnoise_2d[rlo:rhi, :], gain_2d[rlo:rhi, :],
+                    frame_time, group_time, nframes_used, max_num_cr,
+                    saturated_flag, jump_flag)
+                    for (num_int, rlo, rhi) in sections)
 
-            # We'll propagate error estimates from previous steps to the
-            # current step by using the variance.
-            input_var_sect = model.get_section('err')[num_int, :, rlo:rhi, :]
-            input_var_sect = input_var_sect**2
-
-            gdq_sect = gdq_cube[num_int, :, rlo:rhi, :]
-            rn_sect = readnoise_2d[rlo:rhi, :]
-            gain_sect = gain_2d[rlo:rhi, :]
-
-            # Convert the data section from DN to electrons.
-            data_sect *= gain_sect
-            if save_opt:
-                first_group[rlo:rhi, :] = data_sect[0, :, :].copy()
-
-            (intercept_sect, intercept_var_sect,
-             slope_sect, slope_var_sect,
-             cr_sect, cr_var_sect) = \
-                        gls_fit.determine_slope(data_sect, input_var_sect,
-                                                gdq_sect, rn_sect, gain_sect,
-                                                frame_time, group_time,
-                                                nframes_used, max_num_cr,
-                                                saturated_flag, jump_flag)
-
-            slope_int[num_int, rlo:rhi, :] = slope_sect.copy()
-            v_mask = (slope_var_sect <= 0.)
-            if v_mask.any():
-                # Replace negative or zero variances with a large value.
-                slope_var_sect[v_mask] = LARGE_VARIANCE
-                # Also set a flag in the pixel dq array.
-                temp_dq[rlo:rhi, :][v_mask] = dqflags.pixel['UNRELIABLE_SLOPE']
-            del v_mask
-            # If a pixel was flagged (by an earlier step) as saturated in
-            # the first group, flag the pixel as bad.
-            # Note:  save s_mask until after the call to utils.gls_pedestal.
-            s_mask = (gdq_sect[0] == saturated_flag)
-            if s_mask.any():
-                temp_dq[rlo:rhi, :][s_mask] = dqflags.pixel['UNRELIABLE_SLOPE']
-            slope_err_int[num_int, rlo:rhi, :] = np.sqrt(slope_var_sect)
-
-            # We need to take a weighted average if (and only if) n_int > 1.
-            # Accumulate sum of slopes and sum of weights.
-            if n_int > 1:
-                weight = 1. / slope_var_sect
-                slopes[rlo:rhi, :] += (slope_sect * weight)
-                sum_weight[rlo:rhi, :] += weight
-
-            if save_opt:
-                # Save the intercepts and cosmic-ray amplitudes for the
-                # current integration.
-                intercept_int[num_int, rlo:rhi, :] = intercept_sect.copy()
-                intercept_err_int[num_int, rlo:rhi, :] = \
-                        np.sqrt(np.abs(intercept_var_sect))
-                pedestal_int[num_int, rlo:rhi, :] = \
-                        utils.gls_pedestal(first_group[rlo:rhi, :],
-                                           slope_int[num_int, rlo:rhi, :],
-                                           s_mask,
-                                           frame_time, nframes_used)
-                ampl_int[num_int, rlo:rhi, :, :] = cr_sect.copy()
-                ampl_err_int[num_int, rlo:rhi, :, :] = \
-                        np.sqrt(np.abs(cr_var_sect))
-            del s_mask
-
-            # Compress 4D->2D dq arrays for saturated and jump-detected
-            #   pixels
-            pixeldq_sect = pixeldq[rlo:rhi, :].copy()
-            dq_int[num_int, rlo:rhi, :] = \
-                  dq_compress_sect(gdq_sect, pixeldq_sect).copy()
-
-        # temp_dq |= dq_int[num_int, :, :]
-        # dq_int[num_int, :, :] = temp_dq.copy()
-        dq_int[num_int, :, :] |= temp_dq
-        temp_dq[:, :] = 0               # initialize for next integration
+    try:
+        # loop over data integrations
+        for num_int in range(n_int):
+
+            # loop over the data sections of this integration
+            for (i_int, rlo, rhi) in sections:
+                if i_int != num_int:
+                    continue
+
+                (intercept_sect, intercept_var_sect,
+                 slope_sect, slope_var_sect,
+                 cr_sect, cr_var_sect, first_group) = next(sect_results)
+
+                gdq_sect = gdq_cube[num_int, :, rlo:rhi, :]
+
+                slope_int[num_int, rlo:rhi, :] = slope_sect.copy()
+                v_mask = (slope_var_sect <= 0.)
+                if v_mask.any():
+                    # Replace negative or zero variances with a large value.
+                    slope_var_sect[v_mask] = LARGE_VARIANCE
+                    # Also set a flag in the pixel dq array.
+                    temp_dq[rlo:rhi, :][v_mask] = \
+                            dqflags.pixel['UNRELIABLE_SLOPE']
+                del v_mask
+                # If a pixel was flagged (by an earlier step) as saturated in
+                # the first group, flag the pixel as bad.
+                # Note:  save s_mask until after the call to
+                # utils.gls_pedestal.
+                s_mask = (gdq_sect[0] == saturated_flag)
+                if s_mask.any():
+                    temp_dq[rlo:rhi, :][s_mask] = \
+                            dqflags.pixel['UNRELIABLE_SLOPE']
+                slope_err_int[num_int, rlo:rhi, :] = np.sqrt(slope_var_sect)
+
+                # We need to take a weighted average if (and only if)
+                # n_int > 1.  Accumulate sum of slopes and sum of weights.
+                if n_int > 1:
+                    weight = 1. / slope_var_sect
+                    slopes[rlo:rhi, :] += (slope_sect * weight)
+                    sum_weight[rlo:rhi, :] += weight
+
+                if save_opt:
+                    # Save the intercepts and cosmic-ray amplitudes for the
+                    # current integration.
+                    intercept_int[num_int, rlo:rhi, :] = intercept_sect.copy()
+                    intercept_err_int[num_int, rlo:rhi, :] = \
+                            np.sqrt(np.abs(intercept_var_sect))
+                    pedestal_int[num_int, rlo:rhi, :] = \
+                            utils.gls_pedestal(first_group,
+                                               slope_int[num_int, rlo:rhi, :],
+                                               s_mask,
+                                               frame_time, nframes_used)
+                    ampl_int[num_int, rlo:rhi, :, :] = cr_sect.copy()
+                    ampl_err_int[num_int, rlo:rhi, :, :] = \
+                            np.sqrt(np.abs(cr_var_sect))
+                del s_mask
+
+                # Compress 4D->2D dq arrays for saturated and jump-detected
+                #   pixels
+                pixeldq_sect = pixeldq[rlo:rhi, :].copy()
+                dq_int[num_int, rlo:rhi, :] = \
+                      dq_compress_sect(gdq_sect, pixeldq_sect).copy()
+
+            # temp_dq |= dq_int[num_int, :, :]
+            # dq_int[num_int, :, :] = temp_dq.copy()
+            dq_int[num_int, :, :] |= temp_dq
+            temp_dq[:, :] = 0               # initialize for next integration
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
 
     # Average the slope over all integrations.
     if n_int > 1:
@@ -664,6 +925,135 @@ def gls_ramp_fit(model,
     return new_model, int_model, gls_opt_model
 
 
+def gls_fit_section(data_sect, err_sect, gdq_sect, rn_sect, gain_sect,
+                    frame_time, group_time, nframes_used, max_num_cr,
+                    saturated_flag, jump_flag):
+    """
+    Short Summary
+    -------------
+    Fit the ramps of a single data section of a single integration using
+    generalized least squares. The section is independent of all others,
+    so this may be run in a worker process.
+
+    Parameters
+    ----------
+    data_sect: float, 3D array
+        section of input data cube array, in DN
+
+    err_sect: float, 3D array
+        section of input ERR array
+
+    gdq_sect: int, 3D array
+        section of GROUPDQ data quality array
+
+    rn_sect: float, 2D array
+        read noise values for all pixels in data section
+
+    gain_sect: float, 2D array
+        gain values for all pixels in data section
+
+    frame_time: float
+        integration time
+
+    group_time: float
+        time increment between groups
+
+    nframes_used: int
+        number of frames that were averaged together to make a group
+
+    max_num_cr: int
+        maximum number of cosmic rays in any pixel of the exposure
+
+    saturated_flag: int
+        dqflags.group['SATURATED']
+
+    jump_flag: int
+        dqflags.group['JUMP_DET']
+
+    Returns
+    -------
+    tuple
+        the results of `gls_fit.determine_slope` for this section,
+        followed by the first group of the section, in electrons
+    """
+    # We'll propagate error estimates from previous steps to the
+    # current step by using the variance.
+    input_var_sect = err_sect**2
+
+    # Convert the data section from DN to electrons, in a copy so that the
+    # input model is not changed.
+    data_sect = data_sect.copy()
+    data_sect *= gain_sect
+    first_group = data_sect[0, :, :].copy()
+
+    return gls_fit.determine_slope(data_sect, input_var_sect,
+                                   gdq_sect, rn_sect, gain_sect,
+                                   frame_time, group_time,
+                                   nframes_used, max_num_cr,
+                                   saturated_flag, jump_flag) + (first_group,)
+
+
+def init_gls_worker(data, err, gdq_cube, readnoise_2d, gain_2d, frame_time,
+                    group_time, nframes_used, max_num_cr, saturated_flag,
+                    jump_flag):
+    """
+    Short Summary
+    -------------
+    Initializer for the GLS worker processes. As for `init_ols_worker`, the
+    full input arrays are handed to each worker once, when the pool is
+    created, rather than pickling every data section.
+
+    Parameters
+    ----------
+    data: float, 4D array
+        science data of the input model
+
+    err: float, 4D array
+        ERR array of the input model
+
+    gdq_cube: int, 4D array
+        GROUPDQ array of the input model
+
+    The other parameters are those of `gls_fit_section`, with readnoise_2d
+    and gain_2d covering all pixels.
+    """
+    _gls_worker_inputs.update(data=data, err=err, gdq_cube=gdq_cube,
+        readnoise_2d=readnoise_2d, gain_2d=gain_2d, frame_time=frame_time,
+        group_time=group_time, nframes_used=nframes_used,
+        max_num_cr=max_num_cr, saturated_flag=saturated_flag,
+        jump_flag=jump_flag)
+
+
+def gls_worker(section):
+    """
+    Short Summary
+    -------------
+    Fit a single (integration, data section) in a worker process.
+
+    Parameters
+    ----------
+    section: (int, int, int) tuple
+        integration number, and first and last (exclusive) rows of the
+        data section
+
+    Returns
+    -------
+    tuple
+        the results of `gls_fit_section` for this section
+    """
+    num_int, rlo, rhi = section
+    inputs = _gls_worker_inputs
+
+    return gls_fit_section(inputs['data'][num_int, :, rlo:rhi, :],
+                           inputs['err'][num_int, :, rlo:rhi, :],
+                           inputs['gdq_cube'][num_int, :, rlo:rhi, :],
+                           inputs['readnoise_2d'][rlo:rhi, :],
+                           inputs['gain_2d'][rlo:rhi, :],
+                           inputs['frame_time'], inputs['group_time'],
+                           inputs['nframes_used'], inputs['max_num_cr'],
+                           inputs['saturated_flag'], inputs['jump_flag'])
+
+
 def calc_power(snr):
     """
     Short Summary
@@ -802,6 +1192,42 @@ def calc_nrows(model, buffsize, cubeshape, nreads):
     return nrows
 
 
+def calc_gls_nrows(buffsize, cubeshape, max_num_cr):
+    """
+    Short Summary
+    -------------
+    Calculate the number of rows per data section for the GLS fit. The
+    arrays used to fit a section, which are much larger than the section
+    of the data cube, should take about buffsize bytes.
+
+    Parameters
+    ----------
+    buffsize: int
+       approximate memory in bytes to use for fitting one data section
+
+    cubeshape: (int, int, int) tuple
+       shape of input dataset
+
+    max_num_cr: int
+       maximum number of cosmic rays in any pixel of the exposure
+
+    Returns
+    -------
+    nrows: int
+       number of rows in buffer of data section
+    """
+    nreads, ny, nx = cubeshape
+
+    nrows = int(buffsize /
+                (nx * gls_fit.bytes_per_pixel(nreads, max_num_cr)))
+    if nrows < 1:
+        nrows = 1
+    if nrows > ny:
+        nrows = ny
+
+    return nrows
+
+
 def calc_slope(data_sect, gdq_sect, frame_time, opt_res, rn_sect, gain_sect,
                 i_max_seg, ngroups, weighting, f_max_seg, var_p_2d, var_r_2d):
     """
@@ -985,6 +1411,560 @@ def calc_slope(data_sect, gdq_sect, frame_time, opt_res, rn_sect, gain_sect,
     return err_sect, gdq_sect, m_by_var, inv_var, opt_res, f_max_seg
 
 
+def calc_slope_segments(data_sect, gdq_sect, frame_time, opt_res, rn_sect,
+                        gain_sect, i_max_seg, ngroups, weighting, f_max_seg,
+                        var_p_2d, var_r_2d):
+    """
+    Extended Summary
+    ----------------
+    Calculate the count rate for each pixel in the data cube section for
+    the current integration, as does `calc_slope`, but without stepping the
+    pixels through their segments one at a time.  The segments (intervals
+    between cosmic rays) of all pixels are located in a single pass over
+    the GROUPDQ section; the sums needed for the fits are then accumulated
+    for all segments at once, and every segment of every pixel is fit in a
+    single batched operation.  The running sums of slope/variance and
+    1/variance are accumulated in a loop over the segment number, so the
+    cost depends on the maximum number of segments in a ramp rather than
+    on the number of reads.
+
+    The segments, the special handling of segments having only 1 or 2
+    reads, and the rules for which segments contribute to the weighted
+    slope are the same as those of the `fit_next_segment` cases A-J, so the
+    results agree with those of `calc_slope` to within rounding (all of the
+    sums here are accumulated in double precision).  This is
+    used for datasets having NGROUPS > 2; `calc_slope` handles the special
+    cases of NGROUPS = 1 and 2.
+
+    Parameters
+    ----------
+    data_sect: float
+        section of input data cube array
+
+    gdq_sect: float
+        section of GROUPDQ data quality array
+
+    frame_time: float
+        integration time
+
+    opt_res: OptRes object
+        contains quantities related to fitting for optional output
+
+    rn_sect: float, 2D array
+        read noise values for all pixels in data section
+
+    gain_sect: float, 2D array
+        gain values for all pixels in data section
+
+    i_max_seg: int
+        used for size of initial allocation of arrays for optional results;
+        maximum possible number of segments within the ramp, based on the
+        number of CR flags
+
+    ngroups: int
+        number of groups per integration
+
+    weighting: string
+        'unweighted' specifies that no weighting should be used (default)
+        'optimal' specifies that optimal weighting should be used
+
+    f_max_seg: int
+        actual maximum number of segments within a ramp, based on the fitting
+        of all ramps; later used when truncating arrays before output.
+
+    var_p_2d: float, 2D array
+        segment-specific variances due to Poisson noise only, populated here
+
+    var_r_2d: float, 2D array
+        segment-specific variances due to read noise only, populated here
+
+    Returns
+    -------
+    err_sect: float, 3D array
+        fitting error estimate for pixels in section
+
+    gdq_sect: int, 3D array
+        data quality flags for pixels in section
+
+    m_by_var: float, 1D array
+        values of slope/variance for good pixels
+
+    inv_var: float, 1D array
+        values of 1/variance for good pixels
+
+    opt_res: OptRes object
+        contains quantities related to fitting for optional output
+
+    f_max_seg: int
+        actual maximum number of segments within a ramp, updated here based on
+        fitting ramps in the current data section; later used when truncating
+        arrays before output.
+    """
+    nreads, asize2, asize1 = data_sect.shape
+    npix = asize2 * asize1  # number of pixels in section of 2D array
+    imshape = data_sect.shape[-2:]
+    cubeshape = (nreads,) + imshape  # cube section shape
+
+    data_2d = data_sect.reshape((nreads, npix))
+    good_2d = (gdq_sect.reshape((nreads, npix)) == 0)
+    total_mask_sum = good_2d.sum(axis=0) # number of good reads per pixel
+
+    # Each segment is a run of contiguous good reads, preceded by the read
+    #   that terminated the previous segment (e.g. the read in which a
+    #   cosmic ray has been flagged), if there is one. Locate the first and
+    #   last good read of every run, ordered by pixel and then by read.
+    prev_good = np.zeros_like(good_2d)
+    prev_good[1:, :] = good_2d[:-1, :]
+    next_good = np.zeros_like(good_2d)
+    next_good[:-1, :] = good_2d[1:, :]
+
+    seg_pix, run_start = np.nonzero((good_2d & ~prev_good).T)
+    run_end = np.nonzero((good_2d & ~next_good).T)[1]
+
+    first_read = np.maximum(run_start - 1, 0) # first read in fit
+    nreads_seg = run_end - first_read + 1     # number of reads in fit
+
+    # Endpoint and interval length as used to classify the segment in
+    #   fit_next_segment
+    end_locs = np.minimum(run_end + 1, nreads - 1)
+    at_end = (end_locs == nreads - 1)
+    l_interval = end_locs - first_read
+    tms_seg = total_mask_sum[seg_pix]
+
+    slope, intercept, variance, sig_intercept, sig_slope, sig_slope_p, \
+        sig_slope_r = fit_segments(data_2d, rn_sect, gain_sect, seg_pix,
+                                   first_read, run_end, nreads_seg, weighting)
+
+    # Number of times each segment is added to the running sums, following
+    #   the cases in fit_next_segment:
+    #   A, B) long enough (>2 reads) and having a positive variance
+    #   E) 2 reads at end of ramp, having a positive variance
+    #   F) the 2 reads are the only good reads of the pixel
+    #   G) 2 reads not at end of ramp, with later good reads, having a
+    #      positive variance
+    #   H) single good read on the 0th read, which is the only good read
+    #   I) 2 reads at end of ramp, or 2 reads ending one read before the
+    #      end of the ramp when the pixel has no other good reads (such a
+    #      segment is first skipped by case J, and is then reached again
+    #      at the end of the ramp)
+    # Cases F and I are not exclusive, in which case the segment is used
+    #   twice.
+    case_f = (tms_seg == 2) & (l_interval == 2)
+    n_use = ((variance > 0.) & ((l_interval > 2) |
+             ((l_interval == 1) & at_end) |
+             ((l_interval == 2) & ~at_end & (tms_seg > 2)))).astype(np.int32)
+    n_use += case_f
+    n_use += (tms_seg == 1) & (l_interval == 1) & ~at_end
+    n_use += (l_interval == 2) & (at_end | ((tms_seg == 1) &
+                                            (end_locs == nreads - 2)))
+
+    # Case F completes the processing of the pixel, so any later segments
+    #   of that pixel are not used.
+    seg_counts = np.bincount(seg_pix, minlength=npix)
+    pix_first_seg = (seg_counts.cumsum() - seg_counts)[seg_pix]
+    n_prev_f = case_f.cumsum() - case_f
+    n_use[(n_prev_f - n_prev_f[pix_first_seg]) > 0] = 0
+
+    # Number each use of a segment within its pixel's ramp
+    use_seg = np.repeat(np.arange(len(seg_pix)), n_use)
+    use_pix = seg_pix[use_seg]
+    num_seg = np.bincount(use_pix, minlength=npix)
+    use_num = np.arange(len(use_seg)) - (num_seg.cumsum() - num_seg)[use_pix]
+
+    # Weighted average for slopes, equal to sum(m/v)/sum(1/v)
+    #    for the pixels in which the variance v is nonzero
+    inv_var = np.zeros(npix, dtype=np.float64)
+    m_by_var = np.zeros(npix, dtype=np.float64)
+
+    # Create object to hold optional results
+    opt_res.init_2d(npix, i_max_seg)
+
+    # Accumulate the segments in the order in which they occur in the ramp
+    use_order = np.argsort(use_num, kind='mergesort')
+    use_bounds = np.concatenate(([0], np.bincount(use_num).cumsum()))
+    for ii_seg in range(len(use_bounds) - 1):
+        these_seg = use_seg[use_order[use_bounds[ii_seg]:
+                                      use_bounds[ii_seg + 1]]]
+        g_pix = seg_pix[these_seg]
+
+        inv_var[g_pix] += 1.0 / variance[these_seg]
+        m_by_var[g_pix] += slope[these_seg] / variance[these_seg]
+
+        if ii_seg < i_max_seg:
+            opt_res.interc_2d[ii_seg, g_pix] = intercept[these_seg]
+            opt_res.slope_2d[ii_seg, g_pix] = slope[these_seg]
+            opt_res.siginterc_2d[ii_seg, g_pix] = sig_intercept[these_seg]
+            opt_res.sigslope_2d[ii_seg, g_pix] = sig_slope[these_seg]
+            opt_res.inv_var_2d[ii_seg, g_pix] = inv_var[g_pix]
+
+            var_p_2d[ii_seg, g_pix] = sig_slope_p[these_seg]
+            var_r_2d[ii_seg, g_pix] = sig_slope_r[these_seg]
+
+    if len(use_seg) > 0:
+        f_max_seg = max(f_max_seg, num_seg.max())
+
+    # Create nominal 2D ERR array, which is 1st slice of
+    #    avged_data_cube * readtime
+    err_2d_array = data_sect[0, :, :] * frame_time
+    err_2d_array[err_2d_array < 0] = 0
+
+    err_sect = np.zeros(cubeshape, dtype=np.float32)
+    # For now, making all error array slices within an integration and
+    #  section identical. Update later when use of error array has been decided
+    for ii in range(cubeshape[0]):
+        err_sect[ii, :, :] = err_2d_array
+
+    return err_sect, gdq_sect, m_by_var, inv_var, opt_res, f_max_seg
+
+
+def fit_segments(data_2d, rn_sect, gain_sect, seg_pix, first_read, last_read,
+                 nreads_seg, weighting):
+    """
+    Extended Summary
+    ----------------
+    Do linear least squares fits to all segments of all pixels in the data
+    section at once.  Segments having more than 2 reads are fit using sums
+    accumulated over the reads of all segments together; as in `fit_lines`,
+    a segment having exactly 2 reads gets the difference of the reads as its
+    slope, and a segment consisting only of the 0th read gets that read as
+    its slope.
+
+    Parameters
+    ----------
+    data_2d: float, 2D array
+        values for all reads of all pixels in data section
+
+    rn_sect: float, 2D array
+        read noise values for all pixels in data section
+
+    gain_sect: float, 2D array
+        gain values for all pixels in data section
+
+    seg_pix: int, 1D array
+        pixel index (within the section) of each segment
+
+    first_read: int, 1D array
+        first read of each segment
+
+    last_read: int, 1D array
+        last read of each segment
+
+    nreads_seg: int, 1D array
+        number of reads in each segment
+
+    weighting: string
+        'unweighted' specifies that no weighting should be used (default)
+        'optimal' specifies that optimal weighting should be used
+
+    Returns
+    -------
+    slope_s: float, 1D array
+       slope of each segment
+
+    intercept_s: float, 1D array
+       y-intercept of each segment
+
+    variance_s: float, 1D array
+       variance of the slope of each segment
+
+    sig_intercept_s: float, 1D array
+       sigma of the y-intercept of each segment
+
+    sig_slope_s: float, 1D array
+       sigma of the slope of each segment
+
+    sig_slope_p_s: float, 1D array
+       variance of the slope of each segment due to Poisson noise only
+
+    sig_slope_r_s: float, 1D array
+       variance of the slope of each segment due to read noise only
+    """
+    nseg = len(seg_pix)
+
+    slope_s = np.zeros(nseg, dtype=np.float64)
+    variance_s = np.zeros(nseg, dtype=np.float64) + MIN_ERR
+    intercept_s = np.zeros(nseg, dtype=np.float64)
+    sig_intercept_s = np.zeros(nseg, dtype=np.float64) + MIN_ERR
+    sig_slope_s = np.zeros(nseg, dtype=np.float64) + MIN_ERR
+    sig_slope_p_s = np.zeros(nseg, dtype=np.float64)
+    sig_slope_r_s = np.zeros(nseg, dtype=np.float64)
+
+    data_first = data_2d[first_read, seg_pix]
+    data_last = data_2d[last_read, seg_pix]
+
+    # Segment consisting only of the 0th read
+    wh_1r = (nreads_seg == 1)
+    slope_s[wh_1r] = data_first[wh_1r]
+
+    # Segments having exactly 2 reads
+    wh_2r = (nreads_seg == 2)
+    slope_s[wh_2r] = data_last[wh_2r] - data_first[wh_2r]
+    intercept_s[wh_2r] = data_last[wh_2r] * (1. - last_read[wh_2r]) + \
+                         data_first[wh_2r] * last_read[wh_2r] # by geometry
+
+    # Segments having >2 reads
+    good_seg = np.where(nreads_seg > 2)[0]
+    if len(good_seg) == 0:
+        return slope_s, intercept_s, variance_s,  \
+               sig_intercept_s, sig_slope_s, sig_slope_p_s, sig_slope_r_s
+
+    nreads_1d = nreads_seg[good_seg]
+
+    if weighting.lower() == 'optimal': # fit using optimal weighting
+        # get sums from optimal weighting
+        sumx, sumxx, sumxy, sumy, nreads_wtd, nreads_wtd_RN = \
+            calc_opt_seg_sums(data_2d, rn_sect, gain_sect, seg_pix[good_seg],
+                              first_read[good_seg], nreads_1d,
+                              data_first[good_seg], data_last[good_seg])
+
+        # calc_opt_fit uses the mask only to count the reads in each segment
+        slope, intercept, sig_slope, sig_intercept, sig_slope_p, sig_slope_r =\
+               calc_opt_fit(nreads_wtd, nreads_wtd_RN, sumxx, sumx, sumxy, \
+               sumy, nreads_1d[np.newaxis, :])
+
+        # Total variance of slope is the sum of the variance of the slope due
+        # to Poisson noise only and the variance of the slope due to Read
+        # noise only
+        variance = sig_slope_p + sig_slope_r
+
+    elif weighting.lower() == 'unweighted': # fit using unweighted weighting
+        # get sums from unweighted weighting
+        sumx, sumxx, sumxy, sumy = \
+            calc_unwtd_seg_sums(data_2d, seg_pix[good_seg],
+                                first_read[good_seg], nreads_1d)
+
+        slope, intercept, sig_slope, sig_intercept, line_fit =\
+               calc_unwtd_fit(0, nreads_1d, sumxx, sumx, sumxy, sumy)
+
+        denominator = nreads_1d * sumxx - sumx**2
+        variance = nreads_1d / denominator
+
+        sig_slope_p = 0.
+        sig_slope_r = 0.
+
+    else: # unsupported weighting type specified
+        log.error('FATAL ERROR: unsupported weighting type specified.')
+
+    slope_s[good_seg] = slope
+    variance_s[good_seg] = variance
+    intercept_s[good_seg] = intercept
+    sig_intercept_s[good_seg] = sig_intercept
+    sig_slope_s[good_seg] = sig_slope
+    sig_slope_p_s[good_seg] = sig_slope_p
+    sig_slope_r_s[good_seg] = sig_slope_r
+
+    return slope_s, intercept_s, variance_s,  \
+           sig_intercept_s, sig_slope_s, sig_slope_p_s, sig_slope_r_s
+
+
+def seg_read_indices(seg_pix, first_read, nreads_seg):
+    """
+    Short Summary
+    -------------
+    List the reads of all segments, ordered by segment and then by read,
+    for accumulating the sums for the fits of all segments at once.
+
+    Parameters
+    ----------
+    seg_pix: int, 1D array
+        pixel index (within the section) of each segment
+
+    first_read: int, 1D array
+        first read of each segment
+
+    nreads_seg: int, 1D array
+        number of reads in each segment
+
+    Returns
+    -------
+    read_seg: int, 1D array
+        segment to which each read belongs
+
+    read_pos: int, 1D array
+        position of each read within its segment
+
+    read_num: int, 1D array
+        read number of each read
+
+    read_pix: int, 1D array
+        pixel index (within the section) of each read
+    """
+    read_seg = np.repeat(np.arange(len(seg_pix)), nreads_seg)
+    read_pos = np.arange(len(read_seg)) - \
+               np.repeat(nreads_seg.cumsum() - nreads_seg, nreads_seg)
+    read_num = first_read[read_seg] + read_pos
+    read_pix = seg_pix[read_seg]
+
+    return read_seg, read_pos, read_num, read_pix
+
+
+def calc_unwtd_seg_sums(data_2d, seg_pix, first_read, nreads_seg):
+    """
+    Short Summary
+    -------------
+    Calculate the sums needed to determine the slope and intercept (and sigma
+    of each) of all segments using an unweighted fit.  The sums over the
+    reads of each segment are accumulated for all segments together.
+
+    Parameters
+    ----------
+    data_2d: float, 2D array
+        values for all reads of all pixels in data section
+
+    seg_pix: int, 1D array
+        pixel index (within the section) of each segment
+
+    first_read: int, 1D array
+        first read of each segment
+
+    nreads_seg: int, 1D array
+        number of reads in each segment
+
+    Return:
+    -------
+    sumx: float, 1D array
+        sum of xvalues
+
+    sumxx: float, 1D array
+        sum of squares of xvalues
+
+    sumxy: float, 1D array
+        sum of product of xvalues and data
+
+    sumy: float, 1D array
+        sum of data
+    """
+    nseg = len(seg_pix)
+    read_seg, read_pos, read_num, read_pix = \
+        seg_read_indices(seg_pix, first_read, nreads_seg)
+
+    xvalues = read_num.astype(np.float64)
+    data = data_2d[read_num, read_pix]
+
+    sumx = np.bincount(read_seg, weights=xvalues, minlength=nseg)
+    sumxx = np.bincount(read_seg, weights=xvalues**2, minlength=nseg)
+    sumy = np.bincount(read_seg, weights=data, minlength=nseg)
+    sumxy = np.bincount(read_seg, weights=xvalues * data, minlength=nseg)
+
+    return sumx, sumxx, sumxy, sumy
+
+
+def calc_opt_seg_sums(data_2d, rn_sect, gain_sect, seg_pix, first_read,
+                      nreads_seg, data_first, data_last):
+    """
+    Short Summary
+    -------------
+    Calculate the sums needed to determine the slope and intercept (and
+    sigma of each) of all segments using the optimal weights.  The SNR,
+    weighting exponent and weights of each segment are calculated as in
+    `calc_opt_sums`, and the weighted sums over the reads of each segment
+    are accumulated for all segments together.
+
+    Parameters
+    ----------
+    data_2d: float, 2D array
+        values for all reads of all pixels in data section
+
+    rn_sect: float, 2D array
+        read noise values for all pixels in data section
+
+    gain_sect: float, 2D array
+        gain values for all pixels in data section
+
+    seg_pix: int, 1D array
+        pixel index (within the section) of each segment
+
+    first_read: int, 1D array
+        first read of each segment
+
+    nreads_seg: int, 1D array
+        number of reads in each segment
+
+    data_first: float, 1D array
+        value of the first read of each segment
+
+    data_last: float, 1D array
+        value of the last read of each segment
+
+    Return:
+    -------
+    sumx: float, 1D array
+        sum of xvalues
+
+    sumxx: float, 1D array
+        sum of squares of xvalues
+
+    sumxy: float, 1D array
+        sum of product of xvalues and data
+
+    sumy: float, 1D array
+        sum of data
+
+    nreads_wtd: float, 1D array
+        sum of weights
+
+    nreads_wtd_RN: float, 1D array
+        sum of weights for read noise only
+    """
+    nseg = len(seg_pix)
+    read_seg, read_pos, read_num, read_pix = \
+        seg_read_indices(seg_pix, first_read, nreads_seg)
+
+    xvalues = read_num.astype(np.float64)
+    data = data_2d[read_num, read_pix]
+
+    data_diff = data_last - data_first
+
+   # Use the readnoise and gain for the pixel of each segment
+    rn_sect_rav = rn_sect.flatten()[seg_pix]
+    rn_2_r = rn_sect_rav * rn_sect_rav
+
+    gain_sect_r = gain_sect.flatten()[seg_pix]
+
+   # Calculate the SNR for segments from the readnoise, the gain, and the
+   # difference between the last and first reads for segments where this
+   # results in a positive SNR. Otherwise set the SNR to 0.
+    sigma_ir = data_last * 0.0
+    numer_ir = data_last * 0.0
+    sqrt_arg = rn_2_r + data_diff * gain_sect_r
+    wh_pos = np.where((sqrt_arg >= 0.) & (gain_sect_r != 0.))
+    numer_ir[wh_pos] = np.sqrt(rn_2_r[wh_pos] + \
+                                data_diff[wh_pos] * gain_sect_r[wh_pos])
+    sigma_ir[wh_pos] = numer_ir[wh_pos] / gain_sect_r[wh_pos]
+    snr = data_diff * 0.
+    snr[wh_pos] = data_diff[wh_pos] / sigma_ir[wh_pos]
+    snr[snr < 0.] = 0.0
+
+    power_wt_r = calc_power(snr)  # get the weighting exponent for this SNR
+
+    # Number of nonzero reads per segment
+    nrd_data_a = np.bincount(read_seg, weights=(data != 0.), minlength=nseg)
+    nrd_prime = (nrd_data_a - 1) / 2.
+
+    # Calculate inverse read noise^2 for use in weights
+    invrdns2_r = 1./rn_2_r
+
+    # Set optimal weights for each read of each segment
+    wt_h = (abs((abs(read_pos - nrd_prime[read_seg]) / nrd_prime[read_seg])
+                ** power_wt_r[read_seg]) * invrdns2_r[read_seg]).\
+                astype(np.float32)
+
+    wt_h[np.isnan(wt_h)] = 0.
+    wt_h[np.isinf(wt_h)] = 0.
+
+    # Create weighted sums for Poisson noise and read noise
+    nreads_wtd = np.bincount(read_seg, weights=wt_h, minlength=nseg)
+    nreads_wtd_RN = invrdns2_r * nreads_seg
+
+    sumx = np.bincount(read_seg, weights=xvalues * wt_h, minlength=nseg)
+    sumxx = np.bincount(read_seg, weights=xvalues**2 * wt_h, minlength=nseg)
+    sumy = np.bincount(read_seg, weights=data * wt_h, minlength=nseg)
+    sumxy = np.bincount(read_seg, weights=xvalues * wt_h * data,
+                        minlength=nseg)
+
+    return sumx, sumxx, sumxy, sumy, nreads_wtd, nreads_wtd_RN
+
+
 def fit_next_segment(start, end_st, end_heads, pixel_done, data_sect, mask_2d,
                       inv_var, m_by_var, num_seg, opt_res, rn_sect, gain_sect,
                       ngroups, weighting, total_mask_sum, f_max_seg, \
@@ -1888,8 +2868,8 @@ def fit_1_group(slope_s, intercept_s, variance_s, sig_intercept_s,
     # For pixels not saturated, recalculate the slope as the value of the SCI
     # data in that group, which will later be divided by the group exposure
     # time to give the count rate. Recalculate other fit quantities to be
-    # benign.
-    slope_s = data[0, :, :].reshape(npix)
+    # benign. The slopes are a copy, so that the SCI data is not changed.
+    slope_s = data[0, :, :].reshape(npix).copy()
     variance_s = np.zeros(npix, dtype=np.float64) + MIN_ERR
     sig_slope_s = slope_s * 0. + MIN_ERR
     intercept_s = slope_s * 0.
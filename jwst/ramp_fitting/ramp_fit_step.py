@@ -23,6 +23,8 @@ class RampFitStep (Step):
         int_name = string(default='')
         save_opt = boolean(default=False) # Save optional output
         opt_name = string(default='')
+        maximum_cores = option('none', 'quarter', 'half', 'all', default='none') # max number of processes to create
+        vectorized_fit = boolean(default=False) # fit all ramp segments at once (faster; agrees to float32 rounding)
     """
 
     # Prior to 04/26/17, the following were also in the spec above:
@@ -45,9 +47,11 @@ class RampFitStep (Step):
             gain_filename = self.get_reference_file(input_model, 'gain')
 
             log.info('Using READNOISE reference file: %s', readnoise_filename)
-            readnoise_model = datamodels.ReadnoiseModel(readnoise_filename)
+            readnoise_model = self.open_reference_model(readnoise_filename,
+                                                        datamodels.ReadnoiseModel)
             log.info('Using GAIN reference file: %s', gain_filename)
-            gain_model = datamodels.GainModel(gain_filename)
+            gain_model = self.open_reference_model(gain_filename,
+                                                   datamodels.GainModel)
 
             # Try to retrieve the gain factor from the gain reference file.
             # If found, store it in the science model meta data, so that it's
@@ -60,15 +64,15 @@ class RampFitStep (Step):
 
             log.info('Using algorithm = %s' % self.algorithm)
             log.info('Using weighting = %s' % self.weighting)
+            log.info('Using maximum_cores = %s' % self.maximum_cores)
+            log.info('Using vectorized_fit = %s' % self.vectorized_fit)
 
             buffsize = ramp_fit.BUFSIZE
-            if self.algorithm == "GLS":
-                buffsize //= 10
 
             out_model, int_model, opt_model, gls_opt_model =\
                 ramp_fit.ramp_fit(input_model, buffsize, \
                 self.save_opt, readnoise_model, gain_model, self.algorithm, \
-                self.weighting)
+                self.weighting, self.maximum_cores, self.vectorized_fit)
 
             readnoise_model.close()
             gain_model.close()
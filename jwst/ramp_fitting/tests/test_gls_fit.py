@@ -0,0 +1,83 @@
+"""
+Tests of the GLS fit using the structure of the covariance matrix
+"""
+from __future__ import absolute_import, division
+
+import numpy as np
+from numpy.testing import assert_allclose
+import pytest
+
+from .. import gls_fit
+
+
+def test_solve_tridiagonal():
+    rng = np.random.RandomState(3)
+    ngroups, nz, nrhs = 12, 20, 3
+    off_diag = rng.uniform(-1., 1., size=(ngroups, nz))
+    # Diagonally dominant, so positive definite
+    main_diag = rng.uniform(2.5, 5., size=(ngroups, nz))
+    b = rng.normal(size=(ngroups, nz, nrhs))
+
+    z = gls_fit.solve_tridiagonal(main_diag, off_diag, b)
+
+    for pixel in range(nz):
+        matrix = np.diag(main_diag[:, pixel])
+        matrix += np.diag(off_diag[1:, pixel], 1)
+        matrix += np.diag(off_diag[1:, pixel], -1)
+        assert_allclose(z[:, pixel], np.linalg.solve(matrix, b[:, pixel]),
+                        rtol=1e-10, atol=1e-12)
+
+
+def _random_ramps(rng, ngroups, nz, num_cr, first_saturated):
+    group_time = 10.7
+    slope = rng.uniform(1., 200., nz)
+    times = (np.arange(ngroups) + 1.) * group_time
+    ramp_data = (slope * times[:, np.newaxis] + 100. +
+                 rng.normal(0., 10., size=(ngroups, nz)))
+
+    cr_flagged_2d = np.zeros((ngroups, nz), dtype=np.int32)
+    for pixel in range(nz):
+        for group in rng.choice(np.arange(1, ngroups), num_cr, replace=False):
+            cr_flagged_2d[group, pixel] = 1
+            ramp_data[group:, pixel] += 500.
+
+    saturated_data = np.zeros((ngroups, nz))
+    if first_saturated is not None:
+        saturated_data[first_saturated:, :nz // 2] = \
+            gls_fit.HUGE_FOR_LOW_WEIGHT
+
+    input_var_data = rng.uniform(0., 5., size=(ngroups, nz))
+    prev_fit_data = np.maximum(slope * times[:, np.newaxis], 0.)
+    prev_slope_data = slope - 30.
+    readnoise = rng.uniform(5., 20., nz)
+    gain = rng.uniform(1., 4., nz)
+
+    return (ramp_data, input_var_data, prev_fit_data, prev_slope_data,
+            readnoise, gain, 2.77, group_time, 4, num_cr, cr_flagged_2d,
+            saturated_data)
+
+
+@pytest.mark.parametrize('use_extra_terms', [True, False])
+@pytest.mark.parametrize('ngroups, num_cr, first_saturated', [
+    (2, 0, None),
+    (5, 0, None),
+    (5, 1, 3),
+    (10, 1, None),
+    (30, 2, 15),
+    (100, 3, 50),
+    (60, 0, 2),
+])
+def test_structured_solver(ngroups, num_cr, first_saturated,
+                           use_extra_terms):
+    """The structured solver gives the results of the dense solver"""
+    rng = np.random.RandomState(ngroups)
+    args = _random_ramps(rng, ngroups, 50, num_cr, first_saturated)
+
+    results = {}
+    for solver in ('dense', 'structured'):
+        results[solver] = gls_fit.gls_fit(
+            *[np.copy(arg) for arg in args],
+            use_extra_terms=use_extra_terms, solver=solver)
+
+    for dense, structured in zip(results['dense'], results['structured']):
+        assert_allclose(structured, dense, rtol=1e-6)
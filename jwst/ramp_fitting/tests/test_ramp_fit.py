@@ -0,0 +1,155 @@
+"""
+Tests of the ramp fitting engines
+"""
+from __future__ import absolute_import, division
+
+import numpy as np
+from numpy.testing import assert_allclose, assert_array_equal
+import pytest
+
+from ... import datamodels
+from ...datamodels import dqflags
+from .. import ramp_fit
+from .. import utils
+
+DO_NOT_USE = dqflags.group['DO_NOT_USE']
+SATURATED = dqflags.group['SATURATED']
+JUMP_DET = dqflags.group['JUMP_DET']
+
+
+def _random_ramps(rng, ngroups, shape, cr_rate):
+    """
+    Ramps of random slopes, with random jumps, unusable groups, and
+    saturation at the end of some of the ramps.
+    """
+    rate = rng.uniform(-2., 60., size=shape)
+    data = np.cumsum(rng.normal(rate, 3., size=(ngroups,) + shape), axis=0)
+    groupdq = np.zeros(data.shape, dtype=np.uint8)
+
+    jumps = rng.uniform(size=data.shape) < cr_rate
+    groupdq[jumps] |= JUMP_DET
+    data += np.cumsum(jumps * 300., axis=0)
+    groupdq[rng.uniform(size=data.shape) < cr_rate / 3.] |= DO_NOT_USE
+
+    first_saturated = rng.randint(0, ngroups, size=shape)
+    saturated = ((rng.uniform(size=shape) < 0.3) &
+                 (np.arange(ngroups)[:, np.newaxis, np.newaxis] >=
+                  first_saturated))
+    groupdq[saturated] |= SATURATED
+
+    return data.astype(np.float32), groupdq
+
+
+def _make_ramp_model(nints, ngroups, shape, seed):
+    rng = np.random.RandomState(seed)
+    data = np.zeros((nints, ngroups) + shape, dtype=np.float32)
+    groupdq = np.zeros(data.shape, dtype=np.uint8)
+    for integration in range(nints):
+        data[integration], groupdq[integration] = _random_ramps(
+            rng, ngroups, shape, 0.05)
+
+    model = datamodels.RampModel(data=data, groupdq=groupdq,
+                                 pixeldq=np.zeros(shape, dtype=np.uint32),
+                                 err=np.zeros(data.shape, dtype=np.float32))
+    model.meta.instrument.name = 'NIRCAM'
+    model.meta.exposure.frame_time = 10.7
+    model.meta.exposure.group_time = 10.7
+    model.meta.exposure.ngroups = ngroups
+    model.meta.exposure.nframes = 1
+    model.meta.exposure.groupgap = 0
+
+    readnoise = datamodels.ReadnoiseModel(
+        data=np.full(shape, 5., dtype=np.float32))
+    gain = datamodels.GainModel(data=np.full(shape, 2., dtype=np.float32))
+
+    return model, readnoise, gain
+
+
+def test_calc_slope_segments():
+    """
+    The fit of all the segments at once agrees with the fit of one segment
+    at a time, for random patterns of jumps, saturation and unusable groups
+    """
+    rng = np.random.RandomState(2)
+    shape = (6, 7)
+    npix = shape[0] * shape[1]
+    for trial in range(100):
+        ngroups = rng.choice([3, 4, 5, 8, 15, 25])
+        data, groupdq = _random_ramps(rng, ngroups, shape, rng.uniform(0., 0.5))
+        readnoise = rng.uniform(3., 10., size=shape).astype(np.float32)
+        gain = rng.uniform(1., 3., size=shape).astype(np.float32)
+        # Room for as many segments as there are groups
+        max_seg = int(ngroups)
+
+        results = []
+        for calc in (ramp_fit.calc_slope, ramp_fit.calc_slope_segments):
+            opt_res = utils.OptRes(1, shape, max_seg, ngroups)
+            var_p_2d = np.zeros((max_seg, npix), dtype=np.float32)
+            var_r_2d = np.zeros((max_seg, npix), dtype=np.float32)
+            err, dq, m_by_var, inv_var, opt_res, f_max_seg = calc(
+                data.copy(), groupdq.copy(), 10.7, opt_res, readnoise, gain,
+                max_seg, ngroups, 'optimal', 0, var_p_2d, var_r_2d)
+            results.append((f_max_seg, dq, [err, m_by_var, inv_var,
+                            opt_res.slope_2d, opt_res.interc_2d,
+                            opt_res.sigslope_2d, opt_res.siginterc_2d,
+                            opt_res.inv_var_2d, var_p_2d, var_r_2d]))
+
+        (expected_max_seg, expected_dq, expected), \
+            (actual_max_seg, actual_dq, actual) = results
+        assert actual_max_seg == expected_max_seg
+        assert_array_equal(actual_dq, expected_dq)
+        # calc_slope accumulates its sums in single precision, so values
+        # near zero are only as precise as the largest values
+        for actual_array, expected_array in zip(actual, expected):
+            scale = np.nanmax(np.abs(expected_array)) if expected_array.size else 0.
+            assert_allclose(actual_array, expected_array, rtol=1e-3,
+                            atol=1e-3 * scale + 1e-6)
+
+
+@pytest.mark.parametrize('vectorized_fit', [False, True])
+@pytest.mark.parametrize('ngroups', [1, 2, 10])
+def test_ols_ramp_fit_parallel(ngroups, vectorized_fit):
+    """Fitting the data sections in worker processes gives the serial results"""
+    results = []
+    for max_cores in ('none', 4):
+        model, readnoise, gain = _make_ramp_model(2, ngroups, (40, 30), 1)
+        # A small buffer, so that there are several sections
+        new_model, int_model, opt_model = ramp_fit.ols_ramp_fit(
+            model, 1000, True, readnoise, gain, 'optimal', max_cores,
+            vectorized_fit)
+        results.append([new_model.data, new_model.dq, new_model.var_p2d,
+                        new_model.var_r2d, int_model.data, int_model.err,
+                        opt_model.slope, opt_model.yint, opt_model.pedestal,
+                        opt_model.weights, opt_model.crmag, model.err,
+                        model.groupdq])
+
+    for serial, parallel in zip(*results):
+        assert_array_equal(parallel, serial)
+
+
+@pytest.mark.parametrize('nints, ngroups', [(1, 4), (2, 6)])
+def test_gls_ramp_fit_parallel(monkeypatch, nints, ngroups):
+    """Fitting the GLS data sections in worker processes gives the serial
+    results"""
+    # gls_ramp_fit calls output_integ with arguments that it no longer
+    # takes, so compare the integration-specific arrays handed to it
+    monkeypatch.setattr(utils, 'output_integ',
+                        lambda model, *arrays: arrays)
+
+    results = []
+    for max_cores in ('none', 3):
+        model, readnoise, gain = _make_ramp_model(nints, ngroups, (12, 10), 3)
+        # A small buffer, so that there are several sections
+        new_model, int_arrays, opt_model = ramp_fit.gls_ramp_fit(
+            model, 20000, True, readnoise, gain, max_cores)
+        arrays = [new_model.data, new_model.err, new_model.dq,
+                  opt_model.yint, opt_model.sigyint, opt_model.pedestal,
+                  opt_model.crmag, opt_model.sigcrmag]
+        if nints > 1:
+            arrays += list(int_arrays)
+        else:
+            assert int_arrays is None
+        results.append(arrays)
+
+    for serial, parallel in zip(*results):
+        assert_array_equal(parallel, serial)
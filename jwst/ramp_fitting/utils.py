@@ -1010,6 +1010,6 @@ def get_ref_subs(model, readnoise_model, gain_model):
         log.info('Extracting readnoise subarray to match science data')
         readnoise_2d = reffile_utils.get_subarray_data(model, readnoise_model)
 
-    readnoise_2d *= gain_2d # convert read noise to correct units
+    readnoise_2d = readnoise_2d * gain_2d # convert read noise to correct units
 
     return readnoise_2d, gain_2d
@@ -146,7 +146,7 @@ class GWCSDrizzle(object):
 
     def add_image(self, insci, inwcs, inwht=None,
                   xmin=0, xmax=0, ymin=0, ymax=0, pscale_ratio=1.0,
-                  expin=1.0, in_units="cps", wt_scl=1.0):
+                  expin=1.0, in_units="cps", wt_scl=1.0, pixmap=None):
         """
         Combine an input image with the output drizzled image.
 
@@ -211,6 +211,11 @@ class GWCSDrizzle(object):
             initialized with wt_scl set to "exptime" or "expsq", the exposure time
             will be used to set the weight scaling and the value of this parameter
             will be ignored.
+
+        pixmap : array, optional
+            The output x and y of each input pixel, with shape (ny, nx, 2),
+            as computed by `resample_utils.calc_gwcs_pixmap`. If none is
+            supplied, it is computed from `inwcs` and the output WCS.
         """
         insci = insci.astype(np.float32)
 
@@ -233,7 +238,7 @@ class GWCSDrizzle(object):
                             pscale_ratio=pscale_ratio, uniqid=self.uniqid,
                             xmin=xmin, xmax=xmax, ymin=ymin, ymax=ymax,
                             pixfrac=self.pixfrac, kernel=self.kernel,
-                            fillval=self.fillval)
+                            fillval=self.fillval, pixmap=pixmap)
 
     def blot_fits_file(self, infile, interp='poly5', sinscl=1.0):
         """
@@ -322,7 +327,7 @@ class GWCSDrizzle(object):
         # Add a new plane to the context image if planeid overflows
 
         if self.outcon.shape[0] == planeid:
-            plane = np.zeros_like(self.outcon[0])
+            plane = np.zeros_like(self.outcon[:1])
             self.outcon = np.append(self.outcon, plane, axis=0)
 
         # Increment the id
@@ -333,7 +338,7 @@ def dodrizzle(insci, input_wcs, inwht,
               expin, in_units, wt_scl,
               pscale_ratio=1.0, uniqid=1,
               xmin=0, xmax=0, ymin=0, ymax=0,
-              pixfrac=1.0, kernel='square', fillval="INDEF"):
+              pixfrac=1.0, kernel='square', fillval="INDEF", pixmap=None):
     """
     Low level routine for performing 'drizzle' operation on one image.
 
@@ -439,6 +444,10 @@ def dodrizzle(insci, input_wcs, inwht,
         The value a pixel is set to in the output if the input image does
         not overlap it. The default value of INDEF does not set a value.
 
+    pixmap: 3d array, optional
+        The output x and y of each input pixel, with shape (ny, nx, 2). If
+        none is supplied, it is computed from the input and output WCS.
+
     Returns
     -------
     A tuple with three values: a version string, the number of pixels
@@ -492,8 +501,13 @@ def dodrizzle(insci, input_wcs, inwht,
         outcon = outcon[planeid]
 
     # Compute the mapping between the input and output pixel coordinates
-    pixmap = resample_utils.calc_gwcs_pixmap(input_wcs, output_wcs)
-    pixmap[np.isnan(pixmap)] = -1
+    if pixmap is None:
+        pixmap = resample_utils.calc_gwcs_pixmap(input_wcs, output_wcs)
+    undefined = np.isnan(pixmap)
+    if undefined.any():
+        # The map may be shared with the pixel map cache
+        pixmap = pixmap.copy()
+        pixmap[undefined] = -1
 
     #
     # Call 'drizzle' to perform image combination
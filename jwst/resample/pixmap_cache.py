@@ -0,0 +1,225 @@
+"""
+A process-wide cache of the pixel maps between input and output frames
+used by drizzle and blot.
+
+The same maps are computed several times when processing a set of
+exposures: the single drizzle and the final resample map each input
+frame onto the same output frame, and outlier detection blots the median
+image back onto each input frame.  With the cache enabled, each map is
+computed only once.  Maps are kept in memory, and optionally saved as
+``.npy`` files in a directory, so that they can be reused by later
+processes.
+
+The cache is disabled by default; it is enabled either with
+`pixmap_cache.configure`, or by setting the environment variables
+``JWST_PIXMAP_CACHE_MAPS`` (the maximum number of maps kept in memory),
+``JWST_PIXMAP_CACHE_MB`` (the maximum size of the maps kept in memory,
+in MB) and ``JWST_PIXMAP_CACHE_DIR`` (the directory of the ``.npy``
+files).
+
+The cache also holds the settings of how maps are computed: with
+``grid_step`` set (``JWST_PIXMAP_GRID_STEP``), the transforms are only
+evaluated on a coarse grid of pixels, and interpolated between them, as
+long as the interpolation error is within ``tolerance`` output pixels
+(``JWST_PIXMAP_TOLERANCE``).  See `resample_utils.calc_gwcs_pixmap`.
+"""
+from __future__ import absolute_import, division, print_function
+
+from collections import OrderedDict
+import logging
+import os
+import threading
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+# The default maximum interpolation error of coarse pixel maps, in pixels
+DEFAULT_TOLERANCE = 0.01
+
+# The default of the arguments of `PixmapCache.configure`, which can not be
+# None since None means that there is no memory limit
+_UNCHANGED = object()
+
+
+class PixmapCache(object):
+    """
+    A cache of pixel maps, keyed by strings that identify the input and
+    output WCS and the way the map is computed, that evicts the least
+    recently used maps beyond its limits.
+
+    The maps handed out are read-only.
+
+    Parameters
+    ----------
+    max_pixmaps : int
+        The maximum number of maps kept in memory; 0 keeps none.
+
+    max_memory : float or None
+        The maximum total size of the maps kept in memory, in MB, or None
+        for no limit.
+
+    directory : str or None
+        The directory to save the maps to and load them from as ``.npy``
+        files, or None to keep them in memory only.
+
+    grid_step : int or None
+        The spacing, in input pixels, of the coarse grid on which the
+        transforms are evaluated, or None to evaluate them at every pixel.
+
+    tolerance : float
+        The maximum interpolation error allowed for maps computed on a
+        coarse grid, in output pixels.
+
+    Attributes
+    ----------
+    hits, misses : int
+        The number of requests satisfied from the cache, and the number
+        of requests for which the map had to be computed.
+    """
+    def __init__(self, max_pixmaps=0, max_memory=None, directory=None,
+                 grid_step=None, tolerance=DEFAULT_TOLERANCE):
+        self._lock = threading.Lock()
+        self._pixmaps = OrderedDict()
+        self.max_pixmaps = max_pixmaps
+        self.max_memory = max_memory
+        self.directory = directory
+        self.grid_step = grid_step
+        self.tolerance = tolerance
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, max_pixmaps=_UNCHANGED, max_memory=_UNCHANGED,
+                  directory=_UNCHANGED, grid_step=_UNCHANGED,
+                  tolerance=_UNCHANGED):
+        """
+        Change the settings of the cache, evicting maps if necessary.
+        Settings that are not given are left unchanged; a `max_memory` of
+        None removes the memory limit, a `grid_step` of None or 0 turns off
+        the coarse grid, and a `directory` of None or '' turns off the
+        saving of maps to files.
+        """
+        with self._lock:
+            if max_pixmaps is not _UNCHANGED:
+                self.max_pixmaps = max_pixmaps
+            if max_memory is not _UNCHANGED:
+                self.max_memory = max_memory
+            if directory is not _UNCHANGED:
+                self.directory = directory or None
+            if grid_step is not _UNCHANGED:
+                self.grid_step = grid_step or None
+            if tolerance is not _UNCHANGED:
+                self.tolerance = tolerance
+            self._evict()
+
+    def clear(self):
+        """
+        Remove all of the maps from memory, and reset the counters.
+        Files of maps are left in place.
+        """
+        with self._lock:
+            self._pixmaps.clear()
+            self.hits = 0
+            self.misses = 0
+
+    @property
+    def enabled(self):
+        """
+        Whether maps are kept at all, in memory or in files.
+        """
+        return bool(self.max_pixmaps or self.directory)
+
+    def __len__(self):
+        return len(self._pixmaps)
+
+    @property
+    def nbytes(self):
+        """
+        The total size of the maps kept in memory, in bytes.
+        """
+        return sum(pixmap.nbytes for pixmap in self._pixmaps.values())
+
+    def get(self, key):
+        """
+        Return the map stored under a key, or None if there is none.
+        """
+        with self._lock:
+            pixmap = self._pixmaps.get(key)
+            if pixmap is not None:
+                # Move the map to the most recently used end
+                self._pixmaps[key] = self._pixmaps.pop(key)
+                self.hits += 1
+                return pixmap
+
+        filename = self._filename(key)
+        if filename is not None and os.path.exists(filename):
+            try:
+                pixmap = np.load(filename)
+            except (IOError, ValueError) as err:
+                log.warning('Cannot read pixel map %s: %s', filename, err)
+            else:
+                log.debug('Pixel map cache read %s', filename)
+                pixmap.flags.writeable = False
+                with self._lock:
+                    self.hits += 1
+                    self._add(key, pixmap)
+                return pixmap
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, pixmap):
+        """
+        Store a map under a key, and return it made read-only.
+        """
+        pixmap.flags.writeable = False
+        filename = self._filename(key)
+        if filename is not None:
+            # Write to a temporary file first so that other processes
+            # never read a partial file
+            tmpname = '{0}.{1}.tmp.npy'.format(filename[:-4], os.getpid())
+            try:
+                np.save(tmpname, pixmap)
+                os.rename(tmpname, filename)
+            except (IOError, OSError) as err:
+                log.warning('Cannot write pixel map %s: %s', filename, err)
+        with self._lock:
+            self._add(key, pixmap)
+        return pixmap
+
+    def _filename(self, key):
+        if self.directory is None:
+            return None
+        return os.path.join(self.directory, key + '.npy')
+
+    def _add(self, key, pixmap):
+        if self.max_pixmaps:
+            self._pixmaps[key] = pixmap
+            self._evict()
+
+    def _evict(self):
+        if self.max_memory is None:
+            max_bytes = np.inf
+        else:
+            max_bytes = self.max_memory * 1024.**2
+        while self._pixmaps and (len(self._pixmaps) > self.max_pixmaps or
+                                 self.nbytes > max_bytes):
+            key, pixmap = self._pixmaps.popitem(last=False)
+            log.debug('Pixel map cache evicting %s', key)
+
+
+def _from_environment():
+    max_pixmaps = int(os.environ.get('JWST_PIXMAP_CACHE_MAPS', 0))
+    max_memory = os.environ.get('JWST_PIXMAP_CACHE_MB')
+    if max_memory is not None:
+        max_memory = float(max_memory)
+    directory = os.environ.get('JWST_PIXMAP_CACHE_DIR') or None
+    grid_step = int(os.environ.get('JWST_PIXMAP_GRID_STEP', 0)) or None
+    tolerance = float(os.environ.get('JWST_PIXMAP_TOLERANCE',
+                                     DEFAULT_TOLERANCE))
+    return PixmapCache(max_pixmaps, max_memory, directory, grid_step,
+                       tolerance)
+
+
+pixmap_cache = _from_environment()
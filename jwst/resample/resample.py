@@ -1,8 +1,11 @@
 import time
+import itertools
+import tempfile
 import numpy as np
-from collections import OrderedDict
+from collections import OrderedDict, namedtuple
 
 from .. import datamodels
+from ..lib import parallel
 
 #from drizzlepac import cdriz, util
 from . import gwcs_drizzle
@@ -136,7 +139,20 @@ class ResampleData(object):
     def do_drizzle(self, **pars):
         """ Perform drizzling operation on input images's to create a new output
 
-       """
+        The outputs are independent of each other, so they may be drizzled
+        in parallel, by setting the parameter 'maximum_cores' to 'quarter',
+        'half' or 'all' (the default, 'none', drizzles them serially), and
+        'parallel_backend' to 'thread' (the default) or 'process'.  When
+        there are fewer outputs than workers, the images of each output are
+        split into disjoint subsets, which are drizzled in parallel into
+        separate arrays that are then combined.
+
+        If the drizzle parameter 'tile_size' is set, the final output is
+        drizzled one square tile of that many pixels at a time, possibly in
+        parallel, from only the images that overlap the tile.  The output
+        arrays are then backed by temporary files rather than memory, and
+        each tile is written to them when it is done; see `drizzle_tiled`.
+        """
         # Set up information about what outputs we need to create: single or final
         # Key: value from metadata for output/observation name
         # Value: full filename for output file
@@ -160,42 +176,62 @@ class ResampleData(object):
                 total_exposure_time += group[0].meta.exposure.exposure_time
             group_exptime = [total_exposure_time]
 
+        # apply sky subtraction here, rather than in the workers, which may
+        # be separate processes
+        for group in model_groups:
+            for img in group:
+                if 'skybg' in img.meta._instance:
+                    img.data -= img.meta.skybg
+
+        max_cores = pars.get('maximum_cores', 'none')
+        backend = pars.get('parallel_backend', 'thread')
+        tile_size = self.drizpars.get('tile_size')
+        if tile_size and not self.drizpars['single']:
+            driz_products = (self.drizzle_tiled(group, tile_size,
+                                                max_cores, backend)
+                             for group in model_groups)
+        else:
+            # Split the images of each output into as many subsets as there
+            # are workers per output
+            num_workers = parallel.compute_num_workers(max_cores,
+                                                       len(self.input_models))
+            subsets = []
+            for n, group in enumerate(model_groups):
+                num_subsets = min(len(group), max(1, num_workers // len(model_groups)))
+                bounds = np.linspace(0, len(group), num_subsets + 1).astype(int)
+                for first, last in zip(bounds[:-1], bounds[1:]):
+                    subsets.append((n, first, [group[i] for i in range(first, last)]))
+
+            driz_results = parallel.ordered_map(self._drizzle_subset,
+                                subsets, num_workers=min(num_workers, len(subsets)),
+                                backend=backend)
+            group_results = itertools.groupby(zip(subsets, driz_results),
+                                              key=lambda result: result[0][0])
+            driz_products = (combine_drizzled(result for subset, result in results)
+                             for n, results in group_results)
+
         pointings = len(self.input_models.group_names)
         # Now, generate each output for all input_models
-        for obs_product, group, texptime in zip(driz_outputs, model_groups, group_exptime):
+        for obs_product, group, texptime, driz_product in zip(driz_outputs,
+                model_groups, group_exptime, driz_products):
+            outsci, outwht, outcon, driz = driz_product
+            if outcon.shape[0] == 1:
+                outcon = outcon[0]
+
             output_model = self.blank_output.copy()
             output_model.meta.filename = obs_product
+            output_model.data = outsci
+            output_model.wht = outwht
+            output_model.con = outcon
 
             output_model.meta.asn.pool_name = self.input_models.meta.pool_name
             output_model.meta.asn.table_name = self.input_models.meta.table_name
 
             exposure_times = {'start': [], 'end': []}
-
-            # Initialize the output with the wcs
-            driz = gwcs_drizzle.GWCSDrizzle(output_model,
-                                single=self.drizpars['single'],
-                                pixfrac=self.drizpars['pixfrac'],
-                                kernel=self.drizpars['kernel'],
-                                fillval=self.drizpars['fillval'])
-
-            for n, img in enumerate(group):
-                wcslin_pscale = img.meta.wcs.forward_transform['cdelt1'].factor.value
+            for img in group:
                 exposure_times['start'].append(img.meta.exposure.start_time)
                 exposure_times['end'].append(img.meta.exposure.end_time)
 
-                # apply sky subtraction 
-                if 'skybg' in img.meta._instance:
-                    img.data -= img.meta.skybg
-                    
-                outwcs_pscale = output_model.meta.wcs.forward_transform['cdelt1'].factor.value
-                wcslin_pscale = img.meta.wcs.forward_transform['cdelt1'].factor.value
-
-                inwht = build_driz_weight(img, wht_type=self.drizpars['wht_type'],
-                                    good_bits=self.drizpars['good_bits'])
-                driz.add_image(img.data, img.meta.wcs, inwht=inwht,
-                        expin=img.meta.exposure.exposure_time,
-                        pscale_ratio=outwcs_pscale / wcslin_pscale)
-
             # Update some basic exposure time values based on all the inputs
             output_model.meta.exposure.exposure_time = texptime
             output_model.meta.exposure.start_time = min(exposure_times['start'])
@@ -216,6 +252,266 @@ class ResampleData(object):
             self.output_models.append(output_model)
         #self.output_models.save(None)  # DEBUG: Remove for production
 
+    def _drizzle_subset(self, subset):
+        """ Drizzle a subset of the input images of an output onto a new output
+
+        The subset is a tuple of the index of the output, the index of the
+        first image of the subset among the images of the output, and the
+        images.  Returns the output science, weight and (3D) context
+        arrays, and the drizzle parameters, as a `DrizzleParameters` tuple.
+        """
+        n, first, group = subset
+        output_model = self.blank_output.copy()
+
+        # Initialize the output with the wcs
+        driz = gwcs_drizzle.GWCSDrizzle(output_model,
+                            single=self.drizpars['single'],
+                            pixfrac=self.drizpars['pixfrac'],
+                            kernel=self.drizpars['kernel'],
+                            fillval=self.drizpars['fillval'])
+
+        # Number the images by their position among all the images of the
+        # output, for the context
+        _set_next_id(driz, driz.uniqid + first)
+
+        outwcs_pscale = output_model.meta.wcs.forward_transform['cdelt1'].factor.value
+        for img in group:
+            wcslin_pscale = img.meta.wcs.forward_transform['cdelt1'].factor.value
+
+            inwht = build_driz_weight(img, wht_type=self.drizpars['wht_type'],
+                                good_bits=self.drizpars['good_bits'])
+            driz.add_image(img.data, img.meta.wcs, inwht=inwht,
+                    expin=img.meta.exposure.exposure_time,
+                    pscale_ratio=outwcs_pscale / wcslin_pscale)
+
+        return (output_model.data, output_model.wht, driz.outcon,
+                DrizzleParameters(driz.sciext, driz.conext, driz.whtext,
+                                  driz.fillval, driz.pixfrac, driz.kernel,
+                                  driz.out_units, driz.wt_scl))
+
+
+    def drizzle_tiled(self, group, tile_size, max_cores='none',
+                      backend='thread'):
+        """ Drizzle a group of input images onto the output, a tile at a time
+
+        The output frame is split into square tiles of `tile_size` pixels,
+        and each tile is drizzled onto its own small arrays from the images
+        whose footprint overlaps it, with the same image ids for the context
+        as when drizzling the whole output.  The output arrays are backed
+        by temporary files, so that only the tiles being drizzled are held
+        in memory; each tile is written to them as soon as it is done.  The
+        map of each image onto the output is computed once, and also kept
+        in a temporary file, and each tile uses it shifted to the tile.
+
+        Drizzle leaves out the input pixels whose centers fall outside of
+        its output, so each tile is drizzled with a margin of a few input
+        pixels around it, which is then cropped; the result is the same as
+        when drizzling the whole output.
+
+        Parameters
+        ----------
+        group : list of ImageModel
+            The input images.
+
+        tile_size : int
+            The size of the tiles, in output pixels.
+
+        max_cores : str or int
+            The fraction of the cores used to drizzle tiles in parallel:
+            'none', 'quarter', 'half', or 'all'; or the number of workers.
+
+        backend : str
+            'thread' or 'process'.
+
+        Returns
+        -------
+        outsci, outwht, outcon, driz : tuple
+            The output science, weight and (3D) context arrays, and the
+            drizzle parameters, as a `DrizzleParameters` tuple.
+        """
+        shape = tuple(self.output_wcs.data_size)
+        first_id = self.blank_output.meta.resample.pointings or 0
+        num_planes = (first_id + len(group) - 1) // 32 + 1
+        outsci = _temporary_array(shape, np.float32)
+        outwht = _temporary_array(shape, np.float32)
+        outcon = _temporary_array((num_planes,) + shape, np.int32)
+
+        boxes = [resample_utils.calc_bounding_box(img.meta.wcs, self.output_wcs)
+                 for img in group]
+        pixmaps = []
+        for img, box in zip(group, boxes):
+            pixmap = None
+            if box is not None:
+                full_pixmap = resample_utils.calc_gwcs_pixmap(img.meta.wcs,
+                                                              self.output_wcs)
+                pixmap = _temporary_array(full_pixmap.shape, full_pixmap.dtype)
+                pixmap[...] = full_pixmap
+                del full_pixmap
+            pixmaps.append(pixmap)
+        margin = int(np.ceil(3 * max([_pixel_size(pixmap) for pixmap in pixmaps
+                                      if pixmap is not None] or [1.]))) + 1
+
+        tiles = []
+        for ystart in range(0, shape[0], tile_size):
+            ystop = min(ystart + tile_size, shape[0])
+            for xstart in range(0, shape[1], tile_size):
+                xstop = min(xstart + tile_size, shape[1])
+                images = [(n, img, pixmap) for n, (img, box, pixmap)
+                          in enumerate(zip(group, boxes, pixmaps))
+                          if box is not None and box[0] < xstop and
+                          box[1] >= xstart and box[2] < ystop and box[3] >= ystart]
+                tiles.append((ystart, ystop, xstart, xstop, margin, images))
+        log.info('Drizzling %d tiles of %d x %d pixels', len(tiles),
+                 tile_size, tile_size)
+
+        num_workers = parallel.compute_num_workers(max_cores, len(tiles))
+        tile_results = parallel.ordered_map(self._drizzle_tile, tiles,
+                                            num_workers=num_workers,
+                                            backend=backend)
+        for (ystart, ystop, xstart, xstop, margin, images), result in zip(
+                tiles, tile_results):
+            tilesci, tilewht, tilecon, driz = result
+            outsci[ystart:ystop, xstart:xstop] = tilesci
+            outwht[ystart:ystop, xstart:xstop] = tilewht
+            outcon[:tilecon.shape[0], ystart:ystop, xstart:xstop] = tilecon
+        return outsci, outwht, outcon, driz
+
+    def _drizzle_tile(self, tile):
+        """ Drizzle the images overlapping a tile of the output onto the tile
+
+        The tile is a tuple of its first and last + 1 output rows and
+        columns, of the margin around it that is drizzled too, in output
+        pixels, and of a list of the images that overlap it, each with its
+        index among all of the images of the output and its map onto the
+        whole output.  Returns the tile's science, weight and (3D) context
+        arrays, and the drizzle parameters, as a `DrizzleParameters` tuple.
+        """
+        ystart, ystop, xstart, xstop, margin, images = tile
+        shape = self.output_wcs.data_size
+        # The area drizzled: the tile and its margin, within the output
+        ylower, yupper = max(ystart - margin, 0), min(ystop + margin, shape[0])
+        xlower, xupper = max(xstart - margin, 0), min(xstop + margin, shape[1])
+        area_shape = (yupper - ylower, xupper - xlower)
+        tile_model = datamodels.DrizProductModel(area_shape)
+        tile_model.update(self.blank_output)
+        tile_model.assign_wcs(resample_utils.make_tile_wcs(self.output_wcs,
+                              xlower, ylower, area_shape))
+
+        driz = gwcs_drizzle.GWCSDrizzle(tile_model,
+                            single=self.drizpars['single'],
+                            pixfrac=self.drizpars['pixfrac'],
+                            kernel=self.drizpars['kernel'],
+                            fillval=self.drizpars['fillval'])
+        first_id = driz.uniqid
+
+        outwcs_pscale = self.output_wcs.forward_transform['cdelt1'].factor.value
+        for n, img, pixmap in images:
+            wcslin_pscale = img.meta.wcs.forward_transform['cdelt1'].factor.value
+
+            # Number the images as when drizzling the whole output
+            _set_next_id(driz, first_id + n)
+            inwht = build_driz_weight(img, wht_type=self.drizpars['wht_type'],
+                                good_bits=self.drizpars['good_bits'])
+            driz.add_image(img.data, img.meta.wcs, inwht=inwht,
+                    expin=img.meta.exposure.exposure_time,
+                    pscale_ratio=outwcs_pscale / wcslin_pscale,
+                    pixmap=pixmap - np.array([xlower, ylower], dtype=pixmap.dtype))
+
+        if not images:
+            # drizzle fills the pixels with no input only when adding images
+            fillval = str(driz.fillval).strip()
+            if fillval and fillval.upper() != 'INDEF':
+                tile_model.data[...] = float(fillval)
+
+        tile_slice = (slice(ystart - ylower, ystop - ylower),
+                      slice(xstart - xlower, xstop - xlower))
+        return (tile_model.data[tile_slice], tile_model.wht[tile_slice],
+                driz.outcon[(slice(None),) + tile_slice],
+                DrizzleParameters(driz.sciext, driz.conext, driz.whtext,
+                                  driz.fillval, driz.pixfrac, driz.kernel,
+                                  driz.out_units, driz.wt_scl))
+
+
+def _set_next_id(driz, uniqid):
+    """ Give the next image added to a GWCSDrizzle the id `uniqid` + 1
+
+    GWCSDrizzle.increment_id only adds context planes one at a time, so
+    add any planes needed before that image's.
+    """
+    driz.uniqid = uniqid
+    missing_planes = uniqid // 32 - driz.outcon.shape[0]
+    if missing_planes > 0:
+        driz.outcon = np.concatenate([driz.outcon,
+            np.zeros((missing_planes,) + driz.outcon.shape[1:],
+                     dtype=driz.outcon.dtype)])
+
+
+def _pixel_size(pixmap):
+    """ Return the typical size of an input pixel in the output frame
+
+    The size is the median distance between neighboring pixels of the
+    middle row of the pixel map.
+    """
+    row = pixmap[pixmap.shape[0] // 2]
+    steps = np.hypot(*np.diff(row, axis=0).T)
+    steps = steps[np.isfinite(steps)]
+    if not len(steps):
+        return 1.
+    return float(np.median(steps))
+
+
+def _temporary_array(shape, dtype):
+    """ Return an array of zeros backed by an anonymous temporary file
+    """
+    return np.memmap(tempfile.TemporaryFile(), dtype=dtype, mode='w+',
+                     shape=shape)
+
+
+# The parameters of a drizzled output, returned by the workers
+DrizzleParameters = namedtuple('DrizzleParameters',
+                               ['sciext', 'conext', 'whtext', 'fillval',
+                                'pixfrac', 'kernel', 'out_units', 'wt_scl'])
+
+
+def combine_drizzled(results):
+    """ Combine outputs drizzled from disjoint sets of images onto one frame
+
+    The combined science array is the weighted mean of the science arrays,
+    the weight is their sum, and the context is the union of the contexts,
+    as if all of the images had been drizzled onto the same output.
+
+    Parameters
+    ----------
+    results : iterable
+        Tuples of the science, weight and 3D context arrays, and the
+        drizzle parameters, of each output.
+
+    Returns
+    -------
+    outsci, outwht, outcon, driz : tuple
+        The combined arrays, and the drizzle parameters of the first output.
+        Where no image contributed, the science array is that of the first
+        output (either its initial or its fill value).
+    """
+    results = iter(results)
+    outsci, outwht, outcon, driz = next(results)
+    for sci, wht, con, _ in results:
+        total_wht = outwht.astype(np.float64) + wht
+        # Pixels without weight hold the fill value, which may be NaN, so
+        # leave them out of the sum rather than multiplying them by zero
+        weighted = (np.where(outwht > 0, outsci * outwht.astype(np.float64), 0.) +
+                    np.where(wht > 0, sci * wht.astype(np.float64), 0.))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            combined = weighted / total_wht
+        outsci = np.where(total_wht > 0, combined, outsci).astype(outsci.dtype)
+        outwht = total_wht.astype(outwht.dtype)
+
+        if con.shape[0] > outcon.shape[0]:
+            outcon, con = con, outcon
+        outcon[:con.shape[0]] |= con
+    return outsci, outwht, outcon, driz
+
+
 def _buildMask(dqarr, bitvalue):
     """ Builds a bit-mask from an input DQ array and a bitvalue flag"""
 
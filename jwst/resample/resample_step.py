@@ -26,6 +26,9 @@ class ResampleStep(Step):
         kernel = string(default='square')
         fillval = string(default='INDEF')
         good_bits = integer(default=-1)
+        tile_size = integer(default=0) # size in pixels of the output tiles drizzled at a time, bounding memory use; 0 for the whole output
+        maximum_cores = option('none', 'quarter', 'half', 'all', default='none') # max number of workers drizzling images
+        parallel_backend = option('thread', 'process', default='thread') # kind of workers drizzling images
     """
     reference_file_types = ['drizpars']
 
@@ -55,8 +58,10 @@ class ResampleStep(Step):
         self.step = resample.ResampleData(self.input_models, self.ref_filename,
                                 single=self.single, wht_type=self.wht_type,
                                 pixfrac=self.pixfrac, kernel=self.kernel,
-                                fillval=self.fillval, good_bits=self.good_bits)
-        self.step.do_drizzle()
+                                fillval=self.fillval, good_bits=self.good_bits,
+                                tile_size=self.tile_size)
+        self.step.do_drizzle(maximum_cores=self.maximum_cores,
+                             parallel_backend=self.parallel_backend)
 
         #self.input_models.close()
 
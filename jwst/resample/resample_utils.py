@@ -1,6 +1,7 @@
 from __future__ import (division, print_function, unicode_literals, 
     absolute_import)
 
+import hashlib
 import logging
 import numpy as np
 import numpy.ma as ma
@@ -14,6 +15,8 @@ from gwcs import WCS, utils, wcstools
 
 
 from .. import assign_wcs
+from ..assign_wcs.util import wcs_fingerprint, _domain_bounds
+from .pixmap_cache import pixmap_cache
 
 log = logging.getLogger(__name__)
 log.setLevel(logging.DEBUG)
@@ -91,17 +94,210 @@ def build_size_from_spec_domain(domain):
         size.append(int(delta + 0.5))
     return tuple(size)
 
-def calc_gwcs_pixmap(in_wcs, out_wcs):
+def make_tile_wcs(output_wcs, xstart, ystart, shape):
+    """ Return the WCS of a rectangular tile of an output frame.
+
+    Parameters
+    ----------
+    output_wcs : gwcs.WCS
+        The WCS of the whole output frame.
+
+    xstart, ystart : int
+        The output pixel of the first pixel of the tile.
+
+    shape : tuple
+        The (ny, nx) shape of the tile.
+
+    Returns
+    -------
+    tile_wcs : gwcs.WCS
+        A WCS whose pixel (0, 0) is output pixel (xstart, ystart), with a
+        domain covering the tile.
+    """
+    transform = (Shift(xstart) & Shift(ystart)) | output_wcs.forward_transform
+    tile_wcs = WCS(output_frame=output_wcs.output_frame,
+                   input_frame=output_wcs.input_frame,
+                   forward_transform=transform)
+    tile_wcs.domain = create_domain(tile_wcs, shape)
+    return tile_wcs
+
+
+def calc_bounding_box(in_wcs, out_wcs, margin=3):
+    """ Return the bounding box of an input frame in an output frame.
+
+    The edges of the input domain are mapped to the output frame; for a
+    continuous mapping, the whole input frame falls within their bounding
+    box.
+
+    Parameters
+    ----------
+    in_wcs : gwcs.WCS
+        The WCS of the input frame, with a domain.
+
+    out_wcs : gwcs.WCS
+        The WCS of the output frame.
+
+    margin : float
+        The margin added around the box, in input pixels, to allow for the
+        size of the input pixels and of the drizzle kernel.
+
+    Returns
+    -------
+    bounding_box : tuple or None
+        (xmin, xmax, ymin, ymax) in output pixels, or None if no edge pixel
+        of the input maps onto the output frame.
+    """
+    (xlower, xupper), (ylower, yupper) = _domain_bounds(in_wcs)[:2]
+    x = np.arange(xlower, xupper)
+    y = np.arange(ylower, yupper)
+    xfirst, xlast = np.full_like(y, x[0]), np.full_like(y, x[-1])
+    yfirst, ylast = np.full_like(x, y[0]), np.full_like(x, y[-1])
+    # the edges, in order around the frame
+    edge_x = np.concatenate([x, xlast, x[::-1], xfirst])
+    edge_y = np.concatenate([yfirst, y, ylast, y[::-1]])
+
+    out_x, out_y = reproject(in_wcs, out_wcs)(edge_x, edge_y)[:2]
+    good = np.isfinite(out_x) & np.isfinite(out_y)
+    if not good.any():
+        return None
+    out_x, out_y = out_x[good], out_y[good]
+
+    # the typical size of an input pixel in the output frame
+    if len(out_x) > 1:
+        pixel_size = np.median(np.hypot(np.diff(out_x), np.diff(out_y)))
+    else:
+        pixel_size = 1.
+    pad = margin * pixel_size + 1
+    return (out_x.min() - pad, out_x.max() + pad,
+            out_y.min() - pad, out_y.max() + pad)
+
+
+def calc_gwcs_pixmap(in_wcs, out_wcs, grid_step=None, tolerance=None):
     """ Return a pixel grid map from input frame to output frame.
+
+    The map is looked up in, and added to, `pixmap_cache.pixmap_cache`
+    when the cache is enabled; maps from the cache are read-only.
+
+    Parameters
+    ----------
+    in_wcs : gwcs.WCS
+        The WCS of the input frame, with a domain.
+
+    out_wcs : gwcs.WCS or astropy.wcs.WCS
+        The WCS of the output frame.
+
+    grid_step : int or None
+        If given, evaluate the transforms only every `grid_step` input
+        pixels along each axis (and at the last row and column), and
+        interpolate between them with bicubic splines.  The default is
+        the `grid_step` of the pixel map cache, None unless configured.
+
+    tolerance : float or None
+        The maximum interpolation error, in output pixels, allowed with a
+        coarse grid.  The error is measured at the centers of the coarse
+        grid cells, where it is largest for a smooth map; if it exceeds
+        the tolerance, or the map is not defined at every grid point, the
+        map is computed at every pixel instead.  The default is the
+        `tolerance` of the pixel map cache, 0.01 unless configured.
+
+    Returns
+    -------
+    pixmap : ndarray
+        The output x and y of each input pixel, with shape (ny, nx, 2).
     """
+    if grid_step is None:
+        grid_step = pixmap_cache.grid_step
+    if tolerance is None:
+        tolerance = pixmap_cache.tolerance
+
+    key = None
+    if pixmap_cache.enabled:
+        key = pixmap_key(in_wcs, out_wcs, grid_step, tolerance)
+        if key is None:
+            log.debug("Cannot identify the WCS; the pixel map is not cached")
+    if key is not None:
+        pixmap = pixmap_cache.get(key)
+        if pixmap is not None:
+            return pixmap
+
     # TODO: Is the following 1-indexed or 0-indexed?  Check.
     grid = wcstools.grid_from_domain(in_wcs.domain)
-
-    # pixmap_tuple = reproject(in_wcs, out_wcs)(grid[1], grid[0])
-    pixmap_tuple = reproject(in_wcs, out_wcs)(grid[0], grid[1])
-    pixmap = np.dstack(pixmap_tuple)
+    transform = reproject(in_wcs, out_wcs)
+
+    pixmap = None
+    if grid_step:
+        pixmap = _interpolate_pixmap(transform, grid[0][0], grid[1][:, 0],
+                                     grid_step, tolerance)
+    if pixmap is None:
+        # pixmap_tuple = reproject(in_wcs, out_wcs)(grid[1], grid[0])
+        pixmap_tuple = transform(grid[0], grid[1])
+        pixmap = np.dstack(pixmap_tuple)
+
+    if key is not None:
+        pixmap = pixmap_cache.put(key, pixmap)
     return pixmap
 
+
+def _interpolate_pixmap(transform, x, y, grid_step, tolerance):
+    """ Compute a pixel map by interpolating a coarse grid.
+
+    Returns None if the interpolation error exceeds `tolerance`, or if the
+    map cannot be interpolated, which includes the map not being defined
+    at every grid point or cell center that is checked.
+    """
+    nx, ny = len(x), len(y)
+    if nx < 2 * grid_step or ny < 2 * grid_step:
+        return None
+    ix = np.unique(np.r_[np.arange(0, nx, grid_step), nx - 1])
+    iy = np.unique(np.r_[np.arange(0, ny, grid_step), ny - 1])
+    xg, yg = x[ix], y[iy]
+    coarse = transform(*np.meshgrid(xg, yg))
+    if not all(np.isfinite(axis).all() for axis in coarse):
+        log.debug("Pixel map undefined on coarse grid; computing every pixel")
+        return None
+    splines = [interpolate.RectBivariateSpline(yg, xg, axis)
+               for axis in coarse]
+
+    # Check the error at (up to 50 x 50 of) the centers of the grid cells
+    xc = 0.5 * (xg[:-1] + xg[1:])
+    yc = 0.5 * (yg[:-1] + yg[1:])
+    xc = xc[np.unique(np.linspace(0, len(xc) - 1, 50).astype(int))]
+    yc = yc[np.unique(np.linspace(0, len(yc) - 1, 50).astype(int))]
+    exact = transform(*np.meshgrid(xc, yc))
+    if not all(np.isfinite(axis).all() for axis in exact):
+        log.debug("Pixel map undefined between coarse grid points; "
+                  "computing every pixel")
+        return None
+    error = max(np.max(np.abs(spline(yc, xc) - axis))
+                for spline, axis in zip(splines, exact))
+    if not error <= tolerance:
+        log.debug("Pixel map interpolation error %g exceeds %g; "
+                  "computing every pixel", error, tolerance)
+        return None
+    log.debug("Pixel map interpolated with error %g", error)
+
+    return np.dstack([spline(y, x) for spline in splines])
+
+
+def pixmap_key(in_wcs, out_wcs, grid_step=None, tolerance=None):
+    """ Return a key identifying the pixel map between two WCS.
+
+    The key combines the fingerprints of the two WCS with the domain of
+    the input WCS and, for maps interpolated from a coarse grid, the grid
+    step and tolerance.  It is None if either WCS cannot be identified.
+    """
+    fingerprints = [wcs_fingerprint(in_wcs), wcs_fingerprint(out_wcs)]
+    if None in fingerprints:
+        return None
+    key = hashlib.sha1()
+    for fingerprint in fingerprints:
+        key.update(fingerprint.encode('ascii'))
+    key.update(repr(_domain_bounds(in_wcs)).encode('ascii'))
+    if grid_step:
+        key.update(repr((grid_step, tolerance)).encode('ascii'))
+    return key.hexdigest()
+
+
 def reproject(wcs1, wcs2):
     """
     Given two WCSs return a function which takes pixel coordinates in
@@ -0,0 +1,85 @@
+from __future__ import absolute_import, division, print_function
+
+import os
+
+import numpy as np
+from numpy.testing import assert_array_equal
+import pytest
+
+from ..pixmap_cache import PixmapCache
+
+
+def _pixmap(value, shape=(10, 10)):
+    return np.full(shape + (2,), value, dtype=np.float64)
+
+
+def test_pixmap_cache():
+    cache = PixmapCache(max_pixmaps=2)
+    assert cache.enabled
+    assert cache.get('a') is None
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    pixmap = cache.put('a', _pixmap(1.))
+    with pytest.raises(ValueError):
+        pixmap[0, 0, 0] = 0.
+    assert cache.get('a') is pixmap
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_pixmap_cache_limits():
+    cache = PixmapCache(max_pixmaps=2)
+    cache.put('a', _pixmap(1.))
+    cache.put('b', _pixmap(2.))
+    cache.get('a')
+    cache.put('c', _pixmap(3.))
+
+    # The least recently used map is evicted first
+    assert len(cache) == 2
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+
+    cache.configure(max_memory=cache.nbytes / 2. / 1024.**2)
+    assert len(cache) == 1
+    assert cache.get('a') is not None
+    assert cache.get('c') is None
+
+    # Removing the memory limit leaves the number of maps limited
+    cache.configure(max_memory=None)
+    assert cache.max_memory is None
+    cache.put('b', _pixmap(2.))
+    cache.put('c', _pixmap(3.))
+    assert len(cache) == 2
+
+    # A disabled cache keeps nothing
+    cache = PixmapCache()
+    assert not cache.enabled
+    cache.put('a', _pixmap(1.))
+    assert len(cache) == 0
+    assert cache.get('a') is None
+
+
+def test_pixmap_cache_directory(tmpdir):
+    directory = str(tmpdir)
+    cache = PixmapCache(directory=directory)
+    assert cache.enabled
+    cache.put('a', _pixmap(1.))
+    assert os.listdir(directory) == ['a.npy']
+    assert len(cache) == 0
+
+    # Another cache, as in a later process, reads the file
+    cache = PixmapCache(max_pixmaps=1, directory=directory)
+    pixmap = cache.get('a')
+    assert_array_equal(pixmap, _pixmap(1.))
+    assert not pixmap.flags.writeable
+    assert (cache.hits, cache.misses) == (1, 0)
+    assert cache.get('a') is pixmap
+
+    # An unreadable file is a miss
+    with open(os.path.join(directory, 'b.npy'), 'w') as fd:
+        fd.write('not a map')
+    assert cache.get('b') is None
+    assert (cache.hits, cache.misses) == (2, 1)
+
+    cache.configure(directory='')
+    assert cache.directory is None
+    assert cache.get('a') is pixmap
@@ -0,0 +1,120 @@
+from __future__ import absolute_import, division, print_function
+
+import numpy as np
+from numpy.testing import assert_allclose, assert_array_equal
+import pytest
+from astropy.modeling.models import Scale, Shift
+from gwcs import wcs
+
+from ... import datamodels
+from .. import gwcs_drizzle
+from .. import resample
+from .. import resample_utils
+
+OUTPUT_SHAPE = (30, 40)
+INPUT_SHAPE = (12, 16)
+
+
+def _make_wcs(xshift, yshift, shape):
+    """
+    A WCS of a frame of the given shape, offset from the output frame by
+    (xshift, yshift) pixels.
+    """
+    transform = ((Shift(xshift) & Shift(yshift)) |
+                 (Scale(1., name='cdelt1') & Scale(1., name='cdelt2')))
+    frame_wcs = wcs.WCS(forward_transform=transform, output_frame='world')
+    frame_wcs.domain = resample_utils.create_domain(frame_wcs, shape)
+    return frame_wcs
+
+
+@pytest.fixture(scope='module')
+def images():
+    """
+    40 images, more than the bits of a context plane, scattered over the
+    output frame and leaving parts of it uncovered.
+    """
+    rng = np.random.RandomState(1)
+    images = []
+    for n in range(40):
+        xshift = rng.uniform(0., OUTPUT_SHAPE[1] - INPUT_SHAPE[1] - 8.)
+        yshift = rng.uniform(0., OUTPUT_SHAPE[0] - INPUT_SHAPE[0])
+        image = datamodels.ImageModel(
+            data=rng.uniform(1., 10., size=INPUT_SHAPE).astype(np.float32),
+            dq=np.zeros(INPUT_SHAPE, dtype=np.uint32))
+        image.meta.wcs = _make_wcs(xshift, yshift, INPUT_SHAPE)
+        image.meta.exposure.exposure_time = rng.uniform(10., 100.)
+        images.append(image)
+    return images
+
+
+def _drizzle(images, first, fillval):
+    """
+    Drizzle images onto a new output, numbering them from first + 1.
+    """
+    product = datamodels.DrizProductModel(OUTPUT_SHAPE)
+    product.assign_wcs(_make_wcs(0., 0., OUTPUT_SHAPE))
+    driz = gwcs_drizzle.GWCSDrizzle(product, fillval=fillval)
+    resample._set_next_id(driz, first)
+    for image in images:
+        inwht = resample.build_driz_weight(image, wht_type='exptime')
+        driz.add_image(image.data, image.meta.wcs, inwht=inwht)
+    return product.data, product.wht, driz.outcon, driz
+
+
+@pytest.mark.parametrize('fillval', ['INDEF', '0', 'NaN'])
+@pytest.mark.parametrize('subsets', [
+    [(0, 3), (3, 4), (4, 7)],
+    # More images than bits in a context plane, with a subset that
+    # straddles the first two planes and one that starts the second
+    [(0, 20), (20, 33), (33, 40)]])
+def test_combine_drizzled(images, fillval, subsets):
+    """Combining images drizzled in subsets gives the drizzle of them all"""
+    images = images[:subsets[-1][1]]
+    outsci, outwht, outcon, driz = _drizzle(images, 0, fillval)
+    assert (outwht == 0).any()
+    assert outcon.shape[0] == (len(images) + 31) // 32
+
+    sci, wht, con, _ = resample.combine_drizzled(
+        _drizzle(images[first:last], first, fillval)
+        for first, last in subsets)
+
+    assert_allclose(sci, outsci, rtol=1e-5)
+    assert_allclose(wht, outwht, rtol=1e-5)
+    assert_array_equal(con, outcon)
+
+
+def _make_resample_data(fillval):
+    """
+    A ResampleData with only the attributes that are used to drizzle.
+    """
+    resample_data = resample.ResampleData.__new__(resample.ResampleData)
+    resample_data.output_wcs = _make_wcs(0., 0., OUTPUT_SHAPE)
+    resample_data.output_wcs.data_size = OUTPUT_SHAPE
+    resample_data.blank_output = datamodels.DrizProductModel(OUTPUT_SHAPE)
+    resample_data.blank_output.assign_wcs(resample_data.output_wcs)
+    resample_data.drizpars = dict(resample.ResampleData.drizpars,
+                                  fillval=fillval)
+    return resample_data
+
+
+@pytest.mark.parametrize('fillval', ['INDEF', 'NaN'])
+@pytest.mark.parametrize('max_cores, backend', [
+    ('none', 'thread'),
+    (3, 'thread'),
+    (2, 'process'),
+])
+def test_drizzle_tiled(images, fillval, max_cores, backend):
+    """Drizzling a tile at a time gives the drizzle of the whole output"""
+    resample_data = _make_resample_data(fillval)
+
+    outsci, outwht, outcon, driz = resample_data._drizzle_subset(
+        (0, 0, images))
+    assert outcon.shape[0] == 2 and outcon[1].any()
+
+    # Tiles that do not divide the output, some of them without images
+    sci, wht, con, _ = resample_data.drizzle_tiled(images, 7, max_cores,
+                                                   backend)
+
+    assert_allclose(sci, outsci, rtol=1e-6)
+    assert_allclose(wht, outwht, rtol=1e-6)
+    assert_array_equal(con, outcon)
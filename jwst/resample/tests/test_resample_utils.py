@@ -0,0 +1,56 @@
+from __future__ import absolute_import, division, print_function
+
+import numpy as np
+from numpy.testing import assert_allclose
+
+from .. import resample_utils
+
+
+def _smooth_transform(x, y):
+    return (1.02 * x + 0.01 * y + 1e-5 * x * y + 3.,
+            0.99 * y - 0.02 * x + 2e-5 * x ** 2 - 5.)
+
+
+def _wavy_transform(x, y):
+    return x + 0.5 * np.sin(x / 1.5), y + 0.5 * np.sin(y / 1.5)
+
+
+def test_interpolate_pixmap():
+    x = np.arange(100.)
+    y = np.arange(80.)
+    pixmap = resample_utils._interpolate_pixmap(_smooth_transform, x, y,
+                                                10, 0.01)
+    exact = np.dstack(_smooth_transform(*np.meshgrid(x, y)))
+    assert pixmap.shape == (80, 100, 2)
+    assert_allclose(pixmap, exact, atol=0.01)
+
+
+def test_interpolate_pixmap_fallback():
+    x = np.arange(100.)
+    y = np.arange(80.)
+
+    # Too large an interpolation error
+    assert resample_utils._interpolate_pixmap(_wavy_transform, x, y,
+                                              10, 0.01) is None
+
+    # Too few pixels for the grid step
+    assert resample_utils._interpolate_pixmap(_smooth_transform, x[:15], y,
+                                              10, 0.01) is None
+
+    # Map undefined on the coarse grid
+    def partial_transform(x, y):
+        xout, yout = _smooth_transform(x, y)
+        return np.where(x > 50., np.nan, xout), yout
+
+    assert resample_utils._interpolate_pixmap(partial_transform, x, y,
+                                              10, 0.01) is None
+
+    # Map undefined only between the coarse grid points, in a hole around
+    # the center of one of the grid cells
+    def holed_transform(x, y):
+        xout, yout = _smooth_transform(x, y)
+        hole = (np.abs(x - 55.) < 3.) & (np.abs(y - 45.) < 3.)
+        return np.where(hole, np.nan, xout), yout
+
+    assert resample_utils._interpolate_pixmap(holed_transform, x, y,
+                                              10, 0.01) is None
@@ -12,7 +12,7 @@ log.setLevel(logging.DEBUG)
 
 HUGE_NUM = 100000.
 
-def do_correction(input_model, ref_model):
+def do_correction(input_model, ref_model, in_place=False):
     """
     Short Summary
     -------------
@@ -27,6 +27,9 @@ def do_correction(input_model, ref_model):
     ref_model: data model object
         Saturation reference file mode object
 
+    in_place: bool
+        if True, correct the input model itself rather than a copy of it
+
     Returns
     -------
     output_model: data model object
@@ -39,25 +42,16 @@ def do_correction(input_model, ref_model):
     if is_irs2_format:
         irs2_mask = x_irs2.make_mask(input_model)
 
-   # Create the output model as a copy of the input
-    output_model = input_model.copy()
+    # Create the output model as a copy of the input, unless the
+    # correction is to be done in place
+    if in_place:
+        output_model = input_model
+    else:
+        output_model = input_model.copy()
     groupdq = output_model.groupdq
 
-    # Check for subarray mode
-    if ref_matches_sci(ref_model, input_model):
-        satmask = ref_model.data
-        dqmask = ref_model.dq
-    else:
-        satmask = get_subarray(ref_model.data, input_model)
-        dqmask = get_subarray(ref_model.dq, input_model)
-
-    # For pixels flagged in reference file as NO_SAT_CHECK, set the dq mask
-    #   and saturation mask
-    wh_sat = np.bitwise_and(dqmask, dqflags.pixel['NO_SAT_CHECK'])
-    dqmask[wh_sat == dqflags.pixel['NO_SAT_CHECK']] = dqflags.pixel['NO_SAT_CHECK']
-    satmask[wh_sat == dqflags.pixel['NO_SAT_CHECK']] = HUGE_NUM
-    # Correct saturation values for NaNs in the ref file
-    correct_for_NaN(satmask, dqmask)
+    # Get the saturation thresholds and DQ flags for the science data
+    satmask, dqmask = get_sat_thresholds(input_model, ref_model)
 
     dq_flag = dqflags.group['SATURATED']
 
@@ -94,6 +88,52 @@ def do_correction(input_model, ref_model):
     return output_model
 
 
+def get_sat_thresholds(input_model, ref_model):
+    """
+    Short Summary
+    -------------
+    Get the saturation thresholds and the DQ flags from the saturation
+    reference file, extracting the subarray that matches the science data
+    if necessary. The thresholds of pixels flagged as NO_SAT_CHECK, or that
+    are NaN, are reset so that the pixels are never flagged as saturated.
+
+    Parameters
+    ----------
+    input_model: data model object
+        The input science data
+
+    ref_model: data model object
+        Saturation reference file model object
+
+    Returns
+    -------
+    satmask: 2-d array
+        Saturation thresholds; this is a copy of the reference file data.
+
+    dqmask: ndarray, same shape as `satmask`
+        DQ flags to be propagated into the PIXELDQ array of the output
+    """
+
+    # Check for subarray mode; the thresholds and flags are copied, so
+    # that the reference file data are not modified
+    if ref_matches_sci(ref_model, input_model):
+        satmask = ref_model.data.copy()
+        dqmask = ref_model.dq.copy()
+    else:
+        satmask = get_subarray(ref_model.data, input_model).copy()
+        dqmask = get_subarray(ref_model.dq, input_model).copy()
+
+    # For pixels flagged in reference file as NO_SAT_CHECK, set the dq mask
+    #   and saturation mask
+    wh_sat = np.bitwise_and(dqmask, dqflags.pixel['NO_SAT_CHECK'])
+    dqmask[wh_sat == dqflags.pixel['NO_SAT_CHECK']] = dqflags.pixel['NO_SAT_CHECK']
+    satmask[wh_sat == dqflags.pixel['NO_SAT_CHECK']] = HUGE_NUM
+    # Correct saturation values for NaNs in the ref file
+    correct_for_NaN(satmask, dqmask)
+
+    return satmask, dqmask
+
+
 def correct_for_NaN(satmask, dqmask):
     """
     Short Summary
@@ -14,7 +14,7 @@ class SaturationStep(Step):
     def process(self, input):
 
         # Open the input data model
-        with datamodels.open(input) as input_model:
+        with self.open_model(input) as input_model:
 
             # Get the name of the saturation reference file
             self.ref_name = self.get_reference_file(input_model, 'saturation')
@@ -29,10 +29,12 @@ class SaturationStep(Step):
                 return result
 
             # Open the reference file data model
-            ref_model = datamodels.SaturationModel(self.ref_name)
+            ref_model = self.open_reference_model(self.ref_name,
+                                                  datamodels.SaturationModel)
 
             # Do the saturation check
-            sat = saturation.do_correction(input_model, ref_model)
+            sat = saturation.do_correction(input_model, ref_model,
+                                           self.in_place)
 
             # Close the reference file and update the step status
             ref_model.close()
@@ -17,6 +17,10 @@ Polygon filling algorithm.
 # vertices. Finally, modified the algorithm to fill the right-most pixels
 # as well as top-most row of the polygon.
 #
+# Polygon.scan now computes the intersections of all of the scan lines with
+# all of the edges at once with numpy, rather than maintaining an active
+# edge table in Python, with the same results.
+#
 # NOTE: Algorithm description can be found, e.g., here:
 #    http://www.cs.rit.edu/~icss571/filling/how_to.html
 #    http://www.cs.uic.edu/~jbell/CourseNotes/ComputerGraphics/PolygonFilling.html
@@ -25,7 +29,7 @@ from __future__ import division
 from collections import OrderedDict
 import numpy as np
 
-__all__ = ['Region', 'Edge', 'Polygon']
+__all__ = ['Region', 'Edge', 'Polygon', 'fill_spans']
 __taskname__ = 'region'
 __version__ = '0.2'
 __vdate__ = '30-05-2014'
@@ -132,8 +136,16 @@ class Polygon(Region):
         self._bbox = self._get_bounding_box()
         self._scan_line_range = \
                 list(range(self._bbox[1], self._bbox[3] + self._bbox[1] + 1))
-        #constructs a Global Edge Table (GET) in bbox coordinates
-        self._GET = self._construct_ordered_GET()
+        self._GET_table = None
+        self._spans = None
+
+    @property
+    def _GET(self):
+        # The Global Edge Table (GET) in bbox coordinates, constructed on
+        # first use; scan does not need it
+        if self._GET_table is None:
+            self._GET_table = self._construct_ordered_GET()
+        return self._GET_table
 
     def _get_bounding_box(self):
         x = self._vertices[:, 0].min()
@@ -194,57 +206,67 @@ class Polygon(Region):
             the region's ID
 
         Algorithm:
-        - Set the Global Edge Table (GET)
-        - Set y to be the smallest y coordinate that has an entry in GET
-        - Initialize the Active Edge Table (AET) to be empty
-        - For each scan line:
-          1. Add edges from GET to AET for which ymin==y
-          2. Remove edges from AET fro which ymax==y
-          3. Compute the intersection of the current scan line with all edges in the AET
-          4. Sort on X of intersection point
-          5. Set elements between pairs of X in the AET to the Edge's ID
+        - Find the scan lines crossed by each edge that is not horizontal.
+          An edge is active from the scan line of its lower end up to,
+          but not including, that of its upper end, except that edges
+          ending on the top scan line of the polygon are also active on it.
+        - Compute the intersections of all of the edges with all of their
+          scan lines at once
+        - Sort the intersections by scan line and X
+        - Set elements between pairs of X on each scan line to the
+          polygon's ID
 
         """
-        ##TODO: 1.This algorithm does not mark pixels in the top row and left most column.
-        ## Pad the initial pixel description on top and left with 1 px to prevent this.
-        ## 2. Currently it uses intersection of the scan line with edges. If this is
-        ## too slow it should use the 1/m increment (replace 3 above) (or the increment
-        ## should be removed from the GET entry).
-
-        # see comments in the __init__ function for the reason of introducing
-        # polygon shifts (self._shiftx & self._shifty). Here we need to shift
-        # it back.
-
-        (ny, nx) = data.shape
-
-        y = np.min(list(self._GET.keys()))
-
-        AET = []
-        scline = self._scan_line_range[-1]
-
-        while y <= scline:
-
-            if y < scline:
-                AET = self.update_AET(y, AET)
-
-            scan_line = Edge('scan_line', start=[self._bbox[0], y],
-                             stop=[self._bbox[0] + self._bbox[2], y])
-            x = [np.ceil(e.compute_AET_entry(scan_line)[1]) for e in AET if e is not None]
-            xnew = np.sort(x)
-            ysh = y + self._shifty
-
-            if ysh < 0 or ysh >= ny:
-                y += 1
-                continue
-
-            for i, j in zip(xnew[::2], xnew[1::2]):
-                xstart = max(0, i + self._shiftx)
-                xend = min(j + self._shiftx, nx - 1)
-                data[ysh][xstart:xend + 1] = self._rid
+        fill_spans(data, self.spans(), self._rid)
+        return data
 
-            y += 1
+    def spans(self):
+        """
+        Return the pixels within the polygon as spans of pixels in rows.
 
-        return data
+        Returns
+        -------
+        rows, xstart, xend : ndarray
+            the row of each span, and its first and last columns; spans
+            may extend beyond the edges of any particular array
+        """
+        if self._spans is None:
+            self._spans = self._scan_spans()
+        return self._spans
+
+    def _scan_spans(self):
+        start = self._vertices[:-1]
+        stop = self._vertices[1:]
+        keep = start[:, 1] != stop[:, 1]
+        start, stop = start[keep], stop[keep]
+        ymin = np.minimum(start[:, 1], stop[:, 1])
+        ymax = np.maximum(start[:, 1], stop[:, 1])
+
+        # The scan lines crossed by each edge
+        top = self._bbox[1] + self._bbox[3]
+        nlines = ymax - ymin + (ymax == top)
+        edge = np.repeat(np.arange(len(start)), nlines)
+        first = np.cumsum(nlines) - nlines
+        y = ymin[edge] + np.arange(edge.size) - first[edge]
+
+        # Intersection with the scan line, computed as Edge.intersection
+        # computes it
+        x0, y0 = start[edge, 0], start[edge, 1]
+        dx = (stop[:, 0] - start[:, 0])[edge]
+        dy = (stop[:, 1] - start[:, 1])[edge]
+        x = np.ceil((y - y0) / dy * dx + x0).astype(np.int64)
+
+        # Pair consecutive intersections on each scan line
+        order = np.lexsort((x, y))
+        x, y = x[order], y[order]
+        line_start = np.r_[0, np.flatnonzero(np.diff(y)) + 1]
+        rank = np.arange(y.size) - np.repeat(line_start,
+                                             np.diff(np.r_[line_start, y.size]))
+        left = np.flatnonzero((rank % 2 == 0) & (np.arange(y.size) + 1 < y.size))
+        left = left[y[left] == y[np.minimum(left + 1, y.size - 1)]]
+
+        return (y[left] + self._shifty, x[left] + self._shiftx,
+                x[left + 1] + self._shiftx)
 
     def update_AET(self, y, AET):
         """
@@ -276,6 +298,41 @@ class Polygon(Region):
         return px[0] >= self._bbox[0] and px[0] <= self._bbox[0] + self._bbox[2] and \
                px[1] >= self._bbox[1] and px[1] <= self._bbox[1] + self._bbox[3]
 
+def fill_spans(data, spans, value):
+    """
+    Set the pixels of an array within spans of pixels to a value.
+
+    Parameters
+    ----------
+    data : ndarray
+        2D array to set pixels of.
+
+    spans : tuple of ndarray
+        The row, first column and last column of each span, as returned
+        by `Polygon.spans`; the parts of the spans outside of the array are
+        ignored.
+
+    value : scalar
+        The value to set the pixels to.
+    """
+    (ny, nx) = data.shape
+    rows, xstart, xend = spans
+    xstart = np.maximum(xstart, 0)
+    xend = np.minimum(xend, nx - 1)
+    keep = (rows >= 0) & (rows < ny) & (xstart <= xend)
+    if not keep.any():
+        return
+    rows, xstart, xend = rows[keep], xstart[keep], xend[keep]
+
+    # Count the spans covering each pixel of the rows spanned
+    row0 = rows.min()
+    counts = np.zeros((rows.max() - row0 + 1, nx + 1), dtype=np.int32)
+    np.add.at(counts, (rows - row0, xstart), 1)
+    np.add.at(counts, (rows - row0, xend + 1), -1)
+    inside = np.cumsum(counts[:, :nx], axis=1) > 0
+    data[row0:row0 + inside.shape[0]][inside] = value
+
+
 class Edge(object):
     """
     Edge representation
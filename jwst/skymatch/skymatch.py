@@ -18,6 +18,7 @@ from datetime import datetime
 import numpy as np
 
 # LOCAL
+from ..lib import parallel
 from . skystatistics import SkyStats
 from . skyimage import *
 
@@ -36,7 +37,8 @@ log = logging.getLogger(__name__)
 log.setLevel(logging.DEBUG)
 
 
-def match(images, skymethod='global+match', match_down=True, subtract=False):
+def match(images, skymethod='global+match', match_down=True, subtract=False,
+          maximum_cores='none', parallel_backend='thread'):
     """
     A function to compute and/or "equalize" sky background in input images.
 
@@ -104,6 +106,16 @@ stsci_python_sphinxdocs_2.13/drizzlepac/astrodrizzle.html>`_ because it
     subtract : bool (Default = False)
         Subtract computed sky value from image data.
 
+    maximum_cores : {'none', 'quarter', 'half', 'all'} or int (Default = 'none')
+        Fraction of the available cores used to compute the sky in the
+        overlaps of pairs of images in parallel; 'none' computes them
+        serially.  An integer is the number of workers itself.
+
+    parallel_backend : {'thread', 'process'} (Default = 'thread')
+        Whether the pairs of images are processed by worker threads or
+        processes.  Most of the work holds the GIL, so 'process' scales
+        better.
+
 
     Raises
     ------
@@ -320,7 +332,9 @@ stsci_python_sphinxdocs_2.13/drizzlepac/astrodrizzle.html>`_\ .
                  "overlapping regions.")
 
         # find "optimum" sky changes:
-        sky_deltas = _find_optimum_sky_deltas(images, apply_sky=not subtract)
+        sky_deltas = _find_optimum_sky_deltas(images, apply_sky=not subtract,
+                                              maximum_cores=maximum_cores,
+                                              parallel_backend=parallel_backend)
         sky_good = np.isfinite(sky_deltas)
 
         # match sky "Up" or "Down":
@@ -463,37 +477,99 @@ def _apply_sky(images, sky_deltas, do_global, do_skysub):
     #return A, W
 
 # bug workaround version:
-def _overlap_matrix(images, apply_sky=True):
-    #TODO: to improve performance, the nested loops could be parallelized
-    # since _calc_sky() here can be called independently from previous steps.
+def _overlap_matrix(images, apply_sky=True, maximum_cores='none',
+                    parallel_backend='thread'):
+    # Only pairs of images whose bounding caps on the sky intersect can
+    # overlap; the others are skipped. The sky in the overlaps of the
+    # remaining pairs is computed independently for each pair, possibly in
+    # parallel.
     ns = len(images)
     A = np.zeros((ns, ns), dtype=float)
     W = np.zeros((ns, ns), dtype=float)
 
-    for i in range(ns):
-        for j in range(i + 1, ns):
-            s1, w1, area1 = images[i].calc_sky(
-                overlap=images[j], delta=apply_sky
-            )
+    pairs = _candidate_pairs(images)
+    log.debug("Computing sky in the overlaps of {:d} of {:d} pairs of "
+              "images".format(len(pairs), ns * (ns - 1) // 2))
 
-            s2, w2, area2 = images[j].calc_sky(
-                overlap=images[i], delta=apply_sky
-            )
+    def pair_sky(pair):
+        i, j = pair
+        return (
+            images[i].calc_sky(overlap=images[j], delta=apply_sky),
+            images[j].calc_sky(overlap=images[i], delta=apply_sky)
+        )
 
-            if area1 == 0.0 or area2 == 0.0 or s1 is None or s2 is None:
-                continue
+    num_workers = parallel.compute_num_workers(maximum_cores, len(pairs))
+    pair_skies = parallel.ordered_map(pair_sky, pairs,
+                                      num_workers=num_workers,
+                                      backend=parallel_backend)
 
-            A[j, i] = s1
-            W[j, i] = w1
-            A[i, j] = s2
-            W[i, j] = w2
+    for (i, j), ((s1, w1, area1), (s2, w2, area2)) in zip(pairs, pair_skies):
+        if area1 == 0.0 or area2 == 0.0 or s1 is None or s2 is None:
+            continue
+
+        A[j, i] = s1
+        W[j, i] = w1
+        A[i, j] = s2
+        W[i, j] = w2
 
     return A, W
 
 
-def _find_optimum_sky_deltas(images, apply_sky=True):
+def _candidate_pairs(images):
+    """
+    Return the pairs (i, j), i < j, of images whose bounding caps on the
+    sky intersect, which are the only ones that can overlap.
+    """
+    ns = len(images)
+    caps = [_bounding_cap(img.radec) for img in images]
+    bounded = np.array([cap is not None for cap in caps], dtype=bool)
+    centers = np.array([cap[0] if cap is not None else np.zeros(3)
+                        for cap in caps]).reshape((ns, 3))
+    radii = np.array([cap[1] if cap is not None else np.pi
+                      for cap in caps])
+
+    separation = np.arccos(np.clip(np.dot(centers, centers.T), -1.0, 1.0))
+    # allow for rounding in the caps
+    candidate = separation <= radii[:, np.newaxis] + radii + 1.0e-9
+    candidate |= ~(bounded[:, np.newaxis] & bounded)
+
+    i, j = np.nonzero(np.triu(candidate, k=1))
+    return list(zip(i.tolist(), j.tolist()))
+
+
+def _bounding_cap(radec):
+    """
+    Return the unit vector of the center, and the angular radius in
+    radians, of a spherical cap containing the polygons with vertices
+    given by a list of (RA, DEC) tuples, or None if there is no such cap
+    smaller than a hemisphere (and so sure to contain the polygons).
+    """
+    if not radec:
+        return None
+    ra = np.deg2rad(np.concatenate([np.atleast_1d(r) for r, d in radec]))
+    dec = np.deg2rad(np.concatenate([np.atleast_1d(d) for r, d in radec]))
+    if ra.size == 0 or not (np.isfinite(ra).all() and np.isfinite(dec).all()):
+        return None
+
+    points = np.array([np.cos(dec) * np.cos(ra), np.cos(dec) * np.sin(ra),
+                       np.sin(dec)]).T
+    center = points.mean(axis=0)
+    norm = np.linalg.norm(center)
+    if norm < 1.0e-8:
+        return None
+    center /= norm
+    radius = np.arccos(np.clip(np.dot(points, center), -1.0, 1.0)).max()
+    if radius >= 0.5 * np.pi:
+        return None
+    return center, radius
+
+
+def _find_optimum_sky_deltas(images, apply_sky=True, maximum_cores='none',
+                             parallel_backend='thread'):
     ns = len(images)
-    A, W = _overlap_matrix(images, apply_sky=apply_sky)
+    A, W = _overlap_matrix(images, apply_sky=apply_sky,
+                           maximum_cores=maximum_cores,
+                           parallel_backend=parallel_backend)
 
     def is_valid(i, j):
         return (W[i, j] > 0 and W[j, i] > 0)
@@ -49,6 +49,10 @@ class SkyMatchStep(Step):
         lsigma = float(min=0.0, default=4.0) # Lower clipping limit, in sigma
         usigma = float(min=0.0, default=4.0) # Upper clipping limit, in sigma
         binwidth = float(min=0.0, default=0.1) # Bin width for 'mode' and 'midpt' `skystat`, in sigma
+
+        # Parallel processing of overlapping pairs of images:
+        maximum_cores = option('none', 'quarter', 'half', 'all', default='none') # max number of workers
+        parallel_backend = option('thread', 'process', default='thread') # kind of workers
     """
 
     reference_file_types = []
@@ -84,7 +88,8 @@ class SkyMatchStep(Step):
                 raise AssertionError("Logical error in the pipeline code.")
 
         match(images, skymethod=self.skymethod, match_down=self.match_down,
-              subtract=self.subtract)
+              subtract=self.subtract, maximum_cores=self.maximum_cores,
+              parallel_backend=self.parallel_backend)
 
         # set sky background value in each image's meta:
         for im in images:
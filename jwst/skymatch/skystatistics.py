@@ -123,9 +123,14 @@ cgi-bin/gethelp.cgi?gstatistics>`_
         """
         imstat = ImageStats(image=data, fields=self._fields,
                             **(self._kwargs))
-        self.skyval = self._skystat(imstat)
-        self.npix = imstat.npix
-        return (self.skyval, self.npix)
+        # One object may compute the sky of several images in parallel
+        # threads, so return the statistics of this call rather than the
+        # attributes, which another call may have set in the meantime
+        skyval = self._skystat(imstat)
+        npix = imstat.npix
+        self.skyval = skyval
+        self.npix = npix
+        return (skyval, npix)
 
     def __call__(self, data):
         return self.calc_sky(data)
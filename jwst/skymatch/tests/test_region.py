@@ -0,0 +1,85 @@
+"""
+Tests of the rasterization of polygons
+"""
+from __future__ import absolute_import, division
+
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from .. import region
+
+SHAPE = (60, 70)
+
+
+def _scan_lines(polygon, data):
+    """
+    Rasterize a polygon one scan line at a time with the active edge table,
+    as Polygon.scan used to, except that spans entirely left of the array
+    are dropped rather than wrapped around.
+    """
+    ny, nx = data.shape
+    y = np.min(list(polygon._GET.keys()))
+    AET = []
+    scline = polygon._scan_line_range[-1]
+    while y <= scline:
+        if y < scline:
+            AET = polygon.update_AET(y, AET)
+        scan_line = region.Edge('scan_line', start=[polygon._bbox[0], y],
+                                stop=[polygon._bbox[0] + polygon._bbox[2], y])
+        x = np.sort([np.ceil(e.compute_AET_entry(scan_line)[1])
+                     for e in AET if e is not None])
+        ysh = y + polygon._shifty
+        if 0 <= ysh < ny:
+            for i, j in zip(x[::2], x[1::2]):
+                xstart = max(0, i + polygon._shiftx)
+                xend = min(j + polygon._shiftx, nx - 1)
+                if xend >= 0:
+                    data[ysh][int(xstart):int(xend) + 1] = polygon._rid
+        y += 1
+    return data
+
+
+def _random_polygon(rng, kind):
+    """
+    The closed list of vertices of a random convex or concave polygon, or
+    of one with integer vertices, possibly extending beyond the array.
+    """
+    nvertices = rng.randint(3, 12)
+    center = rng.uniform(-10., SHAPE[::-1]) + 10.
+    angles = np.sort(rng.uniform(0., 2. * np.pi, nvertices))
+    if kind == 'convex':
+        radii = np.full(nvertices, rng.uniform(3., 40.))
+    else:
+        radii = rng.uniform(3., 40., nvertices)
+    x = center[0] + radii * np.cos(angles)
+    y = center[1] + radii * np.sin(angles)
+    if kind == 'integer':
+        x, y = np.round(x), np.round(y)
+    vertices = list(zip(x, y))
+    return vertices + vertices[:1]
+
+
+def test_polygon_scan():
+    """The spans give the masks of the scan line algorithm"""
+    rng = np.random.RandomState(0)
+    for trial in range(300):
+        kind = ('convex', 'concave', 'integer')[trial % 3]
+        vertices = _random_polygon(rng, kind)
+
+        expected = _scan_lines(region.Polygon(1, vertices),
+                               np.zeros(SHAPE, dtype=np.int32))
+        mask = region.Polygon(1, vertices).scan(
+            np.zeros(SHAPE, dtype=np.int32))
+        assert_array_equal(mask, expected)
+
+
+def test_fill_spans():
+    data = np.zeros((4, 6), dtype=np.int32)
+    spans = (np.array([-1, 0, 1, 2, 3, 5]), np.array([2, -3, 4, 3, 5, 0]),
+             np.array([3, -1, 9, 1, 5, 2]))
+    region.fill_spans(data, spans, 7)
+
+    expected = np.zeros((4, 6), dtype=np.int32)
+    expected[1, 4:] = 7
+    expected[3, 5] = 7
+    assert_array_equal(data, expected)
@@ -0,0 +1,86 @@
+"""
+Tests of the sky matching of overlapping images
+"""
+from __future__ import absolute_import, division
+
+import itertools
+
+import numpy as np
+from numpy.testing import assert_array_equal
+import pytest
+
+from .. import skymatch
+from ..skyimage import SkyImage
+from ..skystatistics import SkyStats
+
+SHAPE = (40, 50)
+SCALE = 1.0e-3   # degrees per pixel
+
+
+def _make_wcs(ra0, dec0):
+    """
+    Forward and inverse transforms of a small image centered on (ra0, dec0).
+    """
+    cosdec = np.cos(np.deg2rad(dec0))
+
+    def wcs_fwd(x, y, origin=0):
+        x = np.asarray(x, dtype=float) - 0.5 * SHAPE[1]
+        y = np.asarray(y, dtype=float) - 0.5 * SHAPE[0]
+        return ra0 + SCALE * x / cosdec, dec0 + SCALE * y
+
+    def wcs_inv(ra, dec, origin=0):
+        ra = np.asarray(ra, dtype=float)
+        dec = np.asarray(dec, dtype=float)
+        return ((ra - ra0) * cosdec / SCALE + 0.5 * SHAPE[1],
+                (dec - dec0) / SCALE + 0.5 * SHAPE[0])
+
+    return wcs_fwd, wcs_inv
+
+
+@pytest.fixture(scope='module')
+def images():
+    """
+    A dozen images scattered over a field a few times their size, so that
+    some of them overlap and others do not, sharing one sky statistics
+    object.
+    """
+    rng = np.random.RandomState(1)
+    skystat = SkyStats(skystat='median')
+    images = []
+    for n in range(12):
+        wcs_fwd, wcs_inv = _make_wcs(rng.uniform(10., 10.2),
+                                     rng.uniform(-30.1, -29.9))
+        image = rng.normal(rng.uniform(0., 10.), 1., size=SHAPE)
+        images.append(SkyImage(image, wcs_fwd, wcs_inv, id=n,
+                               skystat=skystat))
+    return images
+
+
+def test_candidate_pairs(images):
+    """The pairs that are skipped do not overlap"""
+    pairs = skymatch._candidate_pairs(images)
+    all_pairs = list(itertools.combinations(range(len(images)), 2))
+    assert 0 < len(pairs) < len(all_pairs)
+    assert set(pairs) <= set(all_pairs)
+
+    for i, j in set(all_pairs) - set(pairs):
+        assert images[i].calc_sky(overlap=images[j])[2] == 0.
+
+
+@pytest.mark.parametrize('maximum_cores, backend', [
+    ('none', 'thread'),
+    (4, 'thread'),
+    (3, 'process'),
+])
+def test_overlap_matrix(monkeypatch, images, maximum_cores, backend):
+    """Pruning the pairs of images leaves the overlap matrix unchanged"""
+    A, W = skymatch._overlap_matrix(images, maximum_cores=maximum_cores,
+                                    parallel_backend=backend)
+
+    monkeypatch.setattr(skymatch, '_candidate_pairs', lambda images: list(
+        itertools.combinations(range(len(images)), 2)))
+    expected_A, expected_W = skymatch._overlap_matrix(images)
+    assert (expected_W > 0).any()
+
+    assert_array_equal(A, expected_A)
+    assert_array_equal(W, expected_W)
@@ -186,6 +186,7 @@ def just_the_step_from_cmdline(args, cls=None):
     parser1.add_argument(
         "--debug", action="store_true",
         help="When an exception occurs, invoke the Python debugger, pdb")
+    _add_batch_arguments(parser1)
     known, _ = parser1.parse_known_args(args)
 
     try:
@@ -243,6 +244,8 @@ def just_the_step_from_cmdline(args, cls=None):
     del args.logcfg
     del args.verbose
     del args.debug
+    del args.batch
+    del args.processes
     positional = args.args
     del args.args
 
@@ -276,10 +279,33 @@ def just_the_step_from_cmdline(args, cls=None):
 
     return step, step_class, positional, debug_on_exception
 
+def _add_batch_arguments(parser):
+    parser.add_argument(
+        "--batch", type=str,
+        help="A file listing inputs, one per line, to run the step on in "
+        "turn instead of the positional arguments")
+    parser.add_argument(
+        "--processes", type=int, default=1,
+        help="The number of worker processes to use with --batch")
+
+
+def _read_batch_file(path):
+    """
+    Read the list of inputs of a batch run, ignoring blank lines and
+    lines starting with '#'.
+    """
+    with io.open(path) as fd:
+        inputs = [line.strip() for line in fd]
+    return [line for line in inputs if line and not line.startswith('#')]
+
+
 def step_from_cmdline(args, cls=None):
     """
     Create a step from a configuration file and run it.
 
+    With the ``--batch`` option, the step is created once and run on each
+    of the inputs listed in the given file (see `Step.run_many`).
+
     Parameters
     ----------
     args : list of str
@@ -300,9 +326,28 @@ def step_from_cmdline(args, cls=None):
         instance.
     """
 
+    import argparse
+    batch_parser = argparse.ArgumentParser(add_help=False)
+    _add_batch_arguments(batch_parser)
+    batch, _ = batch_parser.parse_known_args(args)
+
     step, step_class, positional, debug_on_exception = \
         just_the_step_from_cmdline(args, cls)
 
+    if batch.batch is not None:
+        if len(positional):
+            raise ValueError(
+                "Positional arguments can not be given with --batch")
+        timings = step.run_many(_read_batch_file(batch.batch),
+                                batch.processes)
+        failed = [input_file for input_file, elapsed, error in timings
+                  if error is not None]
+        if len(failed):
+            raise RuntimeError(
+                "Processing failed for {0} of {1} inputs: {2}".format(
+                    len(failed), len(timings), ', '.join(failed)))
+        return step
+
     try:
         profile_path = os.environ.pop("JWST_PROFILE", None)
         if profile_path:
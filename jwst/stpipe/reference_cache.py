@@ -0,0 +1,186 @@
+"""
+A process-wide cache of the data models of reference files.
+
+Steps that open their reference files with `Step.open_reference_model`
+get them through the cache, so that a process that runs a pipeline on
+many exposures opens and validates each reference file only once.  The
+cache is disabled by default; it is enabled either with
+`reference_cache.configure`, or by setting the environment variables
+``STPIPE_REFERENCE_CACHE_MODELS`` (the maximum number of models kept)
+and ``STPIPE_REFERENCE_CACHE_MB`` (the maximum size of their arrays, in
+MB).
+"""
+from __future__ import absolute_import, division, print_function
+
+from collections import OrderedDict
+import logging
+import os
+import threading
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+# The default of the arguments of `ReferenceCache.configure`, which can not
+# be None since None means that there is no memory limit
+_UNCHANGED = object()
+
+
+class ReferenceCache(object):
+    """
+    A cache of reference file models, keyed by file path and model class,
+    that evicts the least recently used models beyond its limits.
+
+    The models handed out are copies of the cached models that share
+    their arrays, which are read-only; metadata and arrays assigned to a
+    copy do not affect the cache.
+
+    Parameters
+    ----------
+    max_models : int
+        The maximum number of models kept; 0 disables the cache.
+
+    max_memory : float or None
+        The maximum total size of the arrays of the models kept, in MB,
+        or None for no limit.
+
+    Attributes
+    ----------
+    hits, misses : int
+        The number of requests satisfied from the cache, and the number
+        of requests for which the file had to be opened.
+    """
+    def __init__(self, max_models=0, max_memory=None):
+        self._lock = threading.Lock()
+        self._models = OrderedDict()
+        self.max_models = max_models
+        self.max_memory = max_memory
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, max_models=_UNCHANGED, max_memory=_UNCHANGED):
+        """
+        Change the limits of the cache, evicting models if necessary.
+        Limits that are not given are left unchanged; a `max_memory` of
+        None removes the memory limit.
+        """
+        with self._lock:
+            if max_models is not _UNCHANGED:
+                self.max_models = max_models
+            if max_memory is not _UNCHANGED:
+                self.max_memory = max_memory
+            self._evict()
+
+    def clear(self):
+        """
+        Remove all of the models from the cache, and reset the counters.
+        """
+        with self._lock:
+            self._models.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._models)
+
+    @property
+    def nbytes(self):
+        """
+        The total size of the arrays of the models kept, in bytes.
+        """
+        return sum(nbytes for model, mtime, nbytes in self._models.values())
+
+    def open(self, filename, model_class):
+        """
+        Open a reference file as an instance of `model_class`, from the
+        cache if possible.
+
+        Parameters
+        ----------
+        filename : str
+            The path to the reference file.
+
+        model_class : jwst.datamodels.DataModel subclass
+            The class of the model to open the file as.
+
+        Returns
+        -------
+        model : model_class instance
+            A model of the reference file.  Its arrays are read-only,
+            unless the cache is disabled.
+        """
+        if not self.max_models:
+            return model_class(filename)
+
+        path = os.path.abspath(filename)
+        key = (path, model_class)
+        mtime = os.path.getmtime(path)
+
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None and entry[1] == mtime:
+                # Move the model to the most recently used end
+                self._models[key] = self._models.pop(key)
+                self.hits += 1
+            else:
+                entry = None
+                self.misses += 1
+        if entry is not None:
+            log.debug('Reference cache hit for %s', filename)
+            return _shared_copy(entry[0])
+
+        model = model_class(filename)
+        model.close()
+        arrays = _find_arrays(model._instance)
+        for array in arrays:
+            array.flags.writeable = False
+        nbytes = sum(array.nbytes for array in arrays)
+
+        with self._lock:
+            self._models[key] = (model, mtime, nbytes)
+            self._evict()
+        return _shared_copy(model)
+
+    def _evict(self):
+        if self.max_memory is None:
+            max_bytes = np.inf
+        else:
+            max_bytes = self.max_memory * 1024.**2
+        while self._models and (len(self._models) > self.max_models or
+                                self.nbytes > max_bytes):
+            key, entry = self._models.popitem(last=False)
+            log.debug('Reference cache evicting %s', key[0])
+
+
+def _find_arrays(tree):
+    """
+    Return a list of the arrays in a model tree.
+    """
+    if isinstance(tree, np.ndarray):
+        return [tree]
+    arrays = []
+    if isinstance(tree, dict):
+        tree = list(tree.values())
+    if isinstance(tree, (list, tuple)):
+        for val in tree:
+            arrays.extend(_find_arrays(val))
+    return arrays
+
+
+def _shared_copy(model):
+    """
+    Return a copy of a model that shares its arrays.
+    """
+    memo = dict((id(array), array) for array in _find_arrays(model._instance))
+    return model.copy(memo=memo)
+
+
+def _from_environment():
+    max_models = int(os.environ.get('STPIPE_REFERENCE_CACHE_MODELS', 0))
+    max_memory = os.environ.get('STPIPE_REFERENCE_CACHE_MB')
+    if max_memory is not None:
+        max_memory = float(max_memory)
+    return ReferenceCache(max_models, max_memory)
+
+
+reference_cache = _from_environment()
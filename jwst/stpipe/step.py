@@ -8,6 +8,7 @@ from astropy.extern import six
 from os.path import dirname, join, basename, splitext, abspath, split
 import sys
 import gc
+import time
 
 try:
     from astropy.io import fits
@@ -19,6 +20,8 @@ from . import config_parser
 from . import crds_client
 from . import log
 from . import utilities
+from .reference_cache import reference_cache
+from ..lib import parallel
 from .. import __version_commit__, __version__
 
 
@@ -33,6 +36,7 @@ class Step(object):
     output_dir = string(default=None) # Directory path for output files
     output_file = output_file(default=None) # File to save output to.
     skip = boolean(default=False) # Skip this step
+    in_place = boolean(default=False) # Modify an input model instead of a copy
     """
 
     reference_file_types = []
@@ -444,6 +448,89 @@ class Step(object):
             instance = cls(**kwargs)
         return instance.run(*args)
 
+    def run_many(self, inputs, processes=1):
+        """
+        Run the step on each of a number of inputs in turn, reusing this
+        instance, and so its configuration, for all of them.  This saves
+        the cost of starting Python and building the step for every input,
+        and lets the reference file models be reused through the
+        reference file cache (see `jwst.stpipe.reference_cache`).
+
+        As when the step is run from the commandline, the output of each
+        input is saved to a file named after the input, in `output_dir`
+        if it is set; `output_file` must not be set.  An input that fails
+        is logged and does not stop the others from being processed.
+
+        Parameters
+        ----------
+        inputs : list of str
+            The input file names.
+
+        processes : int
+            The number of worker processes to spread the inputs over;
+            1 (the default) processes them serially.  The workers are
+            forked from this process, so they share the built step; its
+            own parallel options (e.g. `maximum_cores`) must then be off.
+
+        Returns
+        -------
+        timings : list of (str, float, str or None) tuples
+            For each input, in order, the input file name, the time taken
+            to process it in seconds, and the error message if it failed
+            or None.
+        """
+        if self.output_file is not None:
+            raise ValueError(
+                "output_file can not be set when running on many inputs; "
+                "use output_dir instead")
+
+        start = time.time()
+        processes = max(1, min(processes, len(inputs)))
+        if processes > 1:
+            pool = parallel._fork_context().Pool(
+                processes=processes, initializer=_init_batch_worker,
+                initargs=(self,))
+            timings = list(pool.imap(_run_batch_input, inputs))
+            pool.close()
+            pool.join()
+        else:
+            timings = [self._run_batch_input(input_file)
+                       for input_file in inputs]
+
+        failed = [input_file for input_file, elapsed, error in timings
+                  if error is not None]
+        self.log.info(
+            'Processed {0} inputs in {1:.2f} s, {2} failed'.format(
+                len(inputs), time.time() - start, len(failed)))
+        if processes == 1:
+            self.log.info(
+                'Reference file cache: {0} hits, {1} misses'.format(
+                    reference_cache.hits, reference_cache.misses))
+
+        return timings
+
+    def _run_batch_input(self, input_file):
+        """
+        Run the step on one of the inputs of `run_many`, and return the
+        input file name, the time taken and the error message, if any.
+        """
+        start = time.time()
+        error = None
+        self.set_input_filename(input_file)
+        self.output_file = abspath(splitext(input_file)[0] +
+                                   "_{0}.fits".format(self.name))
+        try:
+            self.run(input_file)
+        except Exception as e:
+            self.log.exception('Processing {0} failed'.format(input_file))
+            error = str(e)
+        finally:
+            self.output_file = None
+        elapsed = time.time() - start
+        self.log.info('Processed {0} in {1:.2f} s'.format(input_file, elapsed))
+
+        return input_file, elapsed, error
+
     @classmethod
     def _is_association_file(cls, input_file):
         """Return True IFF `input_file` is an association file."""
@@ -470,6 +557,11 @@ class Step(object):
             return
         if len(self.reference_file_types):
             from .. import datamodels
+            if isinstance(input_file, datamodels.DataModel):
+                # Only the metadata are needed, so read them from the
+                # model itself rather than from a new model sharing its data
+                self._precache_reference_files_impl(input_file)
+                return
             try:
                 model = datamodels.open(input_file)
             except (ValueError, TypeError, IOError):
@@ -569,6 +661,58 @@ class Step(object):
                 (reference_file_type, hdr_name))
         return crds_client.check_reference_open(reference_name)
 
+    def open_reference_model(self, reference_name, model_class):
+        """
+        Open a reference file as a data model, through the process-wide
+        cache of reference file models (see
+        `jwst.stpipe.reference_cache`).  When the cache is enabled, the
+        arrays of the model are shared with the cache and are read-only.
+
+        Parameters
+        ----------
+        reference_name : str
+            The path to the reference file, as returned by
+            `get_reference_file`.
+
+        model_class : jwst.datamodels.DataModel subclass
+            The class of the model to open the file as.
+
+        Returns
+        -------
+        reference_file_model : model_class instance
+            A model of the reference file.
+        """
+        return reference_cache.open(reference_name, model_class)
+
+    @contextlib.contextmanager
+    def open_model(self, init):
+        """
+        Open the input of the step as a data model, for use in a `with`
+        statement.
+
+        If the step is run in place (the `in_place` parameter is set) and
+        the input is already a data model, the model itself is used, so
+        that the step modifies it rather than a copy, and it is left open
+        afterwards. Otherwise, this is the same as `jwst.datamodels.open`.
+
+        Parameters
+        ----------
+        init : jwst.datamodels.DataModel instance, or anything accepted
+            by `jwst.datamodels.open`
+            The input of the step.
+
+        Returns
+        -------
+        model : jwst.datamodels.DataModel instance
+            The input model, or a new model opened from the input.
+        """
+        from .. import datamodels
+        if self.in_place and isinstance(init, datamodels.DataModel):
+            yield init
+        else:
+            with datamodels.open(init) as model:
+                yield model
+
     @contextlib.contextmanager
     def get_reference_file_model(self, input_file, reference_file_type):
         """
@@ -651,3 +795,24 @@ class Step(object):
 
         new_path = join(dirname, new_filename)
         model.save(new_path, *args, **kwargs)
+
+
+# The step run by the worker processes of `Step.run_many`
+_batch_step = None
+
+
+def _init_batch_worker(step):
+    """
+    Initializer for the worker processes of `Step.run_many`. The step is
+    handed to each worker once, when the pool is created (the workers are
+    forked, so it is shared with the parent process, not pickled).
+    """
+    global _batch_step
+    _batch_step = step
+
+
+def _run_batch_input(input_file):
+    """
+    Worker function for `Step.run_many`, running the step on one input.
+    """
+    return _batch_step._run_batch_input(input_file)
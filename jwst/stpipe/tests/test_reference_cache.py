@@ -0,0 +1,93 @@
+from __future__ import absolute_import, division, print_function
+
+import os
+from os.path import dirname, join
+import shutil
+import tempfile
+
+import pytest
+import numpy as np
+
+from ..reference_cache import ReferenceCache
+
+FLAT_FILE = join(dirname(__file__), 'data', 'flat.fits')
+CRDS_FILE = join(dirname(__file__), 'data', 'crds.fits')
+
+
+def test_reference_cache():
+    from ... import datamodels
+
+    cache = ReferenceCache(max_models=1)
+
+    model = cache.open(CRDS_FILE, datamodels.ImageModel)
+    assert (cache.hits, cache.misses) == (0, 1)
+    with datamodels.ImageModel(CRDS_FILE) as expected:
+        assert np.all(model.data == expected.data)
+    with pytest.raises(ValueError):
+        model.data[0, 0] = 1.
+    model.meta.filename = 'changed.fits'
+    model.close()
+
+    model = cache.open(CRDS_FILE, datamodels.ImageModel)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert model.meta.filename == 'crds.fits'
+
+    # A different model class is a different entry
+    model = cache.open(CRDS_FILE, datamodels.FlatModel)
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert isinstance(model, datamodels.FlatModel)
+    assert len(cache) == 1
+
+
+def test_reference_cache_limits():
+    from ... import datamodels
+
+    cache = ReferenceCache(max_models=2)
+    cache.open(FLAT_FILE, datamodels.ImageModel)
+    cache.open(CRDS_FILE, datamodels.ImageModel)
+    cache.open(FLAT_FILE, datamodels.ImageModel)
+    assert len(cache) == 2
+
+    # The least recently used model is evicted first
+    cache.configure(max_memory=cache.nbytes / 2. / 1024.**2)
+    assert len(cache) == 1
+    cache.open(FLAT_FILE, datamodels.ImageModel)
+    assert (cache.hits, cache.misses) == (2, 2)
+
+    # Removing the memory limit leaves the number of models limited
+    cache.configure(max_memory=None)
+    assert cache.max_memory is None
+    assert cache.max_models == 2
+    cache.open(CRDS_FILE, datamodels.ImageModel)
+    assert len(cache) == 2
+
+    # A disabled cache keeps nothing
+    cache = ReferenceCache()
+    model = cache.open(FLAT_FILE, datamodels.ImageModel)
+    model.data[0, 0] = 0.
+    assert len(cache) == 0
+    assert (cache.hits, cache.misses) == (0, 0)
+
+
+def test_reference_cache_modified_file():
+    from ... import datamodels
+
+    tempdir = tempfile.mkdtemp()
+    try:
+        filename = join(tempdir, 'crds.fits')
+        shutil.copyfile(CRDS_FILE, filename)
+        cache = ReferenceCache(max_models=1)
+        cache.open(filename, datamodels.ImageModel)
+
+        # A file that has changed since it was read is read again
+        with datamodels.ImageModel(CRDS_FILE) as original:
+            original.data += 1.
+            original.save(filename)
+            mtime = os.path.getmtime(filename) + 10.
+            os.utime(filename, (mtime, mtime))
+
+            model = cache.open(filename, datamodels.ImageModel)
+            assert (cache.hits, cache.misses) == (0, 2)
+            assert np.all(model.data == original.data)
+    finally:
+        shutil.rmtree(tempdir)
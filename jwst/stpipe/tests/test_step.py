@@ -196,3 +196,58 @@ def test_save_model():
     Step.from_cmdline(args)
     fname = join(tempdir, 'flat_FOO_SaveStep.fits')
     assert isfile(fname)
+
+
+def test_run_many():
+    tempdir = tempfile.mkdtemp()
+    orig_filename = join(dirname(__file__), 'data', 'flat.fits')
+    temp_filenames = [join(tempdir, 'flat{0}_FOO.fits'.format(i))
+                      for i in range(2)]
+    for temp_filename in temp_filenames:
+        shutil.copyfile(orig_filename, temp_filename)
+    batch_filename = join(tempdir, 'inputs.txt')
+    with open(batch_filename, 'w') as fd:
+        fd.write('# inputs\n')
+        for filename in temp_filenames + [join(tempdir, 'missing.fits')]:
+            fd.write(filename + '\n')
+
+    args = [
+        'jwst.stpipe.tests.steps.SaveStep',
+        '--batch', batch_filename
+    ]
+
+    # The missing input fails, but does not stop the others
+    with pytest.raises(RuntimeError):
+        Step.from_cmdline(args)
+    for i in range(2):
+        fname = join(tempdir, 'flat{0}_FOO_SaveStep.fits'.format(i))
+        assert isfile(fname)
+
+    from .steps import SaveStep
+    step = SaveStep()
+    timings = step.run_many(temp_filenames)
+    assert [t[0] for t in timings] == temp_filenames
+    assert all(t[1] > 0 and t[2] is None for t in timings)
+    assert step.output_file is None
+
+    # The same, in two worker processes
+    timings = step.run_many(temp_filenames, processes=2)
+    assert [t[0] for t in timings] == temp_filenames
+    assert all(t[1] > 0 and t[2] is None for t in timings)
+
+
+def test_open_model_in_place():
+    from .steps import AnotherDummyStep
+    from ... import datamodels
+
+    model = datamodels.ImageModel((10, 10))
+
+    step = AnotherDummyStep("SomeOtherStepOriginal", par1=42.0, par2="abc def")
+    assert step.in_place is False
+    with step.open_model(model) as input_model:
+        assert input_model is not model
+
+    step = AnotherDummyStep("SomeOtherStepOriginal", par1=42.0, par2="abc def",
+                            in_place=True)
+    with step.open_model(model) as input_model:
+        assert input_model is model
@@ -12,7 +12,7 @@ log = logging.getLogger(__name__)
 log.setLevel(logging.DEBUG)
 
 
-def do_correction(input_model, bias_model):
+def do_correction(input_model, bias_model, in_place=False):
     """
     Short Summary
     -------------
@@ -26,6 +26,9 @@ def do_correction(input_model, bias_model):
     bias_model: super-bias model object
         bias data
 
+    in_place: bool
+        if True, correct the input model itself rather than a copy of it
+
     Returns
     -------
     output_model: data model object
@@ -33,8 +36,13 @@ def do_correction(input_model, bias_model):
 
     """
 
-    # Replace NaN's in the superbias with zeros
-    bias_model.data[np.isnan(bias_model.data)] = 0.0
+    # Replace NaN's in the superbias with zeros.  The superbias model is
+    # given a new data array rather than changing its array, which may be
+    # shared with other models (see jwst.stpipe.reference_cache) and
+    # read-only
+    nans = np.isnan(bias_model.data)
+    if nans.any():
+        bias_model.data = np.where(nans, 0.0, bias_model.data)
 
     # Check for subarray mode and extract subarray from the
     # bias reference data if necessary
@@ -42,14 +50,14 @@ def do_correction(input_model, bias_model):
         bias_model = get_subarray(bias_model, input_model)
 
     # Subtract the bias ref image from the science data
-    output_model = subtract_bias(input_model, bias_model)
+    output_model = subtract_bias(input_model, bias_model, in_place)
 
     output_model.meta.cal_step.superbias = 'COMPLETE'
 
     return output_model
 
 
-def subtract_bias(input, bias):
+def subtract_bias(input, bias, in_place=False):
     """
     Subtracts a superbias image from a science data set, subtracting the
     superbias from each group of each integration in the science data.
@@ -64,6 +72,9 @@ def subtract_bias(input, bias):
     bias: superbias model object
         the superbias image data
 
+    in_place: bool
+        if True, subtract from the input model itself rather than a copy
+
     Returns
     -------
     output: data model object
@@ -71,8 +82,12 @@ def subtract_bias(input, bias):
 
     """
 
-    # Create output as a copy of the input science data model
-    output = input.copy()
+    # Create output as a copy of the input science data model, unless the
+    # subtraction is to be done in place
+    if in_place:
+        output = input
+    else:
+        output = input.copy()
 
     # combine the science and superbias DQ arrays
     output.pixeldq = np.bitwise_or(input.pixeldq, bias.dq)
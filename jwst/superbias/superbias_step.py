@@ -18,7 +18,7 @@ class SuperBiasStep(Step):
     def process(self, input):
 
         # Open the input data model
-        with datamodels.open(input) as input_model:
+        with self.open_model(input) as input_model:
 
             # Get the name of the superbias reference file to use
             self.bias_name = self.get_reference_file(input_model, 'superbias')
@@ -33,10 +33,12 @@ class SuperBiasStep(Step):
                 return result
 
             # Open the superbias ref file data model
-            bias_model = datamodels.SuperBiasModel(self.bias_name)
+            bias_model = self.open_reference_model(self.bias_name,
+                                                   datamodels.SuperBiasModel)
 
             # Do the bias subtraction
-            result = bias_sub.do_correction(input_model, bias_model)
+            result = bias_sub.do_correction(input_model, bias_model,
+                                            self.in_place)
 
             # Close the superbias reference file model and
             # set the step status to complete